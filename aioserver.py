@@ -0,0 +1,208 @@
+"""A streaming asyncio HTTP/JSON API over a NEODatabase for NearEarthObjects.
+
+`python3 main.py serve --asyncio --port 8000` answers the same requests as
+`server.py`, from a single thread running an asyncio event loop:
+
+    GET /inspect?pdes=433
+    GET /query?start_date=2020-01-01&limit=0
+    GET /stats
+
+`/inspect` and `/stats` answer with one JSON document, as `server.py` does. `/query`
+answers with chunked newline-delimited JSON: one approach per line, in the
+form `write_to_ndjson` writes, sent as the `query` generator produces them
+rather than once every match is found. After every `chunk_rows` approaches
+the chunk is sent and the event loop is given the chance to serve other
+connections, so a large export doesn't hold up small requests.
+
+Errors found before any result is sent come back as `{"error": message}` with
+status 400 or 404.
+"""
+
+import asyncio
+import functools
+import json
+import sys
+import types
+
+from filters import limit
+from server import (RequestError, inspect_result, parse_query, split_path,
+                    stats_result)
+
+
+# Approaches per chunk of a /query response.
+DEFAULT_CHUNK_ROWS = 100
+
+# The longest request head (request line and headers) that is read.
+_HEAD_LIMIT = 1 << 16
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+            405: 'Method Not Allowed'}
+
+
+def _head(status, headers):
+    """Return the bytes of a response's status line and headers."""
+    lines = [f'HTTP/1.1 {status} {_REASONS[status]}']
+    lines.extend(f'{name}: {value}' for name, value in headers)
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+def _chunk(data):
+    """Return data framed as one chunk of a chunked response."""
+    return b'%x\r\n%b\r\n' % (len(data), data)
+
+
+def parse_request(head):
+    """Split a request head into its method, target and whether to keep alive.
+
+    :param head: The bytes of the request line and headers.
+    :raises RequestError: If the request line is malformed.
+    """
+    lines = head.decode('latin-1').split('\r\n')
+    words = lines[0].split()
+    if len(words) != 3 or not words[2].startswith('HTTP/'):
+        raise RequestError(f"Bad request line '{lines[0]}'.")
+    method, target, version = words
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(':')
+        headers[name.strip().lower()] = value.strip().lower()
+    if version == 'HTTP/1.0':
+        keep_alive = headers.get('connection') == 'keep-alive'
+    else:
+        keep_alive = headers.get('connection') != 'close'
+    return method, target, keep_alive
+
+
+async def _send_json(writer, status, body, keep_alive):
+    """Send one JSON document as a whole response."""
+    data = json.dumps(body).encode()
+    headers = [('Content-Type', 'application/json'),
+               ('Content-Length', len(data))]
+    if not keep_alive:
+        headers.append(('Connection', 'close'))
+    writer.write(_head(status, headers) + data)
+    await writer.drain()
+
+
+async def _stream_query(writer, approaches, chunk_rows, keep_alive):
+    """Send approaches as chunked NDJSON, yielding every chunk_rows of them."""
+    headers = [('Content-Type', 'application/x-ndjson'),
+               ('Transfer-Encoding', 'chunked')]
+    if not keep_alive:
+        headers.append(('Connection', 'close'))
+    writer.write(_head(200, headers))
+    lines = []
+    for approach in approaches:
+        lines.append(json.dumps(approach.jsonMaker) + '\n')
+        if len(lines) == chunk_rows:
+            writer.write(_chunk(''.join(lines).encode()))
+            lines.clear()
+            await writer.drain()
+            # drain() only waits if the client is behind; let other
+            # connections run either way.
+            await asyncio.sleep(0)
+    if lines:
+        writer.write(_chunk(''.join(lines).encode()))
+    writer.write(b'0\r\n\r\n')
+    await writer.drain()
+
+
+async def _respond(database, chunk_rows, writer, method, target, keep_alive):
+    """Answer one request; return its status."""
+    try:
+        if method != 'GET':
+            raise RequestError(f"Method '{method}' isn't supported.", status=405)
+        path, params = split_path(target)
+        if path == '/inspect':
+            await _send_json(writer, 200, inspect_result(database, params), keep_alive)
+        elif path == '/stats':
+            await _send_json(writer, 200, stats_result(database, params), keep_alive)
+        elif path == '/query':
+            filters, count = parse_query(params)
+            await _stream_query(writer, limit(database.query(filters), count),
+                                chunk_rows, keep_alive)
+        else:
+            raise RequestError(f"No such endpoint '{path}'.", status=404)
+        return 200
+    except RequestError as err:
+        await _send_json(writer, err.status, {'error': str(err)}, keep_alive)
+        return err.status
+
+
+async def handle_connection(current, chunk_rows, verbose, reader, writer):
+    """Answer the requests on one connection until either end closes it.
+
+    Each request is answered from current.database, as it is when the
+    request arrives.
+    """
+    peer = writer.get_extra_info('peername')
+    try:
+        keep_alive = True
+        while keep_alive:
+            try:
+                head = await reader.readuntil(b'\r\n\r\n')
+            except asyncio.IncompleteReadError:
+                break
+            except asyncio.LimitOverrunError:
+                await _send_json(writer, 400, {'error': "Request head too long."}, False)
+                break
+            try:
+                method, target, keep_alive = parse_request(head[:-4])
+            except RequestError as err:
+                await _send_json(writer, 400, {'error': str(err)}, False)
+                break
+            status = await _respond(current.database, chunk_rows, writer, method, target,
+                                    keep_alive)
+            if verbose:
+                print(f'{peer[0]} - "{method} {target}" {status}', file=sys.stderr)
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(database, host='127.0.0.1', port=8000,
+                       chunk_rows=DEFAULT_CHUNK_ROWS, verbose=False, reloader=None):
+    """Start answering requests on host:port; return the `asyncio.Server`.
+
+    With a `reloader.Reloader` of the database, reloaded databases are
+    answered from once they're swapped in.
+    """
+    if chunk_rows < 1:
+        raise ValueError("chunk_rows must be at least 1.")
+    current = types.SimpleNamespace(database=database)
+    if reloader is not None:
+        reloader.subscribe(lambda database: setattr(current, 'database', database))
+        current.database = reloader.database
+    handler = functools.partial(handle_connection, current, chunk_rows, verbose)
+    return await asyncio.start_server(handler, host, port, limit=_HEAD_LIMIT)
+
+
+async def _serve_forever(database, host, port, chunk_rows, verbose, reloader):
+    """Start the server, announce it and answer requests until cancelled."""
+    server = await start_server(database, host, port, chunk_rows, verbose, reloader)
+    host, port = server.sockets[0].getsockname()[:2]
+    print(f"Serving on http://{host}:{port}/ (Ctrl-C to stop)", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+
+def serve(database, host='127.0.0.1', port=8000, chunk_rows=DEFAULT_CHUNK_ROWS,
+          verbose=False, reloader=None):
+    """Answer requests on host:port until interrupted.
+
+    :param database: The `NEODatabase` to answer from.
+    :param host: The address to listen on.
+    :param port: The port to listen on (0 for any free port).
+    :param chunk_rows: The number of approaches sent between turns of the
+        event loop.
+    :param verbose: Whether to log each request to stderr.
+    :param reloader: A `reloader.Reloader` of the database, as for `start_server`.
+    """
+    # Build the query table before the first request, so that it doesn't
+    # stall the event loop then.
+    database.prebuild()
+    try:
+        asyncio.run(_serve_forever(database, host, port, chunk_rows, verbose, reloader))
+    except KeyboardInterrupt:
+        pass
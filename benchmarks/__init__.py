@@ -0,0 +1,7 @@
+"""Let Python know that the `benchmarks/` folder is a package.
+
+The benchmarks are run as modules from the project root so that they import the
+project modules the same way the tests do:
+
+    $ python3 -m benchmarks.bench_load
+"""
@@ -0,0 +1,72 @@
+"""Time aggregation queries against summarizing the matching approaches.
+
+Runs `NEODatabase.aggregate` over the full dataset (a synthetic full-size one
+by default), with and without filters and for each way of grouping, and
+compares it with querying the matching approaches and summarizing them one at
+a time, as exporting them and post-processing would. Both are checked to
+agree, and the best of several runs is reported.
+
+    $ python3 -m benchmarks.bench_aggregate
+"""
+import collections
+import datetime
+import math
+
+from benchmarks.bench_query import best_of, load, make_parser
+from filters import create_filters
+
+
+QUERIES = {
+    'all': {},
+    'hazardous': {'hazardous': True},
+    'near, 2000s': {'start_date': datetime.date(2000, 1, 1),
+                    'end_date': datetime.date(2009, 12, 31), 'distance_max': 0.05},
+}
+
+GROUPS = {
+    None: lambda approach: None,
+    'year': lambda approach: approach.time.year,
+    'month': lambda approach: approach.time.strftime('%Y-%m'),
+    'neo': lambda approach: approach.neo.designation,
+}
+
+
+def summarize(approaches, group):
+    """Return the count and distance sum, min and max of each group, row by row."""
+    summaries = collections.defaultdict(lambda: [0, 0.0, math.inf, -math.inf])
+    for approach in approaches:
+        summary = summaries[group(approach)]
+        summary[0] += 1
+        summary[1] += approach.distance
+        summary[2] = min(summary[2], approach.distance)
+        summary[3] = max(summary[3], approach.distance)
+    return summaries
+
+
+def main():
+    """Run the aggregation benchmark."""
+    args = make_parser("Benchmark NEODatabase.aggregate.").parse_args()
+    db = load(args)
+    db.table
+
+    print(f"{'query':<14} {'group by':<8} {'groups':>7} {'row by row ms':>13} "
+          f"{'aggregate ms':>12}")
+    for label, criteria in QUERIES.items():
+        filters = create_filters(**criteria)
+        for group_by, group in GROUPS.items():
+            expected = summarize(db.query(filters), group)
+            received = db.aggregate(filters, group_by)
+            assert len(received) == len(expected), (label, group_by)
+            for summary in received:
+                count, total, low, high = expected[summary['group']]
+                assert summary['count'] == count, (label, group_by)
+                assert math.isclose(summary['distance_mean'], total / count)
+                assert (summary['distance_min'], summary['distance_max']) == (low, high)
+            rows = best_of(lambda: summarize(db.query(filters), group), 1)
+            aggregate = best_of(lambda: db.aggregate(filters, group_by), args.repeat)
+            print(f"{label:<14} {group_by or '-':<8} {len(received):>7} "
+                  f"{rows * 1000:>13.0f} {aggregate * 1000:>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
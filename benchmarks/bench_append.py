@@ -0,0 +1,102 @@
+"""Time catching a database up with new close approaches, against reloading it.
+
+Loads a database (from a synthetic full-size dataset by default) and writes a
+copy of its close approach file with `--new` more approaches at the end, as a
+newer download would have. The database is then brought up to date twice:
+by reading only the new rows with `extract.load_approaches_after` and adding
+them with `NEODatabase.add_approaches`, and by loading both files afresh.
+Each is followed by the example queries of `bench_query`, whose results are
+checked to agree.
+
+    $ python3 -m benchmarks.bench_append
+    $ python3 -m benchmarks.bench_append --new 10000
+"""
+import contextlib
+import io
+import json
+import pathlib
+import random
+import shutil
+import tempfile
+import time
+
+from benchmarks import synthetic
+from benchmarks.bench_query import QUERIES, load, make_parser
+from database import NEODatabase
+from extract import load_neos, load_approaches, load_approaches_after
+from filters import create_filters, limit
+
+
+def extend(cadfile, outfile, count, seed=0):
+    """Write cadfile with count rows, copied from random earlier rows, appended."""
+    with open(cadfile) as file:
+        document = json.load(file)
+    fields = document['fields']
+    cd, jd = fields.index('cd'), fields.index('jd')
+    rng = random.Random(seed)
+    last = synthetic._SPAN_MINUTES
+    for minute in range(last, last + count * 60, 60):
+        row = list(rng.choice(document['data']))
+        row[cd] = synthetic._to_cd(minute)
+        row[jd] = f'{synthetic._JD_EPOCH + minute / 1440:.9f}'
+        document['data'].append(row)
+    document['count'] = str(len(document['data']))
+    with open(outfile, 'w') as file:
+        json.dump(document, file, indent='\t')
+
+
+def run_queries(database):
+    """Return the first 100 results of each example query."""
+    results = []
+    for criteria in QUERIES.values():
+        results.append([(approach._designation, approach.time, approach.distance)
+                        for approach in limit(database.query(create_filters(**criteria)), 100)])
+    return results
+
+
+def main():
+    """Run the append benchmark."""
+    parser = make_parser("Benchmark adding new close approaches against a reload.")
+    parser.add_argument('--new', type=int, default=1000,
+                        help="How many close approaches to append.")
+    args = parser.parse_args()
+    if not (args.neofile and args.cadfile):
+        args.neofile, args.cadfile = synthetic.build(args.outdir)
+    database = load(args)
+    database.table, database.table.neo_groups
+
+    tmpdir = pathlib.Path(tempfile.mkdtemp())
+    try:
+        newfile = tmpdir / 'cad.json'
+        extend(args.cadfile, newfile, args.new)
+
+        start = time.perf_counter()
+        minutes, loaded = database.latest()
+        approaches = load_approaches_after(newfile, minutes, loaded)
+        read = time.perf_counter()
+        added = database.add_approaches(approaches)
+        appended = time.perf_counter()
+        incremental = run_queries(database)
+        queried = time.perf_counter()
+        print(f"Appended {added} approaches: read {(read - start) * 1000:.1f} ms, "
+              f"added {(appended - read) * 1000:.1f} ms, "
+              f"first queries {(queried - appended) * 1000:.1f} ms")
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            reloaded = NEODatabase(load_neos(args.neofile),
+                                   load_approaches(newfile, stream=True))
+        reloaded.table
+        loaded = time.perf_counter()
+        fresh = run_queries(reloaded)
+        queried = time.perf_counter()
+        print(f"Reloaded {len(reloaded._approaches)} approaches: "
+              f"loaded {(loaded - start) * 1000:.0f} ms, "
+              f"first queries {(queried - loaded) * 1000:.1f} ms")
+        assert incremental == fresh
+    finally:
+        shutil.rmtree(tmpdir)
+
+
+if __name__ == '__main__':
+    main()
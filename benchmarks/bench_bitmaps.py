@@ -0,0 +1,68 @@
+"""Time hazard and diameter queries with and without the approach bitmaps.
+
+Without bitmaps, a hazard filter looks up every approach's NEO; with them, a
+hazard-only query is answered from a precomputed row list, and the flag is
+ANDed with other filters' masks directly. Diameter filters only look up the
+approaches whose NEO has a known diameter. Reports the time of
+`ApproachTable.match` and of a full `NEODatabase.query` (without its result
+cache), on a synthetic full-size dataset by default.
+
+    $ python3 -m benchmarks.bench_bitmaps
+"""
+import contextlib
+import datetime
+from unittest import mock
+
+import numpy as np
+
+import columnar
+from benchmarks.bench_query import best_of, load, make_parser
+from filters import create_filters, HazardFilter
+
+
+QUERIES = {
+    'hazardous': {'hazardous': True},
+    'not hazardous': {'hazardous': False},
+    'hazardous, near': {'hazardous': True, 'distance_max': 0.1},
+    'not hazardous, 2020s': {'hazardous': False, 'start_date': datetime.date(2020, 1, 1),
+                             'end_date': datetime.date(2029, 12, 31)},
+    'not small': {'diameter_min': 0.1},
+    'not small, fast': {'diameter_min': 0.1, 'velocity_min': 20},
+}
+
+
+@contextlib.contextmanager
+def without_bitmaps(table):
+    """Look up every approach's NEO for NEO-level filters, as before bitmaps."""
+    with mock.patch.object(HazardFilter, 'bitmap_name', None), \
+            mock.patch.object(columnar, '_known_diameter_mask',
+                              lambda passing, table: passing[table.neo_index]):
+        yield
+
+
+def main():
+    """Run the bitmap benchmark."""
+    args = make_parser("Benchmark the hazard and diameter bitmaps.").parse_args()
+    db = load(args)
+    table = db.table
+    for name in ('hazardous', 'not_hazardous', 'diameter_known'):
+        table.bitmap_rows(name)
+
+    print(f"{'query':<22} {'matches':>8} {'match ms':>9} {'bitmap ms':>9} "
+          f"{'query ms':>9} {'bitmap ms':>9}")
+    for label, criteria in QUERIES.items():
+        filters = create_filters(**criteria)
+        with without_bitmaps(table):
+            expected = table.match(filters)
+            match_before = best_of(lambda: table.match(filters), args.repeat)
+            query_before = best_of(lambda: list(db.query(filters)), args.repeat)
+        assert np.array_equal(table.match(filters), expected), label
+        match_after = best_of(lambda: table.match(filters), args.repeat)
+        query_after = best_of(lambda: list(db.query(filters)), args.repeat)
+        print(f"{label:<22} {len(expected):>8} {match_before * 1000:>9.3f} "
+              f"{match_after * 1000:>9.3f} {query_before * 1000:>9.2f} "
+              f"{query_after * 1000:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
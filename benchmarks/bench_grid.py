@@ -0,0 +1,116 @@
+"""Time randomized range queries with and without the grid index.
+
+Generates random queries that bound two or three of date, distance and
+velocity, each range covering a random fraction of its attribute's values, and
+groups them by how many approaches they match. Each query is answered by
+`ApproachTable.match` with the grid index and without it (a scan of the date
+slice, or of every approach), and the results are checked to agree. Queries
+with and without a date range are reported apart, as the date slice alone
+already narrows the former. Runs on a synthetic full-size dataset by default.
+
+    $ python3 -m benchmarks.bench_grid
+    $ python3 -m benchmarks.bench_grid --queries 500 --cells 16
+"""
+import collections
+import contextlib
+import random
+import statistics
+import time
+
+import numpy as np
+
+import columnar
+from benchmarks.bench_query import load, make_parser
+from filters import create_filters
+from helpers import minutes_to_datetime
+
+
+# Upper bounds of the selectivity buckets, as fractions of all approaches.
+BUCKETS = (0.0001, 0.001, 0.01, 0.1, 1.0)
+
+
+@contextlib.contextmanager
+def without_grid():
+    """Never use the grid index."""
+    threshold = columnar.GRID_BELOW
+    columnar.GRID_BELOW = np.inf
+    try:
+        yield
+    finally:
+        columnar.GRID_BELOW = threshold
+
+
+def random_range(rng, column, name):
+    """Return create_filters arguments bounding a random range of a column."""
+    width = rng.choice((0.002, 0.01, 0.05, 0.2, 0.5))
+    start = rng.uniform(0, 1 - width)
+    low, high = np.quantile(column, [start, start + width])
+    if name == 'time':
+        low, high = (minutes_to_datetime(int(value)).date() for value in (low, high))
+        return {'start_date': low, 'end_date': high}
+    kinds = rng.choice(('both', 'min', 'max'))
+    bounds = {}
+    if kinds != 'max':
+        bounds[f'{name}_min'] = float(low)
+    if kinds != 'min':
+        bounds[f'{name}_max'] = float(high)
+    return bounds
+
+
+def time_match(table, filters, repeat):
+    """Return the best time of a few matches, and the matched rows."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = table.match(filters)
+        timings.append(time.perf_counter() - start)
+    return min(timings), rows
+
+
+def main():
+    """Run the grid index benchmark."""
+    parser = make_parser("Benchmark the grid index on random range queries.")
+    parser.add_argument('--queries', type=int, default=300)
+    parser.add_argument('--cells', type=int, default=columnar.GridIndex.DEFAULT_CELLS,
+                        help="Cells along each dimension of the grid.")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    db = load(args)
+    table = db.table
+
+    start = time.perf_counter()
+    table._grid = columnar.GridIndex.build(table, args.cells)
+    print(f"Built {table.grid} in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    rng = random.Random(args.seed)
+    results = collections.defaultdict(list)
+    for _ in range(args.queries):
+        dimensions = rng.sample(('time', 'distance', 'velocity'), rng.choice((2, 3)))
+        criteria = {}
+        for name in dimensions:
+            criteria.update(random_range(rng, getattr(table, name), name))
+        filters = create_filters(**criteria)
+
+        with without_grid():
+            scan, expected = time_match(table, filters, args.repeat)
+        grid, rows = time_match(table, filters, args.repeat)
+        assert np.array_equal(rows, expected), criteria
+        fraction = len(rows) / len(table)
+        bucket = next(bound for bound in BUCKETS if fraction <= bound)
+        results['time' in dimensions, bucket].append((scan, grid))
+
+    print(f"{'dates':<6} {'matches up to':>14} {'queries':>8} {'scan ms':>9} "
+          f"{'grid ms':>9} {'speedup':>8}")
+    for dated in (False, True):
+        for bound in BUCKETS:
+            timings = results[dated, bound]
+            if not timings:
+                continue
+            scan = statistics.median(timing for timing, _ in timings)
+            grid = statistics.median(timing for _, timing in timings)
+            print(f"{'yes' if dated else 'no':<6} {bound:>14.2%} {len(timings):>8} "
+                  f"{scan * 1000:>9.3f} {grid * 1000:>9.3f} {scan / grid:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
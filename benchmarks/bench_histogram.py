@@ -0,0 +1,67 @@
+"""Time histograms against counting the matching approaches one at a time.
+
+Bins the full dataset (a synthetic full-size one by default), with and without
+filters, by each calendar unit and by distance and velocity, with
+`NEODatabase.histogram` and by querying the matches and counting their bins
+in Python, as building a report from `query` output would. Both are checked
+to agree, and the best of several runs is reported.
+
+    $ python3 -m benchmarks.bench_histogram
+"""
+import bisect
+import collections
+import datetime
+
+from benchmarks.bench_query import best_of, load, make_parser
+from filters import create_filters
+
+
+QUERIES = {
+    'all': {},
+    'hazardous': {'hazardous': True},
+    'near, 2000s': {'start_date': datetime.date(2000, 1, 1),
+                    'end_date': datetime.date(2009, 12, 31), 'distance_max': 0.05},
+}
+
+TIME_BINS = {
+    'day': lambda time: time.date(),
+    'week': lambda time: time.date() - datetime.timedelta(days=time.weekday()),
+    'month': lambda time: time.date().replace(day=1),
+    'year': lambda time: datetime.date(time.year, 1, 1),
+}
+
+
+def count_by_row(db, filters, field, bins):
+    """Return a Counter of bin starts, one approach at a time."""
+    if field == 'time':
+        start = TIME_BINS[bins]
+        return collections.Counter(start(approach.time) for approach in db.query(filters))
+    edges = [start for start, _, _ in db.histogram(filters, field, bins)]
+    return collections.Counter(edges[max(0, bisect.bisect_right(edges, getattr(approach, field)) - 1)]
+                               for approach in db.query(filters))
+
+
+def main():
+    """Run the histogram benchmark."""
+    args = make_parser("Benchmark NEODatabase.histogram.").parse_args()
+    db = load(args)
+    db.table
+
+    print(f"{'query':<14} {'bins':<14} {'bins':>6} {'row by row ms':>13} {'histogram ms':>12}")
+    for label, criteria in QUERIES.items():
+        filters = create_filters(**criteria)
+        binnings = [('time', bins) for bins in TIME_BINS] + [('distance', 50), ('velocity', 50)]
+        for field, bins in binnings:
+            histogram = db.histogram(filters, field, bins)
+            expected = count_by_row(db, filters, field, bins)
+            assert {start: count for start, _, count in histogram if count} == expected, \
+                (label, field, bins)
+            rows = best_of(lambda: count_by_row(db, filters, field, bins), 1)
+            fast = best_of(lambda: db.histogram(filters, field, bins), args.repeat)
+            name = bins if field == 'time' else f'{field} x{bins}'
+            print(f"{label:<14} {name:<14} {len(histogram):>6} {rows * 1000:>13.0f} "
+                  f"{fast * 1000:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Time `NEODatabase` construction against the old binary-search linking.
+
+Before linking used a designation hash index, every approach was matched to
+its NEO with a recursive binary search over the sorted designations. That
+approach is reproduced here (`legacy_link`) so the two can be compared on the
+test data and on a synthetic dataset of a million approaches.
+
+    $ python3 -m benchmarks.bench_link
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import random
+import time
+
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from models import NearEarthObject, CloseApproach
+from benchmarks import synthetic
+
+
+def binary_search(arr, left, right, search):
+    """Recursive binary search, as previously used by database.py."""
+    if right >= left:
+        mid = left + (right - left) // 2
+        if arr[mid] == search:
+            return mid
+        elif arr[mid] > search:
+            return binary_search(arr, left, mid - 1, search)
+        else:
+            return binary_search(arr, mid + 1, right, search)
+    return -1
+
+
+def legacy_link(neos, approaches):
+    """Link approaches to NEOs the way NEODatabase.__init__ used to."""
+    neos = sorted(neos, key=lambda x: x.designation)
+    designations = [neo.designation for neo in neos]
+    groups = {}
+    for approach in approaches:
+        groups.setdefault(approach._designation, []).append(approach)
+        index = binary_search(designations, 0, len(designations) - 1, approach._designation)
+        approach.neo = neos[index]
+        neos[index].approaches.append(approach)
+
+
+def reset(neos, approaches):
+    """Undo any linking, so the objects can be linked again."""
+    for neo in neos:
+        neo.approaches = []
+    for approach in approaches:
+        approach.neo = None
+
+
+def synthetic_objects(neo_count, approach_count, seed=0):
+    """Create NEOs and approaches directly, without writing data files."""
+    rng = random.Random(seed)
+    neos = [NearEarthObject(pdes=synthetic._designation(rng, index), full_name='',
+                            name='', diameter='', pha='N')
+            for index in range(neo_count)]
+    designations = [neo.designation for neo in neos]
+    when = datetime.datetime(2000, 1, 1)
+    approaches = [CloseApproach(des=rng.choice(designations), time=when,
+                                dist_min=0.1, v_rel=10.0)
+                  for _ in range(approach_count)]
+    return neos, approaches
+
+
+def best_of(func, neos, approaches, repeat):
+    """Return the best wall time of linking the objects with func."""
+    timings = []
+    for _ in range(repeat):
+        reset(neos, approaches)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            func(neos, approaches)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    """Run the linking benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark NEODatabase construction.")
+    parser.add_argument('--approaches', type=int, default=1_000_000,
+                        help="Number of approaches in the synthetic dataset.")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    datasets = {
+        'test data': (load_neos(synthetic.TEST_NEO_FILE),
+                      load_approaches(synthetic.TEST_CAD_FILE)),
+        f'synthetic {args.approaches}': synthetic_objects(synthetic.FULL_NEO_COUNT,
+                                                          args.approaches),
+    }
+    print(f"{'dataset':<20} {'approaches':>10} {'binary ms':>10} {'hash ms':>10}")
+    for label, (neos, approaches) in datasets.items():
+        legacy = best_of(legacy_link, neos, approaches, args.repeat)
+        hashed = best_of(NEODatabase, neos, approaches, args.repeat)
+        print(f"{label:<20} {len(approaches):>10} {legacy * 1000:>10.1f} {hashed * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Compare the whole-document and streaming close approach loaders.
+
+For each CAD file, report the wall time and the peak traced memory (via
+`tracemalloc`) of `load_approaches` and of `load_approaches(stream=True)`. The
+memory pass is separate from the timing pass, since tracing slows Python down.
+
+    $ python3 -m benchmarks.bench_load
+    $ python3 -m benchmarks.bench_load --cadfile data/cad.json
+"""
+import argparse
+import gc
+import pathlib
+import time
+import tracemalloc
+
+from extract import load_approaches
+from benchmarks import synthetic
+
+
+def measure(func, *args, **kwargs):
+    """Return (seconds, peak MiB) for one call of func(*args, **kwargs)."""
+    gc.collect()
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    elapsed = time.perf_counter() - start
+    del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = func(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, peak / 2**20
+
+
+def main():
+    """Run the loader benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark the CAD loaders.")
+    parser.add_argument('--cadfile', type=pathlib.Path, action='append',
+                        help="CAD file(s) to load. Defaults to the test file "
+                             "and a synthetic full-size file.")
+    parser.add_argument('--outdir', type=pathlib.Path, default=pathlib.Path('/tmp/neo-data'),
+                        help="Where to write the synthetic data files.")
+    args = parser.parse_args()
+
+    cadfiles = args.cadfile or [synthetic.TEST_CAD_FILE, synthetic.build(args.outdir)[1]]
+    print(f"{'file':<24} {'loader':<10} {'seconds':>8} {'peak MiB':>9}")
+    for cadfile in cadfiles:
+        for label, stream in (('json.load', False), ('stream', True)):
+            seconds, peak = measure(load_approaches, cadfile, stream=stream)
+            print(f"{cadfile.name:<24} {label:<10} {seconds:>8.2f} {peak:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
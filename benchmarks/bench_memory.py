@@ -0,0 +1,61 @@
+"""Report the memory held by a fully-loaded NEODatabase, via `tracemalloc`.
+
+Loads the NEOs and close approaches, links them in a `NEODatabase`, and reports
+the memory still allocated afterwards (and the peak along the way), overall and
+per approach. With `--compact`, approaches store their time as an integer.
+
+    $ python3 -m benchmarks.bench_memory
+    $ python3 -m benchmarks.bench_memory --compact
+"""
+import argparse
+import contextlib
+import gc
+import io
+import pathlib
+import tracemalloc
+
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from benchmarks import synthetic
+
+
+def main():
+    """Run the memory report."""
+    parser = argparse.ArgumentParser(description="Report NEODatabase memory use.")
+    parser.add_argument('--neofile', type=pathlib.Path)
+    parser.add_argument('--cadfile', type=pathlib.Path)
+    parser.add_argument('--outdir', type=pathlib.Path, default=pathlib.Path('/tmp/neo-data'),
+                        help="Where to write the synthetic data files.")
+    parser.add_argument('--compact', action='store_true',
+                        help="Load approaches in compact mode.")
+    args = parser.parse_args()
+
+    if args.neofile and args.cadfile:
+        neofile, cadfile = args.neofile, args.cadfile
+    else:
+        neofile, cadfile = synthetic.build(args.outdir)
+    options = {'compact': True} if args.compact else {}
+
+    gc.collect()
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        neos = load_neos(neofile)
+        after_neos, _ = tracemalloc.get_traced_memory()
+        approaches = load_approaches(cadfile, stream=True, **options)
+        database = NEODatabase(neos, approaches)
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    mib = 2**20
+    print(f"{len(neos)} NEOs, {len(approaches)} approaches"
+          f"{' (compact)' if args.compact else ''}")
+    print(f"NEOs held          {after_neos / mib:8.1f} MiB  "
+          f"{after_neos / len(neos):6.0f} B/NEO")
+    print(f"database held      {current / mib:8.1f} MiB  "
+          f"{(current - after_neos) / len(approaches):6.0f} B/approach")
+    print(f"peak while loading {peak / mib:8.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
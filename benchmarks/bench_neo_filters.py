@@ -0,0 +1,76 @@
+"""Time NEO-level filters evaluated per NEO against evaluating them per approach.
+
+Queries on diameter and hazard status are answered by testing each NEO once and
+visiting only the approaches of the NEOs that pass. This compares that with
+testing those filters against every approach (as when the passing NEOs have
+too many approaches for it to pay off), on a synthetic full-size dataset by
+default. The row-by-row path, with a plain function among the filters, is
+timed as well.
+
+    $ python3 -m benchmarks.bench_neo_filters
+"""
+import contextlib
+import datetime
+
+import numpy as np
+
+import columnar
+from benchmarks.bench_query import best_of, load, make_parser
+from filters import create_filters
+
+
+QUERIES = {
+    'big, hazardous': {'diameter_min': 1, 'hazardous': True},
+    'very big': {'diameter_min': 5},
+    'big, hazardous, 2020s': {'diameter_min': 1, 'hazardous': True,
+                              'start_date': datetime.date(2020, 1, 1),
+                              'end_date': datetime.date(2029, 12, 31)},
+    'big, near': {'diameter_min': 1, 'distance_max': 0.1},
+    'hazardous': {'hazardous': True},
+    'not hazardous': {'hazardous': False},
+}
+
+
+@contextlib.contextmanager
+def per_approach():
+    """Never narrow to the passing NEOs' approaches."""
+    threshold = columnar.NEO_ROWS_BELOW
+    columnar.NEO_ROWS_BELOW = np.inf
+    try:
+        yield
+    finally:
+        columnar.NEO_ROWS_BELOW = threshold
+
+
+def main():
+    """Run the NEO-level filter benchmark."""
+    args = make_parser("Benchmark NEO-level filters.").parse_args()
+    db = load(args)
+    table = db.table
+    table.neo_groups
+
+    print(f"{'query':<24} {'NEOs':>6} {'matches':>8} {'per appr. ms':>12} "
+          f"{'per NEO ms':>10} {'row, before':>11} {'row, after':>10}")
+    for label, criteria in QUERIES.items():
+        filters = create_filters(**criteria)
+        neos = np.ones(len(table.neo_diameter), dtype=bool)
+        for filter in filters:
+            if filter.neo_level:
+                neos &= filter.neo_mask(table)
+        with per_approach():
+            expected = table.match(filters)
+            before = best_of(lambda: table.match(filters), args.repeat)
+        assert np.array_equal(table.match(filters), expected), label
+        after = best_of(lambda: table.match(filters), args.repeat)
+
+        # With a plain function, which can't be vectorized.
+        mixed = filters + [lambda approach: True]
+        row_before = best_of(lambda: list(db._scan(table.plan(mixed))), 1)
+        row_after = best_of(lambda: list(db.query(mixed)), 1)
+        print(f"{label:<24} {np.count_nonzero(neos):>6} {len(expected):>8} "
+              f"{before * 1000:>12.3f} {after * 1000:>10.3f} "
+              f"{row_before * 1000:>11.1f} {row_after * 1000:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
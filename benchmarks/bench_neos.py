@@ -0,0 +1,75 @@
+"""Time `load_neos` against the previous fixed-index, full-row loader.
+
+The previous loader tokenized every column of every row with `csv.reader` and
+picked fields by hard-coded position. The current one finds the columns by name
+and only splits each row as far as the last column it needs, so keeping extra
+columns further along the row costs more. Results are checked to be identical.
+
+    $ python3 -m benchmarks.bench_neos
+    $ python3 -m benchmarks.bench_neos --neofile data/neos.csv
+"""
+import argparse
+import contextlib
+import csv
+import io
+import pathlib
+import time
+
+from extract import load_neos
+from models import NearEarthObject
+from benchmarks import synthetic
+
+
+def load_neos_by_index(neo_csv_path):
+    """Read NEOs the way load_neos used to."""
+    neo_list = []
+    with open(neo_csv_path, 'r') as file:
+        reader = csv.reader(file)
+        next(reader)
+        for neo in reader:
+            neo_list.append(NearEarthObject(pdes=neo[3], full_name=neo[2],
+                                            name=neo[4], diameter=neo[15],
+                                            pha=neo[7]))
+    return neo_list
+
+
+def summarize(neos):
+    """Return comparable data for loaded NEOs."""
+    return [(neo.designation, neo.name, neo.full_name, repr(neo.diameter), neo.hazardous)
+            for neo in neos]
+
+
+def best_of(repeat, func, *args, **kwargs):
+    """Return the best wall time of func(*args, **kwargs) and its last result."""
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    """Run the NEO loading benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark load_neos.")
+    parser.add_argument('--neofile', type=pathlib.Path)
+    parser.add_argument('--outdir', type=pathlib.Path, default=pathlib.Path('/tmp/neo-data'),
+                        help="Where to write the synthetic data files.")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    neofile = args.neofile or synthetic.build(args.outdir)[0]
+    baseline, expected = best_of(args.repeat, load_neos_by_index, neofile)
+    print(f"{len(expected)} NEOs from {neofile}")
+    print(f"{'previous loader':<36} {baseline * 1000:7.1f} ms")
+
+    for extra_columns in ((), ('moid', 'a', 'e', 'i', 'H')):
+        seconds, neos = best_of(args.repeat, load_neos, neofile, extra_columns=extra_columns)
+        assert summarize(neos) == summarize(expected)
+        label = f"load_neos, extra {', '.join(extra_columns) or 'none'}"
+        print(f"{label:<36} {seconds * 1000:7.1f} ms  ({baseline / seconds:4.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
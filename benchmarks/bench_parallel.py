@@ -0,0 +1,80 @@
+"""Time the serial loaders against `load_parallel` with 1, 2, 4 and 8 workers.
+
+The serial row is what `main.py` does without `--workers`: `load_neos` and then
+`load_approaches(stream=True)`, one after the other. Every parallel result is
+checked against it.
+
+Speedups only mean anything with at least as many CPUs as workers: on fewer,
+the workers take turns, and the row measures the pool's overhead instead. Such
+rows are marked as not measuring scaling. No multi-core numbers have been
+recorded for this loader yet.
+
+    $ python3 -m benchmarks.bench_parallel
+    $ python3 -m benchmarks.bench_parallel --neofile data/neos.csv --cadfile data/cad.json
+"""
+import argparse
+import contextlib
+import io
+import os
+import pathlib
+import time
+
+from extract import load_neos, load_approaches, load_parallel
+from benchmarks import synthetic
+
+
+def serial(neofile, cadfile):
+    """Load both files one after the other, as main.py does by default."""
+    return load_neos(neofile), load_approaches(cadfile, stream=True)
+
+
+def summarize(neos, approaches):
+    """Return comparable data for loaded NEOs and approaches."""
+    return ([(neo.designation, neo.name, neo.hazardous) for neo in neos],
+            [(approach._designation, approach.time, approach.distance, approach.velocity)
+             for approach in approaches])
+
+
+def best_of(repeat, func, *args):
+    """Return the best wall time of func(*args) and its last result."""
+    timings = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = func(*args)
+            timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    """Run the parallel loading benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark load_parallel.")
+    parser.add_argument('--neofile', type=pathlib.Path)
+    parser.add_argument('--cadfile', type=pathlib.Path)
+    parser.add_argument('--outdir', type=pathlib.Path, default=pathlib.Path('/tmp/neo-data'),
+                        help="Where to write the synthetic data files.")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.neofile and args.cadfile:
+        neofile, cadfile = args.neofile, args.cadfile
+    else:
+        neofile, cadfile = synthetic.build(args.outdir)
+
+    # The CPUs this process may run on, which can be fewer than the machine's.
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') \
+        else os.cpu_count()
+    print(f"{cpus} CPUs")
+    baseline, result = best_of(args.repeat, serial, neofile, cadfile)
+    expected = summarize(*result)
+    print(f"{'serial':<12} {baseline:6.2f} s")
+    for workers in args.workers:
+        seconds, result = best_of(args.repeat, load_parallel, neofile, cadfile, workers)
+        assert summarize(*result) == expected
+        note = '' if workers <= cpus else f"  overhead only: {workers} workers, {cpus} CPUs"
+        print(f"{workers:>2} workers   {seconds:6.2f} s  ({baseline / seconds:4.2f}x){note}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Time `cd_to_datetime` per row against `datetime.strptime`.
+
+Every `cd` timestamp of a CAD file is parsed with `strptime` (the previous
+implementation), with the sliced fast path alone, and with the fast path and
+its date cache (cleared before each pass over the file), the default. All results are
+checked to be identical.
+
+    $ python3 -m benchmarks.bench_parse
+    $ python3 -m benchmarks.bench_parse --cadfile data/cad.json
+"""
+import argparse
+import datetime
+import json
+import pathlib
+import time
+
+import helpers
+from benchmarks import synthetic
+
+
+def strptime(calendar_date):
+    """Parse a `cd` string the way cd_to_datetime used to."""
+    return datetime.datetime.strptime(calendar_date, "%Y-%b-%d %H:%M")
+
+
+def uncached(calendar_date):
+    """Parse a `cd` string with cd_to_datetime, without its date cache."""
+    return helpers.cd_to_datetime(calendar_date, cache=False)
+
+
+def per_row(func, strings, repeat):
+    """Return the best time per string, in microseconds, of func over strings."""
+    timings = []
+    for _ in range(repeat):
+        helpers._cached_parse_cd_date.cache_clear()
+        start = time.perf_counter()
+        for calendar_date in strings:
+            func(calendar_date)
+        timings.append(time.perf_counter() - start)
+    return min(timings) / len(strings) * 1e6
+
+
+def main():
+    """Run the timestamp parsing benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark cd_to_datetime.")
+    parser.add_argument('--cadfile', type=pathlib.Path)
+    parser.add_argument('--outdir', type=pathlib.Path, default=pathlib.Path('/tmp/neo-data'),
+                        help="Where to write the synthetic data files.")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    cadfile = args.cadfile or synthetic.build(args.outdir)[1]
+    with open(cadfile) as file:
+        document = json.load(file)
+    column = document['fields'].index('cd')
+    strings = [row[column] for row in document['data']]
+
+    expected = [strptime(s) for s in strings]
+    assert [helpers.cd_to_datetime(s) for s in strings] == expected
+    assert [uncached(s) for s in strings] == expected
+
+    print(f"{len(strings)} timestamps from {cadfile}")
+    baseline = per_row(strptime, strings, args.repeat)
+    print(f"{'strptime':<32} {baseline:6.2f} us/row")
+
+    cost = per_row(uncached, strings, args.repeat)
+    print(f"{'cd_to_datetime, cache=False':<32} {cost:6.2f} us/row  ({baseline / cost:4.1f}x)")
+
+    cost = per_row(helpers.cd_to_datetime, strings, args.repeat)
+    info = helpers._cached_parse_cd_date.cache_info()
+    print(f"{'cd_to_datetime':<32} {cost:6.2f} us/row  ({baseline / cost:4.1f}x)"
+          f"  date cache hits {info.hits}, misses {info.misses} per pass")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""Count filter evaluations with and without selectivity-based filter ordering.
+
+Runs the multi-filter queries of `tests/test_query.py` over the test data (or
+the given files) and reports, per filter, how many approaches it is evaluated
+against: in the order `create_filters` builds them, and in the order of
+`ApproachTable.plan`. Both the vectorized path (approaches in each filter's
+mask) and the row-by-row path (calls to each filter) are counted, and each
+query is also timed on the vectorized path.
+
+    $ python3 -m benchmarks.bench_plan
+    $ python3 -m benchmarks.bench_plan --synthetic
+"""
+import argparse
+import collections
+import contextlib
+import datetime
+import io
+import pathlib
+import time
+
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import AttributeFilter, create_filters
+from benchmarks import synthetic
+from benchmarks.bench_query import best_of
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent.parent / 'tests').resolve()
+
+MARCH = {'start_date': datetime.date(2020, 3, 1), 'end_date': datetime.date(2020, 3, 31)}
+SPRING = {'start_date': datetime.date(2020, 3, 1), 'end_date': datetime.date(2020, 5, 31),
+          'distance_min': 0.05, 'distance_max': 0.5, 'velocity_min': 5, 'velocity_max': 25,
+          'diameter_min': 0.5, 'diameter_max': 1.5}
+
+# The queries of tests/test_query.py that combine more than one kind of filter.
+WORKLOADS = {
+    'march 2, max distance': {'date': datetime.date(2020, 3, 2), 'distance_max': 0.4},
+    'march 2, min distance': {'date': datetime.date(2020, 3, 2), 'distance_min': 0.1},
+    'march, distance': dict(MARCH, distance_min=0.1, distance_max=0.4),
+    'march, distance, max velocity': dict(MARCH, distance_min=0.1, distance_max=0.4,
+                                          velocity_max=20),
+    'march, distance, velocity': dict(MARCH, distance_min=0.1, distance_max=0.4,
+                                      velocity_min=10, velocity_max=20),
+    'spring, max diameter': dict(SPRING, diameter_min=None),
+    'spring, diameter': SPRING,
+    'spring, hazardous': dict(SPRING, hazardous=True),
+    'spring, not hazardous': dict(SPRING, hazardous=False),
+}
+
+
+class Counting:
+    """A filter wrapper counting the approaches the filter is evaluated on."""
+
+    def __init__(self, filter, counts):
+        """Wrap filter, adding its evaluations to counts[repr(filter)]."""
+        self.filter = filter
+        self.counts = counts
+
+    def __call__(self, approach):
+        """Test one approach, counting it."""
+        self.counts[repr(self.filter)] += 1
+        return self.filter(approach)
+
+
+@contextlib.contextmanager
+def counting_masks(counts):
+    """Count the approaches given to every AttributeFilter.mask."""
+    mask = AttributeFilter.mask
+
+    def counted(filter, table):
+        counts[repr(filter)] += len(table)
+        return mask(filter, table)
+
+    AttributeFilter.mask = counted
+    try:
+        yield
+    finally:
+        AttributeFilter.mask = mask
+
+
+@contextlib.contextmanager
+def unplanned(table):
+    """Evaluate filters in the order given, as before planning."""
+    table.plan = list
+    try:
+        yield
+    finally:
+        del table.plan
+
+
+def count_evaluations(db, filters):
+    """Return the evaluation counts of the vectorized and row-by-row paths."""
+    vectorized = collections.Counter()
+    with counting_masks(vectorized):
+        db.table.match(filters)
+    by_row = collections.Counter()
+    list(db._scan([Counting(filter, by_row) for filter in db.table.plan(filters)]))
+    return vectorized, by_row
+
+
+def main():
+    """Run the filter ordering benchmark."""
+    parser = argparse.ArgumentParser(description="Count filter evaluations.")
+    parser.add_argument('--neofile', type=pathlib.Path, default=TESTS_ROOT / 'test-neos-2020.csv')
+    parser.add_argument('--cadfile', type=pathlib.Path, default=TESTS_ROOT / 'test-cad-2020.json')
+    parser.add_argument('--synthetic', action='store_true',
+                        help="Use a synthetic full-size dataset instead.")
+    parser.add_argument('--outdir', type=pathlib.Path, default=pathlib.Path('/tmp/neo-data'),
+                        help="Where to write the synthetic data files.")
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.synthetic:
+        args.neofile, args.cadfile = synthetic.build(args.outdir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        db = NEODatabase(load_neos(args.neofile), load_approaches(args.cadfile))
+    table = db.table
+    print(f"{len(table)} approaches")
+
+    totals = collections.Counter()
+    for name, criteria in WORKLOADS.items():
+        filters = create_filters(**criteria)
+        with unplanned(table):
+            before_vec, _ = count_evaluations(db, filters)
+            before_time = best_of(lambda: table.match(filters), args.repeat)
+        before_row = collections.Counter()
+        list(db._scan([Counting(filter, before_row) for filter in filters]))
+        after_vec, after_row = count_evaluations(db, filters)
+        after_time = best_of(lambda: table.match(filters), args.repeat)
+
+        print(f"\n{name}: vectorized {before_time * 1000:.3f} ms -> {after_time * 1000:.3f} ms")
+        print(f"  {'filter':<48} {'vector before':>13} {'after':>7} "
+              f"{'row before':>10} {'after':>7}")
+        for filter in filters:
+            key = repr(filter)
+            print(f"  {key:<48} {before_vec[key]:>13} {after_vec[key]:>7} "
+                  f"{before_row[key]:>10} {after_row[key]:>7}")
+        totals.update({'vector before': sum(before_vec.values()),
+                       'vector after': sum(after_vec.values()),
+                       'row before': sum(before_row.values()),
+                       'row after': sum(after_row.values())})
+
+    print("\nTotal evaluations:")
+    for name in ('vector', 'row'):
+        print(f"  {name:<8} {totals[name + ' before']:>10} -> {totals[name + ' after']:>10}")
+
+
+if __name__ == '__main__':
+    main()
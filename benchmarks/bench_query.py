@@ -0,0 +1,85 @@
+"""Time `NEODatabase.query` against a row-by-row scan.
+
+Runs the example queries from `main.py` over a database loaded from the given
+files (a synthetic full-size dataset by default), checks that both paths return
+the same approaches in the same order, and reports the best of several runs.
+
+    $ python3 -m benchmarks.bench_query
+"""
+import argparse
+import datetime
+import pathlib
+import time
+
+from cache import QueryCache
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+from benchmarks import synthetic
+
+
+QUERIES = {
+    'all': {},
+    'date': {'date': datetime.date(1969, 7, 29)},
+    'month, near': {'start_date': datetime.date(2020, 1, 1),
+                    'end_date': datetime.date(2020, 1, 31), 'distance_max': 0.025},
+    'far future, fast': {'start_date': datetime.date(2050, 1, 1),
+                         'distance_min': 0.2, 'velocity_min': 50},
+    'date, big, hazardous': {'date': datetime.date(2020, 3, 14), 'velocity_max': 25,
+                             'diameter_min': 0.5, 'hazardous': True},
+    'small, not hazardous': {'start_date': datetime.date(2000, 1, 1),
+                             'diameter_max': 0.1, 'hazardous': False},
+    'hazardous, near, fast': {'hazardous': True, 'distance_max': 0.05,
+                              'velocity_min': 30},
+}
+
+
+def best_of(func, repeat):
+    """Return the best wall time, in seconds, of `repeat` calls to func."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def load(args):
+    """Load the database named by the command line arguments."""
+    if args.neofile and args.cadfile:
+        neofile, cadfile = args.neofile, args.cadfile
+    else:
+        neofile, cadfile = synthetic.build(args.outdir)
+    # Without a result cache, so that every run of a query does the search.
+    return NEODatabase(load_neos(neofile), load_approaches(cadfile, stream=True),
+                       cache=QueryCache(max_entries=0))
+
+
+def make_parser(description):
+    """Return an ArgumentParser with the options shared by query benchmarks."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--neofile', type=pathlib.Path)
+    parser.add_argument('--cadfile', type=pathlib.Path)
+    parser.add_argument('--outdir', type=pathlib.Path, default=pathlib.Path('/tmp/neo-data'),
+                        help="Where to write the synthetic data files.")
+    parser.add_argument('--repeat', type=int, default=5)
+    return parser
+
+
+def main():
+    """Run the query benchmark."""
+    args = make_parser("Benchmark NEODatabase.query.").parse_args()
+    db = load(args)
+
+    print(f"{'query':<24} {'matches':>8} {'scan ms':>9} {'query ms':>9}")
+    for label, criteria in QUERIES.items():
+        filters = create_filters(**criteria)
+        expected = list(db._scan(filters))
+        assert list(db.query(filters)) == expected, label
+        scan = best_of(lambda: list(db._scan(filters)), args.repeat)
+        query = best_of(lambda: list(db.query(filters)), args.repeat)
+        print(f"{label:<24} {len(expected):>8} {scan * 1000:>9.2f} {query * 1000:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Measure query latency while the data files are reloaded in the background.
+
+Loads a database (from a synthetic full-size dataset by default), then keeps
+answering the example queries of `bench_query` through a `reloader.Reloader`,
+before, during and after a reload of the data files (triggered by touching
+them). Reports the latency percentiles of each phase, how long the reload
+took, and the longest any query waited.
+
+Queries run in the main thread and the reload in a background thread, so
+they contend for the GIL: the reload slows queries down rather than
+blocking them.
+
+    $ python3 -m benchmarks.bench_reload
+    $ python3 -m benchmarks.bench_reload --snapshot-dir /tmp/neo-data/.snapshot
+"""
+import collections
+import contextlib
+import io
+import os
+import pathlib
+import statistics
+import time
+
+import snapshot
+from benchmarks import synthetic
+from benchmarks.bench_query import QUERIES, make_parser
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters, limit
+from reloader import Reloader
+
+
+def percentiles(latencies):
+    """Return the median, 99th percentile and maximum of latencies, in ms."""
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    return statistics.median(latencies) * 1000, p99 * 1000, latencies[-1] * 1000
+
+
+def main():
+    """Run the reload benchmark."""
+    parser = make_parser("Benchmark query latency during a reload.")
+    parser.add_argument('--snapshot-dir', type=pathlib.Path,
+                        help="Load from and save snapshots here, as main.py does "
+                             "(the reload then replaces the mapped snapshot).")
+    parser.add_argument('--seconds', type=float, default=2.0,
+                        help="How long to query before and after the reload.")
+    args = parser.parse_args()
+    if args.neofile and args.cadfile:
+        sources = (args.neofile, args.cadfile)
+    else:
+        sources = synthetic.build(args.outdir)
+
+    def load():
+        database = None
+        if args.snapshot_dir:
+            database = snapshot.load(args.snapshot_dir, sources)
+        if database is None:
+            with contextlib.redirect_stdout(io.StringIO()):
+                database = NEODatabase(load_neos(sources[0]),
+                                       load_approaches(sources[1], stream=True))
+            if args.snapshot_dir:
+                snapshot.save(database, args.snapshot_dir, sources)
+        return database
+
+    database = load()
+    database.table
+    reloader = Reloader(database, load, sources, settle=0)
+    filters = [create_filters(**criteria) for criteria in QUERIES.values()]
+
+    latencies = collections.defaultdict(list)
+    phase, started, reloaded = 'before', time.perf_counter(), None
+    while True:
+        for query in filters:
+            # Without the result cache, so that every query does the search.
+            current = reloader.database
+            current.cache.clear()
+            start = time.perf_counter()
+            list(limit(current.query(query), 100))
+            latencies[phase].append(time.perf_counter() - start)
+        now = time.perf_counter()
+        if phase == 'before' and now - started > args.seconds:
+            for source in sources:
+                os.utime(source)
+            reloader.check()
+            phase, reload_started = 'during', now
+        elif phase == 'during' and not reloader.reloading:
+            phase, reloaded = 'after', now
+        elif phase == 'after' and now - reloaded > args.seconds:
+            break
+
+    print(f"Reload took {(reloaded - reload_started) * 1000:.0f} ms")
+    print(f"{'phase':<8} {'queries':>8} {'median ms':>10} {'p99 ms':>8} {'max ms':>8}")
+    for phase in ('before', 'during', 'after'):
+        median, p99, worst = percentiles(latencies[phase])
+        print(f"{phase:<8} {len(latencies[phase]):>8} {median:>10.2f} {p99:>8.2f} "
+              f"{worst:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
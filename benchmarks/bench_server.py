@@ -0,0 +1,151 @@
+"""Load-test the HTTP server of `main.py serve`.
+
+Starts `main.py serve` on a free localhost port over the given data files (a
+synthetic full-size dataset by default), or uses the server at --url. Then
+several client threads, each on its own keep-alive connection, send a mix of
+`/inspect` requests for random NEOs and `/query` requests for the example
+queries of `bench_query` (with the default limit of 10). Reports requests per
+second and the median and 99th percentile latency, overall and per endpoint.
+
+    $ python3 -m benchmarks.bench_server
+    $ python3 -m benchmarks.bench_server --clients 16 --requests 200
+    $ python3 -m benchmarks.bench_server --url http://127.0.0.1:8000
+"""
+import argparse
+import concurrent.futures
+import contextlib
+import http.client
+import json
+import pathlib
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+
+from benchmarks import synthetic
+from benchmarks.bench_query import QUERIES
+
+
+PROJECT_ROOT = pathlib.Path(__file__).parent.parent.resolve()
+
+
+def query_targets():
+    """Return a /query target for each of the example queries."""
+    targets = []
+    for criteria in QUERIES.values():
+        params = {name: str(value).lower() if isinstance(value, bool) else str(value)
+                  for name, value in criteria.items()}
+        targets.append('/query?' + urllib.parse.urlencode(params))
+    return targets
+
+
+@contextlib.contextmanager
+def local_server(neofile, cadfile, *serve_args):
+    """Run `main.py serve` on a free port, and yield its URL once it's up.
+
+    serve_args are further arguments to the `serve` subcommand.
+    """
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    with tempfile.TemporaryDirectory() as snapshot_dir:
+        process = subprocess.Popen(
+            [sys.executable, str(PROJECT_ROOT / 'main.py'), '--neofile', str(neofile),
+             '--cadfile', str(cadfile), '--snapshot-dir', snapshot_dir,
+             'serve', '--port', str(port), *serve_args],
+            stdout=subprocess.DEVNULL)
+        try:
+            while True:
+                if process.poll() is not None:
+                    raise RuntimeError("The server exited before it started listening.")
+                try:
+                    socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                    break
+                except OSError:
+                    time.sleep(0.2)
+            yield f'http://127.0.0.1:{port}'
+        finally:
+            process.terminate()
+            process.wait()
+
+
+def run_client(url, targets, count, seed):
+    """Send count random requests on one connection; return (target, seconds) pairs."""
+    rng = random.Random(seed)
+    address = urllib.parse.urlsplit(url)
+    connection = http.client.HTTPConnection(address.hostname, address.port)
+    timings = []
+    for _ in range(count):
+        target = rng.choice(targets)
+        start = time.perf_counter()
+        connection.request('GET', target)
+        response = connection.getresponse()
+        response.read()
+        timings.append((target, time.perf_counter() - start))
+        if response.status != 200:
+            raise RuntimeError(f"{target} answered {response.status}")
+    connection.close()
+    return timings
+
+
+def report(label, latencies, seconds):
+    """Print the throughput and latency percentiles of some requests."""
+    cuts = statistics.quantiles(latencies, n=100)
+    print(f"{label:<10} {len(latencies):>8} {len(latencies) / seconds:>8.0f} "
+          f"{cuts[49] * 1000:>8.2f} {cuts[98] * 1000:>8.2f}")
+
+
+def main():
+    """Run the server load test."""
+    parser = argparse.ArgumentParser(description="Load-test `main.py serve`.")
+    parser.add_argument('--url', help="An already running server to test.")
+    parser.add_argument('--neofile', type=pathlib.Path)
+    parser.add_argument('--cadfile', type=pathlib.Path)
+    parser.add_argument('--outdir', type=pathlib.Path, default=pathlib.Path('/tmp/neo-data'),
+                        help="Where to write the synthetic data files.")
+    parser.add_argument('--clients', type=int, default=8,
+                        help="Number of concurrent client connections.")
+    parser.add_argument('--requests', type=int, default=250,
+                        help="Number of requests per client.")
+    args = parser.parse_args()
+
+    if args.url:
+        server = contextlib.nullcontext(args.url)
+    elif args.neofile and args.cadfile:
+        server = local_server(args.neofile, args.cadfile)
+    else:
+        server = local_server(*synthetic.build(args.outdir))
+
+    with server as url:
+        # Find some NEOs to inspect, and warm up the server.
+        address = urllib.parse.urlsplit(url)
+        connection = http.client.HTTPConnection(address.hostname, address.port)
+        connection.request('GET', '/query?limit=500')
+        results = json.load(connection.getresponse())['results']
+        connection.close()
+        designations = sorted({result['neo']['designation'] for result in results})
+        targets = ['/inspect?' + urllib.parse.urlencode({'pdes': designation})
+                   for designation in designations] + query_targets() * 10
+
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(args.clients) as executor:
+            timings = executor.map(run_client, [url] * args.clients,
+                                   [targets] * args.clients,
+                                   [args.requests] * args.clients, range(args.clients))
+            timings = [timing for client in timings for timing in client]
+        seconds = time.perf_counter() - start
+
+    print(f"{args.clients} clients x {args.requests} requests, {seconds:.2f} s")
+    print(f"{'endpoint':<10} {'requests':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    report('all', [latency for _, latency in timings], seconds)
+    for endpoint in ('/inspect', '/query'):
+        report(endpoint, [latency for target, latency in timings
+                          if target.startswith(endpoint + '?')], seconds)
+
+
+if __name__ == '__main__':
+    main()
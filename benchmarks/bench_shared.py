@@ -0,0 +1,131 @@
+"""Measure the memory of several worker processes over the same dataset.
+
+Starts `--workers` processes at once, each of which either loads the database
+from one snapshot with `snapshot.load` (without the data files, as a worker
+handed the snapshot directory would), or parses the data files itself. Each
+worker answers the example queries of `bench_query`, then, while all of them
+are still running, reports its load time and memory from
+`/proc/self/smaps_rollup` (so this runs on Linux only):
+
+    rss         resident memory
+    pss         resident memory, with each shared page split among its sharers
+    shared      resident pages that other processes map too
+    private     resident pages that only this process maps
+
+A snapshot's columns are mapped from the same files, so they are shared pages:
+their memory is paid for once, however many workers there are.
+
+    $ python3 -m benchmarks.bench_shared
+    $ python3 -m benchmarks.bench_shared --workers 8
+"""
+import argparse
+import contextlib
+import io
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+import snapshot
+from benchmarks import synthetic
+from benchmarks.bench_query import QUERIES, make_parser
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters, limit
+
+
+MODES = ('snapshot', 'parse')
+
+
+def memory_mib():
+    """Return the rss, pss, shared and private memory of this process, in MiB."""
+    fields = {}
+    with open('/proc/self/smaps_rollup') as file:
+        for line in file:
+            name, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[name] = int(value.split()[0]) / 1024
+    return {
+        'rss': fields['Rss'],
+        'pss': fields['Pss'],
+        'shared': fields['Shared_Clean'] + fields['Shared_Dirty'],
+        'private': fields['Private_Clean'] + fields['Private_Dirty'],
+    }
+
+
+def worker(mode, sources, snapshot_dir):
+    """Load and query a database, then report once told every worker is ready."""
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == 'snapshot':
+            database = snapshot.load(snapshot_dir)
+        else:
+            database = NEODatabase(load_neos(sources[0]),
+                                   load_approaches(sources[1], stream=True))
+    loaded = time.perf_counter() - start
+    for criteria in QUERIES.values():
+        list(limit(database.query(create_filters(**criteria)), 100))
+
+    print('ready', flush=True)
+    sys.stdin.readline()
+    json.dump(dict(load=loaded, **memory_mib()), sys.stdout)
+
+
+def run(mode, sources, snapshot_dir, workers):
+    """Run workers at once in mode, and return their reports."""
+    command = [sys.executable, '-m', 'benchmarks.bench_shared', '--worker', mode,
+               '--neofile', str(sources[0]), '--cadfile', str(sources[1]),
+               '--snapshot-dir', str(snapshot_dir)]
+    processes = [subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                  text=True)
+                 for _ in range(workers)]
+    for process in processes:
+        assert process.stdout.readline().strip() == 'ready'
+    reports = []
+    for process in processes:
+        output, _ = process.communicate('measure\n')
+        reports.append(json.loads(output))
+    return reports
+
+
+def main():
+    """Run the shared memory benchmark."""
+    parser = make_parser("Measure the memory of several workers over one dataset.")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--snapshot-dir',
+                        help="The snapshot to share. Defaults to .snapshot in --outdir.")
+    parser.add_argument('--worker', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.neofile and args.cadfile:
+        sources = (args.neofile, args.cadfile)
+    else:
+        sources = synthetic.build(args.outdir)
+    snapshot_dir = args.snapshot_dir or f'{args.outdir}/.snapshot'
+
+    if args.worker:
+        worker(args.worker, sources, snapshot_dir)
+        return
+
+    if snapshot.load(snapshot_dir, sources) is None:
+        with contextlib.redirect_stdout(io.StringIO()):
+            database = NEODatabase(load_neos(sources[0]),
+                                   load_approaches(sources[1], stream=True))
+        snapshot.save(database, snapshot_dir, sources)
+        del database
+
+    print(f"{args.workers} workers, MiB per worker (median)")
+    print(f"{'mode':<9} {'load ms':>8} {'rss':>7} {'pss':>7} {'shared':>7} {'private':>8} "
+          f"{'total pss':>10}")
+    for mode in MODES:
+        reports = run(mode, sources, snapshot_dir, args.workers)
+        median = {name: statistics.median(report[name] for report in reports)
+                  for name in reports[0]}
+        total = sum(report['pss'] for report in reports)
+        print(f"{mode:<9} {median['load'] * 1000:>8.0f} {median['rss']:>7.1f} "
+              f"{median['pss']:>7.1f} {median['shared']:>7.1f} {median['private']:>8.1f} "
+              f"{total:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
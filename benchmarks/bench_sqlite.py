@@ -0,0 +1,119 @@
+"""Compare the in-memory and SQLite-backed databases side by side.
+
+For each engine, a fresh process loads the database (from a synthetic full-size
+dataset by default) and answers the example queries of `bench_query`, checking
+that both engines return the same approaches. Reported per engine are the time
+to load (for SQLite, to open a file already ingested; ingesting it, if
+needed, is timed apart), the resident memory after loading and at its peak, and
+the best time to fetch every match of each query.
+
+SQLite's own memory isn't seen by `tracemalloc`, hence the separate processes
+and resident set sizes.
+
+    $ python3 -m benchmarks.bench_sqlite
+    $ python3 -m benchmarks.bench_sqlite --sqlite-file /tmp/neo-data/neo.sqlite --repeat 3
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import pathlib
+import resource
+import subprocess
+import sys
+import time
+
+import sqlstore
+from benchmarks import synthetic
+from benchmarks.bench_query import QUERIES, best_of, make_parser
+from cache import QueryCache
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+
+
+ENGINES = ('memory', 'sqlite')
+
+
+def resident_mib():
+    """Return the resident set size of this process, in MiB."""
+    with open('/proc/self/statm') as file:
+        pages = int(file.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+
+def run_engine(engine, sources, sqlite_file, repeat):
+    """Load a database with engine, query it, and return the measurements."""
+    report = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        if engine == 'sqlite':
+            database = sqlstore.load(sqlite_file, sources, cache=QueryCache(max_entries=0))
+        else:
+            # Without a result cache, so that every run of a query does the search.
+            database = NEODatabase(load_neos(sources[0]),
+                                   load_approaches(sources[1], stream=True),
+                                   cache=QueryCache(max_entries=0))
+            database.table
+    report['load'] = time.perf_counter() - start
+    report['resident'] = resident_mib()
+
+    report['queries'], report['matches'] = {}, {}
+    for name, criteria in QUERIES.items():
+        filters = create_filters(**criteria)
+        report['queries'][name] = best_of(lambda: list(database.query(filters)), repeat)
+        report['matches'][name] = [approach.neo.designation + str(approach.time)
+                                   for approach in database.query(filters)]
+    report['peak'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2**10
+    return report
+
+
+def main():
+    """Run the side-by-side benchmark."""
+    parser = make_parser("Compare the in-memory and SQLite-backed databases.")
+    parser.add_argument('--sqlite-file', type=pathlib.Path,
+                        help="The SQLite database file, ingested if it isn't up to "
+                             "date. Defaults to neo.sqlite in --outdir.")
+    parser.add_argument('--engine', choices=ENGINES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.neofile and args.cadfile:
+        sources = (args.neofile, args.cadfile)
+    else:
+        sources = synthetic.build(args.outdir)
+    sqlite_file = args.sqlite_file or pathlib.Path(args.outdir) / 'neo.sqlite'
+
+    if args.engine:
+        json.dump(run_engine(args.engine, sources, sqlite_file, args.repeat), sys.stdout)
+        return
+
+    if sqlstore.load(sqlite_file, sources) is None:
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            sqlstore.ingest(sqlite_file, *sources)
+        print(f"Ingested {sqlite_file} in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    reports = {}
+    for engine in ENGINES:
+        command = [sys.executable, '-m', 'benchmarks.bench_sqlite', '--engine', engine,
+                   '--neofile', str(sources[0]), '--cadfile', str(sources[1]),
+                   '--sqlite-file', str(sqlite_file), '--repeat', str(args.repeat)]
+        result = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True)
+        reports[engine] = json.loads(result.stdout)
+    memory, sqlite = reports['memory'], reports['sqlite']
+    assert memory['matches'] == sqlite['matches']
+
+    print(f"{'':<30} {'memory':>10} {'sqlite':>10}")
+    print(f"{'load ms':<30} {memory['load'] * 1000:>10.0f} {sqlite['load'] * 1000:>10.1f}")
+    print(f"{'resident MiB after load':<30} {memory['resident']:>10.0f} "
+          f"{sqlite['resident']:>10.0f}")
+    print(f"{'peak resident MiB':<30} {memory['peak']:>10.0f} {sqlite['peak']:>10.0f}")
+    print(f"{'query ms (matches)':<30}")
+    for name in QUERIES:
+        label = f"{name} ({len(memory['matches'][name])})"
+        print(f"  {label:<28} "
+              f"{memory['queries'][name] * 1000:>10.2f} {sqlite['queries'][name] * 1000:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Compare cold and warm start-up of `main.py inspect`.
+
+A cold start parses the data files (and saves a snapshot); a warm start loads
+that snapshot. Each start is a fresh `main.py` process, so the times include
+interpreter start-up and imports. The in-process time to load the snapshot and
+answer the lookup is reported separately.
+
+    $ python3 -m benchmarks.bench_startup
+    $ python3 -m benchmarks.bench_startup --neofile data/neos.csv --cadfile data/cad.json --pdes 433
+"""
+import argparse
+import csv
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import snapshot
+from benchmarks import synthetic
+
+
+MAIN = pathlib.Path(__file__).parent.parent.resolve() / 'main.py'
+
+
+def run_inspect(neofile, cadfile, snapshot_dir, pdes):
+    """Run `main.py inspect` in a new process and return its wall time."""
+    command = [sys.executable, str(MAIN), '--neofile', str(neofile), '--cadfile', str(cadfile),
+               '--snapshot-dir', str(snapshot_dir), 'inspect', '--verbose', '--pdes', pdes]
+    return timed(command)
+
+
+def timed(command):
+    """Run command in a new process and return its wall time."""
+    start = time.perf_counter()
+    subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+def main():
+    """Run the start-up benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark cold and warm start-up.")
+    parser.add_argument('--neofile', type=pathlib.Path)
+    parser.add_argument('--cadfile', type=pathlib.Path)
+    parser.add_argument('--outdir', type=pathlib.Path, default=pathlib.Path('/tmp/neo-data'),
+                        help="Where to write the synthetic data files.")
+    parser.add_argument('--pdes', help="Designation to inspect. Defaults to the first NEO.")
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.neofile and args.cadfile:
+        neofile, cadfile = args.neofile, args.cadfile
+    else:
+        neofile, cadfile = synthetic.build(args.outdir)
+    pdes = args.pdes
+    if pdes is None:
+        with open(neofile) as file:
+            reader = csv.reader(file)
+            next(reader)
+            pdes = next(reader)[3]
+
+    snapshot_dir = pathlib.Path(tempfile.mkdtemp()) / 'snapshot'
+    try:
+        cold = run_inspect(neofile, cadfile, snapshot_dir, pdes)
+        warm = min(run_inspect(neofile, cadfile, snapshot_dir, pdes)
+                   for _ in range(args.repeat))
+        empty = min(timed([sys.executable, '-c', 'pass']) for _ in range(args.repeat))
+
+        start = time.perf_counter()
+        database = snapshot.load(snapshot_dir, (neofile, cadfile))
+        list(database.get_neo_by_designation(pdes).approaches)
+        in_process = time.perf_counter() - start
+    finally:
+        shutil.rmtree(snapshot_dir.parent)
+
+    print(f"cold start (parse + save snapshot)   {cold * 1000:8.0f} ms")
+    print(f"warm start (load snapshot)           {warm * 1000:8.0f} ms")
+    print(f"  of which an empty interpreter      {empty * 1000:8.0f} ms")
+    print(f"snapshot load + inspect, in process  {in_process * 1000:8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
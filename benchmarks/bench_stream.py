@@ -0,0 +1,123 @@
+"""Time small requests to `main.py serve` while a full-table export is in flight.
+
+Starts `main.py serve --asyncio` (or, with --threaded, the threaded server) on a
+free localhost port over the given data files (a synthetic full-size dataset by
+default). Then, on one connection, sends `/inspect` requests for random NEOs one
+after another: first alone, then while another connection downloads every
+approach with `/query?limit=0`. Reports the median and 99th percentile latency
+of the inspections in both cases, and how long the export took and how soon its
+first bytes arrived.
+
+    $ python3 -m benchmarks.bench_stream
+    $ python3 -m benchmarks.bench_stream --threaded
+    $ python3 -m benchmarks.bench_stream --chunk-rows 100
+"""
+import argparse
+import http.client
+import json
+import pathlib
+import random
+import statistics
+import threading
+import time
+import urllib.parse
+
+from benchmarks import synthetic
+from benchmarks.bench_server import local_server
+
+
+def inspect_latencies(connection, designations, seed, until=None, count=200):
+    """Time inspections, until the event is set or else count of them."""
+    rng = random.Random(seed)
+    latencies = []
+    while not until.is_set() if until else len(latencies) < count:
+        target = '/inspect?' + urllib.parse.urlencode({'pdes': rng.choice(designations)})
+        start = time.perf_counter()
+        connection.request('GET', target)
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start)
+        if response.status != 200:
+            raise RuntimeError(f"{target} answered {response.status}")
+    return latencies
+
+
+def export(address, timings, done):
+    """Download every approach; record the seconds to the first byte and to the end."""
+    connection = http.client.HTTPConnection(address.hostname, address.port)
+    start = time.perf_counter()
+    connection.request('GET', '/query?limit=0')
+    response = connection.getresponse()
+    response.read(1)
+    timings['first byte'] = time.perf_counter() - start
+    size = 1 + len(response.read())
+    timings['export'] = time.perf_counter() - start
+    timings['bytes'] = size
+    connection.close()
+    done.set()
+
+
+def report(label, latencies):
+    """Print the number and latency percentiles of some inspections."""
+    if len(latencies) < 2:
+        print(f"{label:<16} {len(latencies):>8}   (too few to measure)")
+        return
+    cuts = statistics.quantiles(latencies, n=100)
+    print(f"{label:<16} {len(latencies):>8} {cuts[49] * 1000:>8.2f} {cuts[98] * 1000:>8.2f}")
+
+
+def main():
+    """Run the streaming benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Time `inspect` requests during a full-table export.")
+    parser.add_argument('--neofile', type=pathlib.Path)
+    parser.add_argument('--cadfile', type=pathlib.Path)
+    parser.add_argument('--outdir', type=pathlib.Path, default=pathlib.Path('/tmp/neo-data'),
+                        help="Where to write the synthetic data files.")
+    parser.add_argument('--threaded', action='store_true',
+                        help="Test the threaded server instead of the asyncio one.")
+    parser.add_argument('--chunk-rows', type=int,
+                        help="Approaches per chunk for the asyncio server.")
+    args = parser.parse_args()
+
+    if args.neofile and args.cadfile:
+        neofile, cadfile = args.neofile, args.cadfile
+    else:
+        neofile, cadfile = synthetic.build(args.outdir)
+    serve_args = []
+    if not args.threaded:
+        serve_args.append('--asyncio')
+        if args.chunk_rows:
+            serve_args += ['--chunk-rows', str(args.chunk_rows)]
+
+    with local_server(neofile, cadfile, *serve_args) as url:
+        address = urllib.parse.urlsplit(url)
+        connection = http.client.HTTPConnection(address.hostname, address.port)
+        connection.request('GET', '/query?limit=500')
+        response = connection.getresponse()
+        body = response.read().decode()
+        if args.threaded:
+            results = json.loads(body)['results']
+        else:
+            results = [json.loads(line) for line in body.splitlines()]
+        designations = sorted({result['neo']['designation'] for result in results})
+
+        idle = inspect_latencies(connection, designations, seed=0)
+
+        timings, done = {}, threading.Event()
+        exporter = threading.Thread(target=export, args=(address, timings, done))
+        exporter.start()
+        busy = inspect_latencies(connection, designations, seed=1, until=done)
+        exporter.join()
+        connection.close()
+
+    print(f"{'threaded' if args.threaded else 'asyncio'} server, "
+          f"exported {timings['bytes'] / 1e6:.1f} MB in {timings['export']:.2f} s, "
+          f"first byte after {timings['first byte'] * 1000:.1f} ms")
+    print(f"{'inspect':<16} {'requests':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    report('idle', idle)
+    report('during export', busy)
+
+
+if __name__ == '__main__':
+    main()
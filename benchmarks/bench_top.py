@@ -0,0 +1,59 @@
+"""Time top-K queries against sorting every match.
+
+Runs "the K closest / fastest / ..." queries both through `NEODatabase.top`
+(a partition of the matching rows, then a sort of just K of them) and by
+sorting every match and keeping the first K, checks that both return the same
+approaches, and reports the best of several runs. The row-by-row path, with a
+plain function among the filters, compares a bounded heap with a full sort.
+Runs on a synthetic full-size dataset by default.
+
+    $ python3 -m benchmarks.bench_top
+"""
+import datetime
+
+from benchmarks.bench_query import best_of, load, make_parser
+from filters import create_filters
+
+
+QUERIES = {
+    '20 closest in 2030': ({'start_date': datetime.date(2030, 1, 1),
+                            'end_date': datetime.date(2030, 12, 31)}, 'distance', 20, False),
+    '50 fastest hazardous': ({'hazardous': True}, 'velocity', 50, True),
+    '10 biggest': ({}, 'diameter', 10, True),
+    '100 latest near': ({'distance_max': 0.05}, 'date', 100, True),
+    '1000 slowest': ({}, 'velocity', 1000, False),
+}
+
+
+def main():
+    """Run the top-K benchmark."""
+    args = make_parser("Benchmark top-K queries.").parse_args()
+    db = load(args)
+    table = db.table
+
+    print(f"{'query':<22} {'matches':>8} {'sort ms':>9} {'top ms':>9} "
+          f"{'row sort ms':>11} {'row heap ms':>11}")
+    for label, (criteria, sort_by, count, descending) in QUERIES.items():
+        filters = create_filters(**criteria)
+        rows = db._match(filters) if filters else None
+
+        def sort_all():
+            return table.top(sort_by, None, descending, rows)[:count]
+
+        expected = list(db.top(filters, sort_by, None, descending))[:count]
+        assert list(db.top(filters, sort_by, count, descending)) == expected, label
+        full = best_of(sort_all, args.repeat)
+        top = best_of(lambda: table.top(sort_by, count, descending, rows), args.repeat)
+
+        # With a plain function, which can't be vectorized.
+        mixed = filters + [lambda approach: True]
+        assert list(db.top(mixed, sort_by, count, descending)) == expected, label
+        row_sort = best_of(lambda: db._top_of(db.query(mixed), sort_by, None, descending), 1)
+        row_heap = best_of(lambda: list(db.top(mixed, sort_by, count, descending)), 1)
+        matches = len(table) if rows is None else len(rows)
+        print(f"{label:<22} {matches:>8} {full * 1000:>9.2f} {top * 1000:>9.2f} "
+              f"{row_sort * 1000:>11.0f} {row_heap * 1000:>11.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Time and trace a full export of every close approach to JSON and CSV.
+
+Compares the previous `write_to_json` (build a list of every element, then
+`json.dump` it) with the streaming `write_to_json` and with `write_to_ndjson`,
+and the previous `write_to_csv` (one `writerow` of `csvMaker` per approach) with
+the batched one, all fed straight from `NEODatabase.query`. The outputs of each
+format are checked to be identical. Peak memory is traced (via `tracemalloc`) in a separate pass, since
+tracing slows Python down.
+
+    $ python3 -m benchmarks.bench_write --repeat 3
+"""
+import contextlib
+import csv
+import gc
+import io
+import json
+import pathlib
+import tempfile
+import time
+import tracemalloc
+
+from write import write_to_csv, write_to_json, write_to_ndjson
+from benchmarks.bench_query import make_parser, load
+
+
+def write_to_json_buffered(results, filename):
+    """Write results the way write_to_json used to."""
+    elements = [approach.jsonMaker for approach in results]
+    with open(filename, 'w') as outfile:
+        json.dump(elements, outfile, indent=2)
+
+
+def write_to_csv_by_row(results, filename):
+    """Write results the way write_to_csv used to (but with escapechar=None)."""
+    fieldnames = ('datetime_utc', 'distance_au', 'velocity_km_s',
+                  'designation', 'name', 'diameter_km', 'potentially_hazardous')
+    with open(filename, mode='w', newline='') as csvfile:
+        filewriter = csv.writer(csvfile, dialect="myDialect")
+        filewriter.writerow(fieldnames)
+        for approach in results:
+            filewriter.writerow(approach.csvMaker)
+
+
+def measure(db, writer, path, repeat):
+    """Return (best seconds, peak MiB) of exporting every approach with writer."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        timings = []
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            writer(db.query(), path)
+            timings.append(time.perf_counter() - start)
+
+        gc.collect()
+        tracemalloc.start()
+        writer(db.query(), path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return min(timings), peak / 2**20
+
+
+def main():
+    """Run the export benchmark."""
+    args = make_parser("Benchmark write_to_json.").parse_args()
+    db = load(args)
+    # Create every CloseApproach up front, so only the writers are measured.
+    count = sum(1 for _ in db.query())
+
+    print(f"{count} approaches")
+    print(f"{'writer':<24} {'seconds':>8} {'peak MiB':>9} {'file MiB':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        directory = pathlib.Path(directory)
+        writers = (('json, buffered', write_to_json_buffered, 'buffered.json'),
+                   ('json, streamed', write_to_json, 'streamed.json'),
+                   ('ndjson', write_to_ndjson, 'streamed.ndjson'),
+                   ('csv, by row', write_to_csv_by_row, 'by_row.csv'),
+                   ('csv, batched', write_to_csv, 'batched.csv'))
+        for label, writer, name in writers:
+            seconds, peak = measure(db, writer, directory / name, args.repeat)
+            size = (directory / name).stat().st_size / 2**20
+            print(f"{label:<24} {seconds:>8.2f} {peak:>9.1f} {size:>9.1f}")
+        for first, second in (('buffered.json', 'streamed.json'),
+                              ('by_row.csv', 'batched.csv')):
+            assert (directory / first).read_bytes() == (directory / second).read_bytes()
+
+
+if __name__ == '__main__':
+    main()
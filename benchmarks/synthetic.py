@@ -0,0 +1,139 @@
+"""Generate synthetic, full-size data files for the benchmarks.
+
+The real `neos.csv` and `cad.json` are large and aren't always available, so the
+benchmarks can build look-alike files with the same layout and roughly the same
+number of rows (~24k NEOs and ~407k close approaches). The generator is seeded,
+so repeated runs produce identical files.
+
+    $ python3 -m benchmarks.synthetic --outdir /tmp/neo-data
+"""
+import argparse
+import datetime
+import json
+import pathlib
+import random
+
+from helpers import datetime_to_str
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent.parent / 'tests').resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+FULL_NEO_COUNT = 23967
+FULL_CAD_COUNT = 406785
+
+CAD_FIELDS = ["des", "orbit_id", "jd", "cd", "dist", "dist_min", "dist_max",
+              "v_rel", "v_inf", "t_sigma_f", "h"]
+
+# Every column of the CSV header, in NASA's order.
+with open(TEST_NEO_FILE) as _file:
+    NEO_HEADER = _file.readline().rstrip('\n').split(',')
+
+_START = datetime.datetime(1900, 1, 1)
+_SPAN_MINUTES = 300 * 366 * 24 * 60
+_JD_EPOCH = 2415020.5  # Julian date of 1900-01-01 00:00
+
+
+def _designation(rng, index):
+    """Return a plausible primary designation for the index-th NEO."""
+    if index % 3 == 0:
+        return str(1000 + index)
+    year = rng.randint(1990, 2020)
+    letters = chr(65 + rng.randrange(26)) + chr(65 + rng.randrange(26))
+    return f'{year} {letters}{index}'
+
+
+def write_neos(path, count=FULL_NEO_COUNT, seed=0):
+    """Write a synthetic `neos.csv` with `count` rows and return the designations."""
+    rng = random.Random(seed)
+    designations = []
+    with open(path, 'w') as file:
+        file.write(','.join(NEO_HEADER) + '\n')
+        for index in range(count):
+            pdes = _designation(rng, index)
+            designations.append(pdes)
+            name = f'Name{index}' if index % 10 == 0 else ''
+            row = [''] * len(NEO_HEADER)
+            row[0] = f'a{index:07d}'
+            row[1] = str(2000000 + index)
+            row[2] = f'"   {pdes} {name}"'.replace(' "', '"')
+            row[3] = pdes
+            row[4] = name
+            row[6] = 'Y'
+            row[7] = 'Y' if rng.random() < 0.1 else 'N'
+            row[8] = f'{rng.uniform(10, 30):.1f}'
+            if rng.random() < 0.1:
+                row[15] = f'{rng.lognormvariate(-1, 1):.3f}'
+            for column in range(32, 48):
+                row[column] = repr(rng.random())
+            row[61] = 'APO'
+            file.write(','.join(row) + '\n')
+    return designations
+
+
+def write_approaches(path, designations, count=FULL_CAD_COUNT, seed=1):
+    """Write a synthetic, time-ordered `cad.json` with `count` rows."""
+    rng = random.Random(seed)
+    minutes = sorted(rng.randrange(_SPAN_MINUTES) for _ in range(count))
+    rows = []
+    for minute in minutes:
+        distance = rng.uniform(0.0001, 0.5)
+        velocity = rng.uniform(0.5, 60)
+        rows.append([
+            rng.choice(designations),
+            str(rng.randint(1, 200)),
+            f'{_JD_EPOCH + minute / 1440:.9f}',
+            _to_cd(minute),
+            repr(distance),
+            repr(distance * 0.99),
+            repr(distance * 1.01),
+            repr(velocity),
+            repr(velocity * 0.99),
+            '< 00:01',
+            f'{rng.uniform(15, 30):.1f}',
+        ])
+    document = {
+        'signature': {'source': 'NASA/JPL SBDB Close Approach Data API',
+                      'version': '1.1'},
+        'count': str(count),
+        'fields': CAD_FIELDS,
+        'data': rows,
+    }
+    with open(path, 'w') as file:
+        json.dump(document, file, indent='\t')
+
+
+def _to_cd(minute):
+    """Format minutes past 1900-01-01 as a NASA `cd` string."""
+    dt = _START + datetime.timedelta(minutes=minute)
+    return dt.strftime('%Y-%b-%d %H:%M')
+
+
+def build(outdir, neo_count=FULL_NEO_COUNT, cad_count=FULL_CAD_COUNT):
+    """Write `neos.csv` and `cad.json` into `outdir` unless already present.
+
+    :return: A tuple of the NEO file and CAD file paths.
+    """
+    outdir = pathlib.Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    neo_file = outdir / 'neos.csv'
+    cad_file = outdir / 'cad.json'
+    if not (neo_file.exists() and cad_file.exists()):
+        designations = write_neos(neo_file, neo_count)
+        write_approaches(cad_file, designations, cad_count)
+    return neo_file, cad_file
+
+
+def main():
+    """Build synthetic data files from the command line."""
+    parser = argparse.ArgumentParser(description="Write synthetic NEO data files.")
+    parser.add_argument('--outdir', type=pathlib.Path, default=pathlib.Path('/tmp/neo-data'))
+    parser.add_argument('--neos', type=int, default=FULL_NEO_COUNT)
+    parser.add_argument('--approaches', type=int, default=FULL_CAD_COUNT)
+    args = parser.parse_args()
+    print(*build(args.outdir, args.neos, args.approaches))
+
+
+if __name__ == '__main__':
+    main()
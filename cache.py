@@ -0,0 +1,89 @@
+"""A cache of query results for NearEarthObjects.
+
+`NEODatabase.query` keeps the indices of the approaches that matched a
+collection of filters in a `QueryCache`, keyed on `filters.filters_key`, so
+that asking the same question again (in any filter order) skips the search.
+The least recently used results are evicted once the cache holds too many
+results or too many bytes of indices.
+"""
+
+import collections
+import threading
+
+
+# Default bounds of a QueryCache.
+DEFAULT_MAX_ENTRIES = 128
+DEFAULT_MAX_BYTES = 64 << 20
+
+
+class QueryCache:
+    """A least-recently-used map of filter keys to matching row indices.
+
+    The cache is safe to share between threads, as the HTTP server does.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES):
+        """Create a new, empty QueryCache.
+
+        :param max_entries: The most results to keep; 0 disables the cache.
+        :param max_bytes: The most bytes of row indices to keep.
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.nbytes = 0
+        self._rows = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the rows cached under key, or None, counting a hit or a miss."""
+        with self._lock:
+            rows = self._rows.get(key)
+            if rows is None:
+                self.misses += 1
+                return None
+            self._rows.move_to_end(key)
+            self.hits += 1
+            return rows
+
+    def put(self, key, rows):
+        """Cache an array of row indices under key, evicting as needed.
+
+        The array is made read-only, as it's handed to every later query
+        with the same key. Arrays bigger than the whole cache aren't kept.
+        """
+        if rows.nbytes > self.max_bytes or self.max_entries < 1:
+            return
+        rows.flags.writeable = False
+        with self._lock:
+            previous = self._rows.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+            self._rows[key] = rows
+            self.nbytes += rows.nbytes
+            while len(self._rows) > self.max_entries or self.nbytes > self.max_bytes:
+                _, evicted = self._rows.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        """Forget every cached result (but not the hit and miss counts)."""
+        with self._lock:
+            self._rows.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """Return a dict of the cache's counters and size."""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses,
+                    'entries': len(self._rows), 'bytes': self.nbytes,
+                    'max_entries': self.max_entries, 'max_bytes': self.max_bytes}
+
+    def __len__(self):
+        """Return the number of cached results."""
+        return len(self._rows)
+
+    def __repr__(self):
+        """Return code-like string representation."""
+        return f'QueryCache(max_entries={self.max_entries}, ' + \
+            f'max_bytes={self.max_bytes})'
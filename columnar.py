@@ -0,0 +1,767 @@
+"""Columnar, NumPy-backed storage of close approaches for NearEarthObjects.
+
+An `ApproachTable` holds one array per attribute that the filters in
+`filters.py` inspect, with one element per close approach (and, for attributes
+of NEOs, one element per NEO). Filters can then be evaluated over the whole
+table at once instead of one `CloseApproach` at a time.
+"""
+
+import functools
+import math
+
+import numpy as np
+
+from filters import UnsupportedCriterionError, DateFilter, DistanceFilter, VelocityFilter
+from helpers import MINUTES_PER_DAY
+from lazy import LazyApproaches
+
+
+# Approximately how many rows of a column are kept to estimate selectivity.
+SAMPLE_SIZE = 1024
+
+# Once fewer than 1 in NARROW_BELOW approaches pass the filters so far, the
+# rest are evaluated over just those approaches instead of the whole table.
+NARROW_BELOW = 64
+
+# When the NEOs passing the NEO-level filters have fewer than 1 in
+# NEO_ROWS_BELOW of the candidate approaches, only their approaches are visited.
+NEO_ROWS_BELOW = 16
+
+# When the grid cells overlapping the query's ranges hold fewer than 1 in
+# GRID_BELOW of the candidate approaches, only those cells are visited.
+GRID_BELOW = 8
+
+# The grid dimension that each kind of range filter bounds.
+_GRID_DIMENSIONS = {DistanceFilter: 'distance', VelocityFilter: 'velocity'}
+
+# The column that results are ordered by for each `ApproachTable.top` key.
+SORT_COLUMNS = {'distance': 'distance', 'velocity': 'velocity',
+                'diameter': 'diameter', 'date': 'time'}
+
+
+class ApproachTable:
+    """Parallel arrays describing close approaches and their NEOs.
+
+    Per approach (in the same order as the database's approaches):
+    time (int64) minutes since the Unix epoch
+    distance (float64) minimum approach distance in au
+    velocity (float64) relative velocity in km/s
+    neo_index (int64) position of the approach's NEO in the NEO arrays
+
+    Per NEO:
+    neo_diameter (float64) diameter in km, NaN if unknown
+    neo_hazardous (bool) potentially hazardous flag
+    """
+
+    def __init__(self, time, distance, velocity, neo_index,
+                 neo_diameter, neo_hazardous):
+        """Create a new ApproachTable from already-built arrays."""
+        self.time = time
+        self.distance = distance
+        self.velocity = velocity
+        self.neo_index = neo_index
+        self.neo_diameter = neo_diameter
+        self.neo_hazardous = neo_hazardous
+        self._time_order = None
+        self._samples = {}
+        self._neo_groups = None
+        self._grid = None
+        self._bitmaps = {}
+        self._bitmap_rows = {}
+
+    @classmethod
+    def build(cls, neos, approaches):
+        """Build an ApproachTable from linked NEOs and approaches.
+
+        Arguments:
+        neos: A sequence of NearEarthObjects. Its order defines neo_index.
+        approaches: A collection of CloseApproaches linked to those NEOs.
+        """
+        if isinstance(approaches, LazyApproaches):
+            return cls.from_lazy(approaches)
+
+        positions = {id(neo): index for index, neo in enumerate(neos)}
+        count = len(approaches)
+        return cls(
+            time=np.fromiter((approach.minutes for approach in approaches),
+                             np.int64, count),
+            distance=np.fromiter((approach.distance for approach in approaches),
+                                 np.float64, count),
+            velocity=np.fromiter((approach.velocity for approach in approaches),
+                                 np.float64, count),
+            neo_index=np.fromiter((positions[id(approach.neo)]
+                                   for approach in approaches), np.int64, count),
+            neo_diameter=np.fromiter((neo.diameter for neo in neos),
+                                     np.float64, len(neos)),
+            neo_hazardous=np.fromiter((neo.hazardous for neo in neos),
+                                      np.bool_, len(neos)),
+        )
+
+    @classmethod
+    def from_lazy(cls, approaches):
+        """Build an ApproachTable over the columns behind a LazyApproaches.
+
+        The approach columns are wrapped without copying, and no
+        NearEarthObject or CloseApproach is created.
+        """
+        columns, neos = approaches.columns, approaches.neos
+        table = cls(
+            time=np.frombuffer(columns.time, np.int64),
+            distance=np.frombuffer(columns.distance, np.float64),
+            velocity=np.frombuffer(columns.velocity, np.float64),
+            neo_index=np.frombuffer(columns.neo_index, np.int64),
+            neo_diameter=np.array(neos.diameter, np.float64),
+            neo_hazardous=np.array(neos.hazardous, np.bool_),
+        )
+        table._neo_groups = (np.frombuffer(columns.neo_order, np.int64),
+                             np.frombuffer(columns.neo_offsets, np.int64))
+        return table
+
+    @property
+    def day(self):
+        """Return the day (since the Unix epoch) of each approach."""
+        return self.time // MINUTES_PER_DAY
+
+    @property
+    def diameter(self):
+        """Return the diameter of each approach's NEO."""
+        return self.neo_diameter[self.neo_index]
+
+    @property
+    def hazardous(self):
+        """Return the bitmap of approaches whose NEO is potentially hazardous."""
+        return self._bitmap('hazardous', lambda: self.neo_hazardous[self.neo_index])
+
+    @property
+    def not_hazardous(self):
+        """Return the bitmap of approaches whose NEO isn't potentially hazardous."""
+        return self._bitmap('not_hazardous', lambda: ~self.hazardous)
+
+    @property
+    def diameter_known(self):
+        """Return the bitmap of approaches whose NEO has a known diameter."""
+        return self._bitmap('diameter_known',
+                            lambda: ~np.isnan(self.neo_diameter)[self.neo_index])
+
+    def _bitmap(self, name, build):
+        """Return the named per-approach bitmap, building it the first time.
+
+        Bitmaps are read-only, since they're handed out as filter masks.
+        """
+        bitmap = self._bitmaps.get(name)
+        if bitmap is None:
+            bitmap = self._bitmaps[name] = build()
+            bitmap.flags.writeable = False
+        return bitmap
+
+    def bitmap_rows(self, name):
+        """Return the rows set in the named bitmap, building them the first time.
+
+        name is one of 'hazardous', 'not_hazardous' and 'diameter_known'.
+        """
+        rows = self._bitmap_rows.get(name)
+        if rows is None:
+            rows = self._bitmap_rows[name] = np.flatnonzero(getattr(self, name))
+            rows.flags.writeable = False
+        return rows
+
+    @property
+    def time_order(self):
+        """Return the approach indices sorted by time, or None if already sorted.
+
+        NASA's close approach data is in time order, so usually no sort
+        (and no extra array) is needed.
+        """
+        if self._time_order is None:
+            time = self.time
+            if np.all(time[1:] >= time[:-1]):
+                self._time_order = False
+            else:
+                self._time_order = np.argsort(time, kind='stable')
+        if self._time_order is False:
+            return None
+        return self._time_order
+
+    @property
+    def neo_groups(self):
+        """Return (order, offsets): the approach rows grouped by NEO.
+
+        The rows of the approaches of NEO i are order[offsets[i]:offsets[i + 1]].
+        """
+        if self._neo_groups is None:
+            order = np.argsort(self.neo_index, kind='stable')
+            counts = np.bincount(self.neo_index, minlength=len(self.neo_diameter))
+            self._neo_groups = order, np.concatenate(([0], np.cumsum(counts)))
+        return self._neo_groups
+
+    def neo_rows(self, neos):
+        """Return the rows of every approach of the given NEOs, in table order.
+
+        :param neos: An array of NEO indices.
+        """
+        return _group_rows(*self.neo_groups, neos)
+
+    @property
+    def grid(self):
+        """Return the GridIndex of this table, building it if needed."""
+        if self._grid is None:
+            self._grid = GridIndex.build(self)
+        return self._grid
+
+    def append(self, time, distance, velocity, neo_index):
+        """Return a new ApproachTable with more approaches after these.
+
+        The arguments are sequences describing the new approaches, as the
+        columns of the same names. The time order and the NEO groups are
+        extended rather than rebuilt, if built already; the other indexes
+        are built again when needed.
+        """
+        time = np.asarray(time, dtype=np.int64)
+        neo_index = np.asarray(neo_index, dtype=np.int64)
+        table = ApproachTable(np.concatenate((self.time, time)),
+                              np.concatenate((self.distance, np.asarray(distance, np.float64))),
+                              np.concatenate((self.velocity, np.asarray(velocity, np.float64))),
+                              np.concatenate((self.neo_index, neo_index)),
+                              self.neo_diameter, self.neo_hazardous)
+        if self._time_order is False and (not len(time) or (
+                np.all(time[1:] >= time[:-1]) and
+                (not len(self) or time[0] >= self.time[-1]))):
+            # Still in time order.
+            table._time_order = False
+        if self._neo_groups is not None:
+            order, offsets = self._neo_groups
+            rows = np.arange(len(self), len(self) + len(neo_index))
+            by_neo = np.argsort(neo_index, kind='stable')
+            # Each new row goes at the end of its NEO's group.
+            table._neo_groups = (
+                np.insert(order, offsets[neo_index[by_neo] + 1], rows[by_neo]),
+                offsets + np.concatenate(([0], np.cumsum(np.bincount(
+                    neo_index, minlength=len(self.neo_diameter))))))
+        return table
+
+    def insert_neos(self, positions, diameter, hazardous):
+        """Return a new ApproachTable with more NEOs, none of them approaching yet.
+
+        :param positions: For each new NEO, in order, the position among
+            this table's NEOs before which it goes (as for list.insert,
+            but all relative to the NEOs as they are now).
+        :param diameter: The new NEOs' diameters, NaN if unknown.
+        :param hazardous: The new NEOs' potentially hazardous flags.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        table = ApproachTable(self.time, self.distance, self.velocity,
+                              self.neo_index + np.searchsorted(positions, self.neo_index,
+                                                               'right'),
+                              np.insert(self.neo_diameter, positions,
+                                        np.asarray(diameter, np.float64)),
+                              np.insert(self.neo_hazardous, positions,
+                                        np.asarray(hazardous, np.bool_)))
+        table._time_order = self._time_order
+        return table
+
+    def time_slice(self, first_day, last_day):
+        """Return the indices of approaches between two days, inclusive.
+
+        Either day may be None for no bound. The indices are found by
+        bisecting the time index and come back in table order; when the
+        table is already in time order they are simply a slice.
+        """
+        order = self.time_order
+        time = self.time if order is None else self.time[order]
+        start, stop = 0, len(time)
+        if first_day is not None:
+            start = np.searchsorted(time, first_day * MINUTES_PER_DAY, 'left')
+        if last_day is not None:
+            stop = np.searchsorted(time, (last_day + 1) * MINUTES_PER_DAY, 'left')
+        if order is None:
+            return slice(int(start), int(max(start, stop)))
+        return np.sort(order[start:max(start, stop)])
+
+    def take(self, rows):
+        """Return a new ApproachTable of just the given approach rows.
+
+        rows may be an index array or a slice (which takes views rather
+        than copies). The NEO arrays are shared, not copied, and so are
+        slices of any bitmaps already built.
+        """
+        table = ApproachTable(self.time[rows], self.distance[rows],
+                              self.velocity[rows], self.neo_index[rows],
+                              self.neo_diameter, self.neo_hazardous)
+        if isinstance(rows, slice):
+            table._bitmaps = {name: bitmap[rows] for name, bitmap in self._bitmaps.items()}
+            for name, set_rows in self._bitmap_rows.items():
+                start, stop = np.searchsorted(set_rows, (rows.start, rows.stop))
+                table._bitmap_rows[name] = set_rows[start:stop] - rows.start
+        return table
+
+    def selectivity(self, filter):
+        """Estimate the fraction of approaches that pass a filter.
+
+        The filter is tested against an evenly spaced sample of its column
+        (about SAMPLE_SIZE rows, taken once per filter class). The sample
+        stands in for a histogram of the column, and works the same way for
+        every comparator and for NaN diameters.
+        """
+        sample = self._samples.get(type(filter))
+        if sample is None:
+            column = filter.column(self)
+            step = max(1, len(column) // SAMPLE_SIZE)
+            sample = self._samples[type(filter)] = np.array(column[::step])
+        if not len(sample):
+            return 1.0
+        return np.count_nonzero(filter.op(sample, filter.reference)) / len(sample)
+
+    def plan(self, filters):
+        """Return the filters in the order in which to evaluate them.
+
+        Filters that remove the most approaches for their cost come first.
+        Filters that can't be vectorized (or remove nothing, or have no
+        column to sample) keep their relative order, at the end.
+        """
+        if len(filters) < 2:
+            return list(filters)
+
+        def rank(filter):
+            if not hasattr(filter, 'mask'):
+                return math.inf
+            try:
+                passing = self.selectivity(filter)
+            except UnsupportedCriterionError:
+                return math.inf
+            return filter.cost / (1 - passing) if passing < 1 else math.inf
+        return sorted(filters, key=rank)
+
+    def match(self, filters):
+        """Return the indices of approaches passing all filters, in order.
+
+        Date filters that describe a range of days are answered from the
+        time index. With distance or velocity ranges (and any date range),
+        only the cells of the grid index that overlap all of them may be
+        visited instead. Hazard filters are answered from the table's
+        bitmaps. Other filters on NEO attributes are evaluated once per NEO,
+        and if few approaches belong to the passing NEOs only those are
+        visited. The other filters are evaluated in the order of `plan`;
+        once few approaches are left, only over those.
+
+        Raises UnsupportedCriterionError if a filter can't be vectorized.
+        """
+        first_day, last_day, neo_filters, remaining = None, None, [], []
+        for filter in filters:
+            if not hasattr(filter, 'mask'):
+                raise UnsupportedCriterionError
+            if getattr(filter, 'neo_level', False):
+                neo_filters.append(filter)
+                continue
+            bounds = filter.day_bounds() if isinstance(filter, DateFilter) else None
+            if bounds is None:
+                remaining.append(filter)
+                continue
+            if bounds[0] is not None:
+                first_day = bounds[0] if first_day is None else max(first_day, bounds[0])
+            if bounds[1] is not None:
+                last_day = bounds[1] if last_day is None else min(last_day, bounds[1])
+
+        if first_day is None and last_day is None:
+            rows = None
+        else:
+            rows = self.time_slice(first_day, last_day)
+        ranges = _ranges(first_day, last_day, remaining)
+        if ranges.keys() - {'time'}:
+            rows = self._grid_candidates(ranges, rows)
+        neo_step = None
+        if neo_filters:
+            bitmaps = {filter.bitmap_name for filter in neo_filters}
+            if None not in bitmaps:
+                if len(bitmaps) == 1 and rows is None and not remaining:
+                    # The answer is already on hand.
+                    return self.bitmap_rows(bitmaps.pop())
+                for name in bitmaps:
+                    getattr(self, name)  # so that slices share it
+                neo_step = functools.partial(_bitmap_mask, bitmaps)
+            else:
+                rows, neo_step = self._neo_candidates(neo_filters, rows, first_day, last_day)
+        table = self if rows is None else self.take(rows)
+
+        # Filters are evaluated over the whole table until few enough
+        # approaches remain, and from then on only over those approaches.
+        steps = [filter.mask for filter in self.plan(remaining)]
+        if neo_step is not None:
+            steps.insert(0, neo_step)
+        mask, passed = None, None
+        for step in steps:
+            if passed is not None:
+                passed = passed[step(table.take(passed))]
+                continue
+            mask = step(table) if mask is None else mask & step(table)
+            if np.count_nonzero(mask) * NARROW_BELOW < len(table):
+                passed = np.flatnonzero(mask)
+        if passed is None:
+            passed = np.arange(len(table)) if mask is None else np.flatnonzero(mask)
+
+        if rows is None:
+            return passed
+        if isinstance(rows, slice):
+            return passed + rows.start
+        return rows[passed]
+
+    def _grid_candidates(self, ranges, rows):
+        """Narrow the candidate rows to the grid cells overlapping ranges.
+
+        If those cells hold few approaches, compared to the candidate rows
+        (all rows if None), the candidates become just the approaches in
+        them that are within the time range. Otherwise the candidates are
+        returned as they were. Either way the other ranges still need
+        checking.
+        """
+        grid = self.grid
+        cells = grid.cells(ranges)
+        if grid.count(cells) * GRID_BELOW >= _count(rows, len(self)):
+            return rows
+        found = grid.rows(cells)
+        low, high = ranges.get('time', (None, None))
+        if low is not None:
+            found = found[self.time[found] >= low]
+        if high is not None:
+            found = found[self.time[found] <= high]
+        return found
+
+    def _neo_candidates(self, neo_filters, rows, first_day, last_day):
+        """Narrow the candidate rows with filters on NEO attributes.
+
+        The filters are evaluated once per NEO. If the passing NEOs have
+        few approaches, compared to the candidate rows (all rows if None),
+        the candidates become just those approaches, still within the day
+        bounds. Otherwise the candidates are left alone.
+
+        :return: A tuple of the candidate rows and, if the candidates were
+            left alone, a function returning the mask of approaches of an
+            ApproachTable whose NEOs pass.
+        """
+        passing = neo_filters[0].neo_mask(self)
+        for filter in neo_filters[1:]:
+            passing = passing & filter.neo_mask(self)
+
+        _, offsets = self.neo_groups
+        total = int(np.diff(offsets)[passing].sum())
+        if total * NEO_ROWS_BELOW >= _count(rows, len(self)):
+            if np.any(passing & np.isnan(self.neo_diameter)):
+                return rows, lambda table: passing[table.neo_index]
+            # Only approaches with a known diameter can pass.
+            self.bitmap_rows('diameter_known')
+            return rows, functools.partial(_known_diameter_mask, passing)
+
+        found = self.neo_rows(np.flatnonzero(passing))
+        if first_day is not None:
+            found = found[self.time[found] >= first_day * MINUTES_PER_DAY]
+        if last_day is not None:
+            found = found[self.time[found] < (last_day + 1) * MINUTES_PER_DAY]
+        return found, None
+
+    def top(self, sort_by, count=None, descending=False, rows=None):
+        """Return approach rows ordered by an attribute, keeping the first few.
+
+        Only the `count` rows that come first are found (with a partition
+        rather than a sort of every row), and then only those are sorted.
+        Ties keep table order, and unknown diameters come last either way.
+
+        :param sort_by: One of the keys of SORT_COLUMNS.
+        :param count: How many rows to return; None for all of them.
+        :param descending: Whether the largest values come first.
+        :param rows: The candidate rows, as an index array; None for every row.
+        """
+        values = getattr(self, SORT_COLUMNS[sort_by])
+        if rows is not None:
+            values = values[rows]
+        if descending:
+            values = -values
+        order = _smallest(values, count)
+        return order if rows is None else rows[order]
+
+    def aggregate(self, rows=None, group_by=None):
+        """Return the count, min, max and mean of distance and velocity, per group.
+
+        Approaches are grouped by a code per row (see `group_codes`) and
+        every statistic is reduced over each group's contiguous run of
+        rows at once; no CloseApproach is created.
+
+        :param rows: The approach rows to aggregate, as a sequence of
+            indices; None for every row.
+        :param group_by: 'year', 'month' or 'neo', or None for a single group.
+        :return: A tuple (codes, stats): the group codes in increasing order
+            (None if group_by is None) and a dict of statistic name, e.g.
+            'count' or 'distance_mean', to an array with one value per group.
+        """
+        if rows is None:
+            rows = slice(None)
+        else:
+            rows = np.asarray(rows, dtype=np.int64)
+        columns = {'distance': self.distance[rows], 'velocity': self.velocity[rows]}
+        count = len(columns['distance'])
+        if group_by is None:
+            codes = np.zeros(count, dtype=np.int64)
+        else:
+            codes = self.group_codes(group_by, rows)
+            order = None
+            if group_by == 'neo' and isinstance(rows, slice):
+                # Every row, whose order by NEO is already on hand.
+                order = self.neo_groups[0]
+            elif np.any(codes[1:] < codes[:-1]):
+                order = np.argsort(codes, kind='stable')
+            if order is not None:
+                codes = codes[order]
+                columns = {name: column[order] for name, column in columns.items()}
+
+        if not count:
+            # Nothing to reduce, though a lone group is still reported.
+            groups = 0 if group_by else 1
+            stats = {'count': np.zeros(groups, dtype=np.int64)}
+            for name in columns:
+                for statistic in ('min', 'max', 'mean'):
+                    stats[f'{name}_{statistic}'] = np.full(groups, np.nan)
+            return (None if group_by is None else codes), stats
+
+        starts = np.flatnonzero(np.concatenate(([True], codes[1:] != codes[:-1])))
+        counts = np.diff(np.append(starts, count))
+        stats = {'count': counts}
+        for name, column in columns.items():
+            stats[f'{name}_min'] = np.minimum.reduceat(column, starts)
+            stats[f'{name}_max'] = np.maximum.reduceat(column, starts)
+            stats[f'{name}_mean'] = np.add.reduceat(column, starts) / counts
+        return (None if group_by is None else codes[starts]), stats
+
+    def histogram(self, field, bins, rows=None):
+        """Count approaches in bins of time, distance or velocity.
+
+        Time is binned by calendar 'day', 'week', 'month' or 'year' (by
+        bisecting the bins' edges, or if the table isn't in time order with
+        a bincount of the rows' `group_codes`); distance and velocity as by
+        numpy.histogram, with bins a number of bins or their edges.
+
+        :param rows: The approach rows to count, as a sequence of indices;
+            None for every row.
+        :return: A tuple (edges, counts), where bin i runs from edges[i] to
+            edges[i + 1]. Time edges are datetime64[D], and run from the
+            bin of the earliest row to that of the latest.
+        """
+        rows = slice(None) if rows is None else np.asarray(rows, dtype=np.int64)
+        if field != 'time':
+            counts, edges = np.histogram(getattr(self, field)[rows], bins)
+            return edges, counts
+        time = self.time[rows]
+        if not len(time):
+            return np.empty(0, dtype='datetime64[D]'), np.empty(0, dtype=np.int64)
+        if self.time_order is None:
+            # Already in time order, so only the first and last approaches
+            # need a bin, and each bin's count comes from bisecting its edges.
+            first, last = _time_codes(bins, time[[0, -1]]).tolist()
+            edges = _bin_starts(bins, np.arange(first, last + 2))
+            bounds = np.searchsorted(time, edges.astype('datetime64[m]').astype(np.int64))
+            return edges, np.diff(bounds)
+        codes = _time_codes(bins, time)
+        first = codes.min()
+        counts = np.bincount(codes - first)
+        return _bin_starts(bins, np.arange(first, first + len(counts) + 1)), counts
+
+    def group_codes(self, group_by, rows=slice(None)):
+        """Return the code of each row's group, for `aggregate` and `histogram`.
+
+        By 'year', the code is the calendar year; by 'month', the number of
+        months since January 1970; by 'week', the number of Monday-to-Sunday
+        weeks since the one of January 1st, 1970; by 'day', the day since
+        the Unix epoch; by 'neo', the NEO's index.
+        """
+        if group_by == 'neo':
+            return self.neo_index[rows]
+        return _time_codes(group_by, self.time[rows])
+
+    def __len__(self):
+        """Return the number of approaches in the table."""
+        return len(self.time)
+
+    def __repr__(self):
+        """Return code-like string representation."""
+        return f'ApproachTable(<{len(self)} approaches>, ' + \
+            f'<{len(self.neo_diameter)} NEOs>)'
+
+
+
+class GridIndex:
+    """A grid over approach time, distance and velocity.
+
+    Each dimension is cut into (up to) DEFAULT_CELLS intervals holding about
+    the same number of approaches, and the approach rows are grouped by the
+    cell they fall in. A query for ranges of those attributes then only
+    needs the rows of the cells that overlap every range.
+    """
+
+    DIMENSIONS = ('time', 'distance', 'velocity')
+    DEFAULT_CELLS = 32
+
+    def __init__(self, edges, order, offsets):
+        """Create a new GridIndex from already-built arrays.
+
+        edges: per dimension, the sorted inner boundaries between cells;
+            a value v is in interval searchsorted(edges, v, 'right')
+        order: approach rows grouped by cell
+        offsets: where each cell's group starts in order (one extra at the end)
+        """
+        self.edges = edges
+        self.order = order
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, table, cells=DEFAULT_CELLS):
+        """Build a GridIndex over the approaches of an ApproachTable."""
+        edges = []
+        cell = np.zeros(len(table), np.int64)
+        for name in cls.DIMENSIONS:
+            column = getattr(table, name)
+            inner = np.unique(np.quantile(column, np.linspace(0, 1, cells + 1)[1:-1])) \
+                if len(column) else np.empty(0)
+            cell = cell * (len(inner) + 1) + np.searchsorted(inner, column, 'right')
+            edges.append(inner)
+        count = math.prod(len(inner) + 1 for inner in edges)
+        order = np.argsort(cell, kind='stable')
+        counts = np.bincount(cell, minlength=count)
+        return cls(edges, order, np.concatenate(([0], np.cumsum(counts))))
+
+    def cells(self, ranges):
+        """Return the cells overlapping every range.
+
+        :param ranges: A dict of dimension name to (low, high), inclusive;
+            either end may be None. Missing dimensions are unbounded.
+        """
+        cells = np.zeros(1, np.int64)
+        for name, inner in zip(self.DIMENSIONS, self.edges):
+            low, high = ranges.get(name, (None, None))
+            first = 0 if low is None else np.searchsorted(inner, low, 'right')
+            last = len(inner) if high is None else np.searchsorted(inner, high, 'right')
+            cells = (cells[:, None] * (len(inner) + 1) + np.arange(first, last + 1)).ravel()
+        return cells
+
+    def count(self, cells):
+        """Return the number of approaches in the given cells."""
+        return int((self.offsets[cells + 1] - self.offsets[cells]).sum())
+
+    def rows(self, cells):
+        """Return the rows of the approaches in the given cells, in table order."""
+        return _group_rows(self.order, self.offsets, cells)
+
+    def __repr__(self):
+        """Return code-like string representation."""
+        shape = 'x'.join(str(len(inner) + 1) for inner in self.edges)
+        return f'GridIndex(<{shape} cells>, <{len(self.order)} approaches>)'
+
+
+def _group_rows(order, offsets, groups):
+    """Return the rows of the given groups, sorted.
+
+    The rows of group i are order[offsets[i]:offsets[i + 1]].
+    """
+    starts = offsets[groups]
+    lengths = offsets[groups + 1] - starts
+    # Each group's positions in order, one after another.
+    ends = np.cumsum(lengths)
+    positions = np.arange(ends[-1] if len(ends) else 0) + \
+        np.repeat(starts - (ends - lengths), lengths)
+    return np.sort(order[positions])
+
+
+def _bitmap_mask(names, table):
+    """Return the AND of an ApproachTable's named bitmaps."""
+    first, *rest = names
+    mask = getattr(table, first)
+    for name in rest:
+        mask = mask & getattr(table, name)
+    return mask
+
+
+def _known_diameter_mask(passing, table):
+    """Return the mask of approaches whose NEOs pass, all with known diameters.
+
+    Only the approaches with a known diameter are looked up.
+    """
+    known = table.bitmap_rows('diameter_known')
+    mask = np.zeros(len(table), dtype=bool)
+    mask[known] = passing[table.neo_index[known]]
+    return mask
+
+
+def _smallest(values, count):
+    """Return the positions of the count smallest values, smallest first.
+
+    NaNs sort last, and equal values keep their order, as with a stable sort.
+    """
+    if count is None or count >= len(values):
+        return np.argsort(values, kind='stable')
+    if count < 1:
+        return np.empty(0, dtype=np.int64)
+    kth = np.partition(values, count - 1)[count - 1]
+    if np.isnan(kth):
+        below, ties = np.flatnonzero(~np.isnan(values)), np.flatnonzero(np.isnan(values))
+    else:
+        below, ties = np.flatnonzero(values < kth), np.flatnonzero(values == kth)
+    chosen = np.sort(np.concatenate((below, ties[:count - len(below)])))
+    return chosen[np.argsort(values[chosen], kind='stable')]
+
+
+def _time_codes(unit, time):
+    """Return the code of each time's 'day', 'week', 'month' or 'year'.
+
+    See `ApproachTable.group_codes`.
+    """
+    if unit == 'day':
+        return time // MINUTES_PER_DAY
+    if unit == 'week':
+        # January 1st, 1970 was a Thursday.
+        return (time // MINUTES_PER_DAY + 3) // 7
+    minutes = time.astype('datetime64[m]')
+    if unit == 'year':
+        return minutes.astype('datetime64[Y]').astype(np.int64) + 1970
+    if unit == 'month':
+        return minutes.astype('datetime64[M]').astype(np.int64)
+    raise ValueError(f'Cannot group close approaches by {unit!r}.')
+
+
+def _bin_starts(unit, codes):
+    """Return the first day of each time bin, from `group_codes` codes."""
+    if unit == 'year':
+        return (codes - 1970).astype('datetime64[Y]').astype('datetime64[D]')
+    if unit == 'month':
+        return codes.astype('datetime64[M]').astype('datetime64[D]')
+    if unit == 'week':
+        return (codes * 7 - 3).astype('datetime64[D]')
+    return codes.astype('datetime64[D]')
+
+
+def _count(rows, total):
+    """Return how many rows an index array or slice selects (all if None)."""
+    if rows is None:
+        return total
+    if isinstance(rows, slice):
+        return rows.stop - rows.start
+    return len(rows)
+
+
+def _ranges(first_day, last_day, filters):
+    """Return the grid ranges bounded by day bounds and range filters.
+
+    :return: A dict of grid dimension name to inclusive (low, high), with
+        an entry only for the dimensions that are bounded.
+    """
+    ranges = {}
+    if first_day is not None or last_day is not None:
+        ranges['time'] = (None if first_day is None else first_day * MINUTES_PER_DAY,
+                          None if last_day is None else (last_day + 1) * MINUTES_PER_DAY - 1)
+    for filter in filters:
+        name = _GRID_DIMENSIONS.get(type(filter))
+        bounds = filter.bounds() if name else None
+        if bounds is None:
+            continue
+        low, high = ranges.get(name, (None, None))
+        if bounds[0] is not None:
+            low = bounds[0] if low is None else max(low, bounds[0])
+        if bounds[1] is not None:
+            high = bounds[1] if high is None else min(high, bounds[1])
+        ranges[name] = (low, high)
+    return ranges
@@ -1,55 +1,46 @@
 """Database module for NearEarthObjects."""
 
+import bisect
+import heapq
+import math
+import operator
+import sys
 import time
 
+from cache import QueryCache
+from filters import UnsupportedCriterionError, filters_key
+from lazy import NEOIndex
 
-def binarySearch(arr, left, right, search):
-    """Recursive binary search implementation.
 
-    Borrowed from:
-    https://www.geeksforgeeks.org/binary-search/
+# The ways that `NEODatabase.aggregate` can group close approaches.
+AGGREGATE_GROUPS = ('year', 'month', 'neo')
 
-    Arguments:
-    arr -- the SORTED collection to be searched
-    left -- index of leftmost boundary
-    right -- index of rightmost boundary
-    search -- value to be located
+# The attributes that `NEODatabase.histogram` can bin close approaches by,
+# and the calendar bins of time.
+HISTOGRAM_FIELDS = ('time', 'distance', 'velocity')
+TIME_BINS = ('day', 'week', 'month', 'year')
 
-    Returns:
-    If located: index of value in collection
-    If not found: -1
-    """
-    if right >= left:
-        mid = left + (right - left) // 2
-
-        # If element is present at the middle itself
-        if arr[mid] == search:
-            return mid
-
-        # If element is smaller than mid, then it
-        # can only be present in left subarray
-        elif arr[mid] > search:
-            return binarySearch(arr, left, mid-1, search)
-
-        # Else the element can only be present
-        # in right subarray
-        else:
-            return binarySearch(arr, mid + 1, right, search)
-
-    else:
-        # Element is not present in the array
-        return -1
+# The attributes that `NEODatabase.top` can order close approaches by, and
+# how to read each from a CloseApproach.
+SORT_KEYS = {
+    'distance': operator.attrgetter('distance'),
+    'velocity': operator.attrgetter('velocity'),
+    'diameter': operator.attrgetter('neo.diameter'),
+    'date': operator.attrgetter('minutes'),
+}
 
 
 class NEODatabase:
     """Database of NEOs and approaches."""
 
-    def __init__(self, neos, approaches):
+    def __init__(self, neos, approaches, cache=None):
         """Create a new NEODatabase.
 
         Arguments:
         neos: A collection of NearEarthObjects from extract.py
         approaches: A collection of CloseApproaches from extract.py
+        cache: A cache.QueryCache for query results (by default, a new
+            one with the default bounds)
 
         immediately does some sorting and provides search interfaces.
         """
@@ -60,7 +51,7 @@ class NEODatabase:
 
         print('Building database...\n')
 
-        # sorting permits binary search against designations
+        # sorted designations are kept in neo_designations
         self._neos.sort(key=lambda x: x.designation)
 
         """"_neos_named
@@ -75,51 +66,228 @@ class NEODatabase:
         """neo_designations
         neo designations only.
         ordering matches full _neos list
-        find a designation in this with binary search
-        then retrieve the neo with same index in _neos
         """
         self.neo_designations = []
         for neo in self._neos:
             self.neo_designations.append(neo.designation)
-        self.neo_designations_len = len(self.neo_designations) - 1
 
-        """ The following approach loop accomplishes two things.
+        """_neos_by_designation
+        hash table of designation to neo, for linking and lookups
+        """
+        self._neos_by_designation = {}
+        for neo in self._neos:
+            self._neos_by_designation[neo.designation] = neo
+
+        """ The following approach loop links each approach to its neo.
 
-        Builds dictionary of unique designations to approaches
+        Sets up list of approaches in the neo objects, and the links
+        to neo objects in the approaches. Approaches whose designation
+        matches no neo are set aside in unmatched_approaches and left
+        out of the database, rather than linked to the wrong neo.
+        """
+        self.unmatched_approaches = []
+        for approach in approaches:
+            neo = self._neos_by_designation.get(approach._designation)
+            if neo is None:
+                self.unmatched_approaches.append(approach)
+                continue
+            approach.neo = neo
+            neo.approaches.append(approach)
+
+        """_approach_des_dict
+        dictionary of unique designations to approaches
         While a neo object has the same list, this dict is a faster lookup
         if you have the designation.
 
         {designation (str) : [list of approach objects]}
-
-        Sets up list of approaches in the neo objects, and the links
-        to neo objects in the approaches
         """
         self._approach_des_dict = {}
-        for approach in approaches:
+        for neo in self._neos:
+            if neo.approaches:
+                self._approach_des_dict[neo.designation] = neo.approaches
+
+        if self.unmatched_approaches:
+            unknown = sorted({approach._designation
+                              for approach in self.unmatched_approaches})
+            print(f'Warning: {len(self.unmatched_approaches)} close approaches '
+                  f'reference {len(unknown)} unknown NEO designations '
+                  f'(e.g. {", ".join(unknown[:3])}) and were left out.',
+                  file=sys.stderr)
+            unmatched = {id(approach) for approach in self.unmatched_approaches}
+            self._approaches = [approach for approach in approaches
+                                if id(approach) not in unmatched]
+
+        # Columnar copy of the approaches, built by the first query.
+        self._table = None
+        self.cache = QueryCache() if cache is None else cache
+
+    @classmethod
+    def from_lazy(cls, neos, approaches, named, cache=None):
+        """Create a NEODatabase over lazily-created NEOs and approaches.
+
+        Arguments:
+        neos: A lazy.LazyNEOs, sorted by designation
+        approaches: A lazy.LazyApproaches over the same NEOs
+        named: dict of NEO name to position in neos
+        cache: A cache.QueryCache, as for the constructor
+
+        Nothing is created up front; see lazy.py and snapshot.py.
+        """
+        database = cls.__new__(cls)
+        database._neos = neos
+        database._approaches = approaches
+        database._table = None
+        database.cache = QueryCache() if cache is None else cache
+        database._neos_named = NEOIndex(named, neos)
+        database.neo_designations = neos.designation
+        database._neos_by_designation = NEOIndex(
+            {designation: position
+             for position, designation in enumerate(neos.designation)}, neos)
+        database._approach_des_dict = None  # each NEO's approaches suffice
+        database.unmatched_approaches = []
+        return database
+
+    @property
+    def table(self):
+        """Return the ApproachTable of this database, building it if needed."""
+        if self._table is None:
+            # NumPy is only imported once something needs the table, which
+            # keeps `inspect` on a snapshot quick.
+            from columnar import ApproachTable
+            self._table = ApproachTable.build(self._neos, self._approaches)
+        return self._table
+
+    def prebuild(self):
+        """Build the columnar table now, rather than in the first query.
+
+        Long-running modes call this before serving, so that no request
+        waits for (or several threads race to build) the table.
+        """
+        self.table
 
-            # If index (designation) already exists, append
-            if approach._designation in self._approach_des_dict:
-                self._approach_des_dict[approach._designation].append(approach)
-            # If not, add with new index
-            else:
-                self._approach_des_dict[approach._designation] = [approach]
+    def add_neos(self, neos):
+        """Add NEOs to the database, without rebuilding it.
 
-            # Use binary search to find the matching NEO designation
-            neoIndex = binarySearch(self.neo_designations, 0,
-                                    self.neo_designations_len,
-                                    approach._designation)
+        Arguments:
+        neos: A collection of NearEarthObjects, e.g. from extract.py
+
+        returns the number of NEOs added. NEOs whose designation is already
+        in the database are left out. The designation and name indexes
+        and the columnar table are updated in place, and cached query
+        results dropped.
 
-            # Now add the real links between NEO and approach objects
-            approach.neo = self._neos[neoIndex]
-            self._neos[neoIndex].approaches.append(approach)
+        A database loaded from a snapshot creates every NEO and approach
+        the first time anything is added to it.
+        """
+        self._materialize()
+        new = []
+        for neo in neos:
+            if neo.designation in self._neos_by_designation:
+                continue
+            self._neos_by_designation[neo.designation] = neo
+            if neo.name is not None and neo.name != '':
+                self._neos_named[neo.name] = neo
+            new.append(neo)
+        if not new:
+            return 0
+
+        new.sort(key=lambda x: x.designation)
+        # Where each new NEO goes among the NEOs as they were.
+        positions = [bisect.bisect_left(self.neo_designations, neo.designation)
+                     for neo in new]
+        self._neos = sorted(self._neos + new, key=lambda x: x.designation)
+        self.neo_designations = [neo.designation for neo in self._neos]
+        if self._table is not None:
+            self._table = self._table.insert_neos(
+                positions, [neo.diameter for neo in new], [neo.hazardous for neo in new])
+        self.cache.clear()
+        return len(new)
+
+    def add_approaches(self, approaches):
+        """Add close approaches to the database, without rebuilding it.
+
+        Arguments:
+        approaches: A collection of CloseApproaches, e.g. from
+            extract.load_approaches_after
+
+        returns the number of approaches added. Each is linked to its NEO
+        (which must already be in the database; see add_neos) and follows
+        all earlier approaches, in query results as in its NEO's approaches.
+        Approaches of unknown NEOs are set aside in unmatched_approaches,
+        as by the constructor. The columnar table is extended in place, and
+        cached query results dropped.
+        """
+        self._materialize()
+        added, unmatched = [], []
+        for approach in approaches:
+            neo = self._neos_by_designation.get(approach._designation)
+            if neo is None:
+                unmatched.append(approach)
+                continue
+            approach.neo = neo
+            neo.approaches.append(approach)
+            if len(neo.approaches) == 1:
+                self._approach_des_dict[neo.designation] = neo.approaches
+            added.append(approach)
+
+        if unmatched:
+            self.unmatched_approaches.extend(unmatched)
+            print(f'Warning: {len(unmatched)} close approaches reference unknown NEO '
+                  f'designations (e.g. {unmatched[0]._designation}) and were left out.',
+                  file=sys.stderr)
+        if not added:
+            return 0
+        # A new list, as the constructor's may be the caller's.
+        self._approaches = [*self._approaches, *added]
+        if self._table is not None:
+            designations = self.neo_designations
+            self._table = self._table.append(
+                [approach.minutes for approach in added],
+                [approach.distance for approach in added],
+                [approach.velocity for approach in added],
+                [bisect.bisect_left(designations, approach.neo.designation)
+                 for approach in added])
+        self.cache.clear()
+        return len(added)
+
+    def latest(self):
+        """Return the time of the latest close approaches, and their NEOs.
+
+        returns a tuple (minutes, designations) of that time, in minutes
+        since the Unix epoch, and the set of designations of the NEOs
+        approaching then, or (None, set()) if there are no approaches. This
+        is where extract.load_approaches_after picks up from.
+        """
+        minutes, designations = None, set()
+        for approach in reversed(self._approaches):
+            if minutes is not None and approach.minutes != minutes:
+                break
+            minutes = approach.minutes
+            designations.add(approach.neo.designation)
+        return minutes, designations
+
+    def _materialize(self):
+        """Create every NEO and approach of a database loaded from a snapshot.
+
+        Afterwards the database is as if built by the constructor, so NEOs
+        and approaches can be added to it. The columnar table is kept.
+        """
+        if self._approach_des_dict is not None:
+            return
+        self._neos = list(self._neos)
+        self._approaches = list(self._approaches)
+        for neo in self._neos:
+            neo.approaches = list(neo.approaches)
+        self.neo_designations = [neo.designation for neo in self._neos]
+        self._neos_by_designation = {neo.designation: neo for neo in self._neos}
+        self._neos_named = {neo.name: neo for neo in self._neos
+                            if neo.name is not None and neo.name != ''}
+        self._approach_des_dict = {neo.designation: neo.approaches
+                                   for neo in self._neos if neo.approaches}
 
     def get_neo_by_designation(self, designation):
         """Search by designation and return NearEarthObject."""
-        neoIndex = binarySearch(self.neo_designations, 0,
-                                self.neo_designations_len, designation)
-        if neoIndex != -1:
-            # _neos is sorted and mated to neo_designations
-            return self._neos[neoIndex]
+        return self._neos_by_designation.get(designation)
 
     def get_neo_by_name(self, name):
         """Search by name and return NearEarthObject."""
@@ -140,8 +308,209 @@ class NEODatabase:
         filters: a collection of filter objects from filters.py
 
         yields close approaches passing any filters.
+
+        Filters that support it are evaluated in bulk over the columnar
+        table, and only the approaches that pass all of them are
+        visited. Results come back in the original approach order.
+
+        The matching rows are kept in self.cache, so the same filters (in
+        any order) are answered again without a search.
+        """
+        filters = tuple(filters)
+        if not filters:
+            yield from self._approaches
+            return
+        try:
+            rows = self._match(filters)
+        except UnsupportedCriterionError:
+            # Some filter can't be vectorized.
+            yield from self._narrow_and_scan(filters)
+            return
+
+        approaches = self._approaches
+        for row in rows.tolist():
+            yield approaches[row]
+
+    def top(self, filters=(), sort_by='distance', count=None, descending=False):
+        """Create a close approach iterator over sorted, filtered results.
+
+        Arguments:
+        filters: a collection of filter objects from filters.py
+        sort_by: one of the keys of SORT_KEYS, the attribute to order by
+        count: the number of approaches to produce; None for all of them
+        descending: whether the largest values come first
+
+        yields the first count close approaches passing any filters, in
+        order of sort_by. Ties keep the original approach order, and
+        approaches of NEOs with an unknown diameter come last.
+
+        Only the first count matches are sorted: the columnar table
+        partitions the matching rows, and approaches tested one at a time
+        pass through a bounded heap.
         """
-        for approach in self._approaches:
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f'Cannot sort close approaches by {sort_by!r}.')
+        filters = tuple(filters)
+        try:
+            rows = self._match(filters) if filters else None
+        except UnsupportedCriterionError:
+            yield from self._top_of(self._narrow_and_scan(filters), sort_by,
+                                    count, descending)
+            return
+
+        approaches = self._approaches
+        for row in self.table.top(sort_by, count, descending, rows).tolist():
+            yield approaches[row]
+
+    @staticmethod
+    def _top_of(approaches, sort_by, count, descending):
+        """Return the first count approaches in order of sort_by, as a list."""
+        value = SORT_KEYS[sort_by]
+
+        def rank(approach):
+            # NaN never compares equal, so unknown values all rank alike,
+            # leaving their ties in approach order.
+            key = value(approach)
+            if math.isnan(key):
+                return True, 0.0
+            return False, -key if descending else key
+
+        if count is None:
+            return sorted(approaches, key=rank)
+        return heapq.nsmallest(count, approaches, key=rank)
+
+    def aggregate(self, filters=(), group_by=None):
+        """Summarize the distance and velocity of filtered close approaches.
+
+        Arguments:
+        filters: a collection of filter objects from filters.py
+        group_by: None, or one of AGGREGATE_GROUPS: 'year', 'month' (as
+            'YYYY-MM') or 'neo' (by primary designation)
+
+        returns a list of dicts, one per group in increasing order, with
+        the keys 'group', 'count', and the 'min', 'max' and 'mean' of
+        'distance' and 'velocity' (e.g. 'distance_min'). Without group_by
+        there is a single dict, whose group is None.
+
+        The statistics are computed over the columnar table in one pass
+        per group, without creating the matching close approaches (save
+        for testing filters that can't be vectorized).
+        """
+        if group_by is not None and group_by not in AGGREGATE_GROUPS:
+            raise ValueError(f'Cannot group close approaches by {group_by!r}.')
+        codes, stats = self.table.aggregate(self._rows(filters), group_by)
+        if codes is None:
+            groups = [None]
+        elif group_by == 'year':
+            groups = codes.tolist()
+        elif group_by == 'month':
+            groups = [f'{1970 + code // 12:04d}-{code % 12 + 1:02d}' for code in codes.tolist()]
+        else:
+            groups = [self.neo_designations[code] for code in codes.tolist()]
+        columns = {name: values.tolist() for name, values in stats.items()}
+        return [dict(group=group, **{name: values[index] for name, values in columns.items()})
+                for index, group in enumerate(groups)]
+
+    def histogram(self, filters=(), field='time', bins=None):
+        """Count filtered close approaches in bins of time, distance or velocity.
+
+        Arguments:
+        filters: a collection of filter objects from filters.py
+        field: one of HISTOGRAM_FIELDS, the attribute to bin
+        bins: for 'time', one of TIME_BINS ('year' by default), for
+            calendar days, Monday-to-Sunday weeks, months or years; for
+            'distance' and 'velocity', a number of equal-width bins
+            spanning the matches (10 by default) or a sequence of bin edges
+
+        returns a list of (start, end, count) tuples, one per bin in order.
+        Time bins run from start to just before end (both datetime.date),
+        from the first match's bin to the last match's, empty bins included.
+        The other bins are as for numpy.histogram: each includes its start,
+        and the last also its end.
+
+        The counts are computed over the columnar table, without creating
+        the matching close approaches (save for testing filters that
+        can't be vectorized).
+        """
+        if field not in HISTOGRAM_FIELDS:
+            raise ValueError(f'Cannot bin close approaches by {field!r}.')
+        if field == 'time':
+            bins = 'year' if bins is None else bins
+            if bins not in TIME_BINS:
+                raise ValueError(f'Cannot bin close approaches by {bins!r}.')
+        elif bins is None:
+            bins = 10
+        edges, counts = self.table.histogram(field, bins, self._rows(filters))
+        edges = edges.tolist()
+        return list(zip(edges[:-1], edges[1:], counts.tolist()))
+
+    def _rows(self, filters):
+        """Return the table rows passing all filters (None, for all, without any).
+
+        Filters that can't be vectorized are tested one approach at a
+        time, after narrowing to the rows that pass the rest.
+        """
+        filters = tuple(filters)
+        if not filters:
+            return None
+        try:
+            return self._match(filters)
+        except UnsupportedCriterionError:
+            rows, others = self._narrow(filters)
+        candidates = range(len(self._approaches)) if rows is None else rows.tolist()
+        approaches = self._approaches
+        return [row for row in candidates
+                if all(filter(approaches[row]) for filter in others)]
+
+    def _match(self, filters):
+        """Return the table rows passing all filters, from the cache if there."""
+        key = filters_key(filters)
+        if key is None:
+            return self.table.match(filters)
+        rows = self.cache.get(key)
+        if rows is None:
+            rows = self.table.match(filters)
+            self.cache.put(key, rows)
+        return rows
+
+    def _narrow_and_scan(self, filters):
+        """Yield close approaches passing filters that can't all be vectorized."""
+        rows, others = self._narrow(filters)
+        if rows is None:
+            yield from self._scan(others)
+            return
+        approaches = self._approaches
+        yield from self._scan(others, (approaches[row] for row in rows.tolist()))
+
+    def _narrow(self, filters):
+        """Split filters that can't all be vectorized into rows and a remainder.
+
+        The filters that can be vectorized pick out the candidate
+        approaches (so NEO-level filters are still evaluated once per NEO),
+        and only those need testing against the rest, one at a time. If that
+        isn't possible, every approach needs testing against every filter,
+        the most selective filters first.
+
+        :return: A tuple (rows, others) of the candidate table rows (None
+            for every approach) and the filters left to test them against.
+        """
+        vectorized = [filter for filter in filters if hasattr(filter, 'mask')]
+        others = [filter for filter in filters if not hasattr(filter, 'mask')]
+        if vectorized and others:
+            try:
+                return self._match(vectorized), others
+            except UnsupportedCriterionError:
+                pass
+        return None, self.table.plan(filters)
+
+    def _scan(self, filters, approaches=None):
+        """Yield close approaches passing the filters, one row at a time.
+
+        approaches defaults to every approach in the database.
+        """
+        if approaches is None:
+            approaches = self._approaches
+        for approach in approaches:
             passedFilters = True
 
             # eliminate this approach if it doesn't pass a filter
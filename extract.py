@@ -1,40 +1,129 @@
 """File data extract module for NearEarthObjects."""
 
+import array
 import csv
+import io
 import json
+import mmap
+import re
 import time
 
+from helpers import cd_to_datetime, datetime_to_minutes
 from models import NearEarthObject, CloseApproach
 
 
-def load_neos(neo_csv_path):
+# The columns of neos.csv that every NearEarthObject needs, by name.
+NEO_COLUMNS = ('pdes', 'full_name', 'name', 'diameter', 'pha')
+
+# A whole quoted CSV field that holds no comma, quote or line break.
+_QUOTED_FIELD = re.compile(r'"[^",\r\n]*"(?![^,\r\n])')
+
+# The column layout of NASA's close approach data (API version 1.1).
+CAD_FIELDS = ('des', 'orbit_id', 'jd', 'cd', 'dist', 'dist_min', 'dist_max',
+              'v_rel', 'v_inf', 't_sigma_f', 'h')
+
+# Characters read from the CAD file per refill of the streaming buffer.
+_CHUNK_SIZE = 1 << 20
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+
+# Chunks of the "data" array handed to each worker by `load_parallel`.
+_CHUNKS_PER_WORKER = 4
+
+# Bytes of rows left for `load_approaches_after` to parse rather than bisect.
+_BISECT_BELOW = 1 << 16
+
+# The start of the "data" array, the gap between two of its rows, and its end.
+# Rows are flat arrays of strings and nulls, so brackets only appear here.
+_DATA_START = re.compile(rb'"data"\s*:\s*\[')
+_ROW_GAP = re.compile(rb'\]\s*,\s*\[')
+_DATA_END = re.compile(rb'\]\s*\]')
+
+
+def load_neos(neo_csv_path, extra_columns=()):
     """Read near-Earth object information from a CSV file.
 
+    Columns are found by name in the header row, so their order in the file
+    doesn't matter. Each row is only split as far as the last column needed.
+
     :param neo_csv_path: A path to a CSV file containing data
         about near-Earth objects.
+    :param extra_columns: Names of additional columns to keep in each NEO's
+        `extra` dict (e.g. 'moid', 'a', 'e', 'i', 'H'). Numbers are stored
+        as floats and empty values as None.
     :return: A collection of `NearEarthObject`s.
     """
     print('Loading NEO and approach data...')
     neo_list = []
 
-    with open(neo_csv_path, 'r') as file:
-        reader = csv.reader(file)
-        next(reader)
-        count = 0
-        for neo in reader:
-            neo_list.append(NearEarthObject(pdes=neo[3], full_name=neo[2],
-                                            name=neo[4], diameter=neo[15],
-                                            pha=neo[7]))
-            count += 1
+    with open(neo_csv_path, 'r', newline='') as file:
+        header = next(csv.reader(file))
+        indices = []
+        for column in NEO_COLUMNS + tuple(extra_columns):
+            if column not in header:
+                raise ValueError(f'{neo_csv_path} has no {column!r} column')
+            indices.append(header.index(column))
+        pdes, full_name, name, diameter, pha = indices[:len(NEO_COLUMNS)]
+        extras = list(zip(extra_columns, indices[len(NEO_COLUMNS):]))
+        text = file.read()
+
+    for neo in _csv_rows(text, max(indices) + 1):
+        neo_list.append(NearEarthObject(
+            pdes=neo[pdes], full_name=neo[full_name], name=neo[name],
+            diameter=neo[diameter], pha=neo[pha],
+            extra={column: _csv_value(neo[index]) for column, index in extras}
+            if extras else None))
     return neo_list
 
 
-def load_approaches(cad_json_path):
+def _csv_rows(text, width):
+    """Yield the fields of each CSV record in text, split up to `width` fields.
+
+    When every quoted field is a simple one (no commas, quotes or line breaks
+    inside), the quotes are dropped and each line is split with `str.split`,
+    which leaves everything after the last wanted field as one string.
+    Otherwise the text goes through the csv module.
+    """
+    simple = 0
+    for match in _QUOTED_FIELD.finditer(text):
+        if match.start() == 0 or text[match.start() - 1] in ',\n':
+            simple += 1
+    if simple * 2 != text.count('"'):
+        yield from (row for row in csv.reader(io.StringIO(text)) if row)
+        return
+
+    for line in text.replace('"', '').split('\n'):
+        if line and line != '\r':
+            fields = line.split(',', width)
+            if len(fields) == width:
+                fields[-1] = fields[-1].rstrip('\r')
+            yield fields
+
+
+def _csv_value(text):
+    """Convert an extra CSV column's value to a float, or None if empty."""
+    if not text:
+        return None
+    try:
+        return float(text)
+    except ValueError:
+        return text
+
+
+def load_approaches(cad_json_path, stream=False, compact=False):
     """Read close approach data from a JSON file.
 
     :param cad_json_path: A path to a JSON file.
+    :param stream: If true, build the collection with `iter_approaches`
+        instead of parsing the whole document up front.
+    :param compact: If true, create compact-mode CloseApproaches, which
+        store their time as an integer.
     :return: A collection of CloseApproaches.
     """
+    if stream:
+        return list(iter_approaches(cad_json_path, compact))
+
     cad_list = []
 
     with open(cad_json_path, 'r') as file:
@@ -46,6 +135,315 @@ def load_approaches(cad_json_path):
                 des=str(approach[0]),
                 cd=str(approach[3]),
                 dist_min=float(approach[5]),
-                v_rel=float(approach[7])))
+                v_rel=float(approach[7]),
+                compact=compact))
             count += 1
     return cad_list
+
+
+def iter_approaches(cad_json_path, compact=False):
+    """Lazily read close approach data from a JSON file.
+
+    Rather than decoding the entire document, this walks the "data" array one
+    row at a time, so only the current row (and a small read buffer) is ever
+    held alongside the CloseApproaches already produced.
+
+    The "fields" header locates the columns. NASA's files list it before
+    "data"; if it only comes afterwards, it is read from the end of the file,
+    and if it's missing entirely the standard `CAD_FIELDS` layout is assumed.
+
+    :param cad_json_path: A path to a JSON file.
+    :param compact: If true, create compact-mode CloseApproaches.
+    :yield: CloseApproaches, in file order.
+    """
+    with open(cad_json_path, 'r') as file:
+        stream = _JSONStream(file)
+        stream.expect('{')
+        fields = None
+        while stream.peek() != '}':
+            key = stream.value()
+            stream.expect(':')
+            if key == 'data':
+                if fields is None:
+                    fields = _trailing_fields(cad_json_path) or CAD_FIELDS
+                yield from _iter_rows(stream, fields, compact)
+                return
+            elif key == 'fields':
+                fields = stream.value()
+            else:
+                stream.value()  # skip "signature", "count", etc.
+            if stream.peek() == ',':
+                stream.expect(',')
+
+
+def _iter_rows(stream, fields, compact):
+    """Yield a CloseApproach for each row of the "data" array in `stream`."""
+    des, cd = fields.index('des'), fields.index('cd')
+    dist_min, v_rel = fields.index('dist_min'), fields.index('v_rel')
+
+    # Approaches of the same NEO share one designation string.
+    designations = {}
+
+    stream.expect('[')
+    if stream.peek() == ']':
+        return
+    while True:
+        row = stream.value()
+        designation = str(row[des])
+        yield CloseApproach(des=designations.setdefault(designation, designation),
+                            cd=str(row[cd]),
+                            dist_min=float(row[dist_min]),
+                            v_rel=float(row[v_rel]),
+                            compact=compact)
+        if stream.peek() == ']':
+            return
+        stream.expect(',')
+
+
+def load_parallel(neo_csv_path, cad_json_path, workers, compact=False):
+    """Read NEOs and close approaches with a pool of worker processes.
+
+    The CSV file is read by one worker while the others parse the JSON file's
+    "data" array, which is split by byte offset into row-aligned chunks. The
+    workers return plain columns, which are turned into CloseApproaches here
+    in the original order.
+
+    :param neo_csv_path: A path to a CSV file of near-Earth objects.
+    :param cad_json_path: A path to a JSON file of close approaches.
+    :param workers: The number of worker processes.
+    :param compact: If true, create compact-mode CloseApproaches.
+    :return: A tuple of a list of NearEarthObjects and a list of CloseApproaches.
+    """
+    # Imported only here: loading it would slow down every other start-up.
+    import concurrent.futures
+
+    fields, chunks = _cad_chunks(cad_json_path, workers * _CHUNKS_PER_WORKER)
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        neos = executor.submit(load_neos, neo_csv_path)
+        parsed = executor.map(_parse_cad_chunk,
+                              *zip(*[(cad_json_path, start, stop, fields)
+                                     for start, stop in chunks]))
+        approaches = []
+        for designations, minutes, distances, velocities in parsed:
+            for des, minute, dist, v_rel in zip(designations, minutes,
+                                                distances, velocities):
+                approaches.append(CloseApproach(des=des, minutes=minute,
+                                                dist_min=dist, v_rel=v_rel,
+                                                compact=compact))
+        return neos.result(), approaches
+
+
+def _cad_chunks(cad_json_path, count):
+    """Split the "data" array of a CAD file into about `count` chunks.
+
+    :return: A tuple of the "fields" header and a list of (start, stop) byte
+        offsets, each covering whole rows separated by commas.
+    """
+    with open(cad_json_path, 'rb') as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        fields, start = _cad_layout(data, cad_json_path)
+        if data[start:start + 64].lstrip().startswith(b']'):
+            return fields, []
+
+        # Step through the array, moving each cut forward to the next row gap.
+        step = max(1, (len(data) - start) // count)
+        chunks = []
+        while True:
+            gap = _ROW_GAP.search(data, start + step)
+            end = _DATA_END.search(data, start, gap.end() if gap else len(data))
+            if end is not None:
+                chunks.append((start, end.start() + 1))
+                return fields, chunks
+            if gap is None:
+                raise ValueError(f'Unterminated "data" array in {cad_json_path}')
+            chunks.append((start, gap.start() + 1))
+            start = gap.end() - 1
+
+
+def _cad_layout(data, cad_json_path):
+    """Return the "fields" header of a mapped CAD file, and where "data" starts.
+
+    :return: A tuple of the fields and the offset just inside the "data" array.
+    """
+    match = _DATA_START.search(data)
+    if match is None:
+        raise ValueError(f'No "data" array in {cad_json_path}')
+    fields = None
+    header = data.find(b'"fields"', 0, match.start())
+    if header != -1:
+        text = data[header:match.start()].decode('utf-8')
+        fields, _ = _DECODER.raw_decode(text[text.index(':') + 1:].lstrip(_WHITESPACE))
+    return fields or _trailing_fields(cad_json_path) or CAD_FIELDS, match.end()
+
+
+def load_approaches_after(cad_json_path, minutes, loaded=(), compact=False):
+    """Read the close approaches from a given time on from a JSON file.
+
+    NASA's close approach data is in time order, so the rows up to the given
+    time are skipped by bisecting the file's "data" array, decoding only a
+    row here and there, and only the rows from it on are parsed. This is how
+    a database catches up with a newer copy of the file it was loaded from:
+
+        minutes, loaded = database.latest()
+        database.add_approaches(load_approaches_after(cad_json_path, minutes, loaded))
+
+    Several approaches can share a minute, and a newer file may add some at
+    the very minute the database ends with, so the approaches at that time
+    are read too, except those of NEOs in loaded.
+
+    :param cad_json_path: A path to a JSON file, in time order.
+    :param minutes: The time (in minutes since the Unix epoch, as
+        CloseApproach.minutes) of the last approach already loaded.
+    :param loaded: The designations of the NEOs whose approaches at that
+        time are already loaded.
+    :param compact: If true, create compact-mode CloseApproaches.
+    :return: A list of the CloseApproaches not yet loaded, in file order.
+    """
+    with open(cad_json_path, 'rb') as file, \
+            mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        fields, start = _cad_layout(data, cad_json_path)
+        des, cd = fields.index('des'), fields.index('cd')
+        dist_min, v_rel = fields.index('dist_min'), fields.index('v_rel')
+        end = _last_row_end(data, start)
+
+        # Every row starting before low is earlier than minutes, and every
+        # row starting at or after high is no earlier.
+        low, high = start, end
+        while high - low > _BISECT_BELOW:
+            middle = (low + high) // 2
+            gap = _ROW_GAP.search(data, middle, high)
+            if gap is None:
+                break
+            row_start = gap.end() - 1
+            row = json.loads(data[row_start:data.find(b']', row_start) + 1])
+            if datetime_to_minutes(cd_to_datetime(str(row[cd]))) < minutes:
+                low = row_start
+            else:
+                high = middle
+        rows = json.loads(b'[' + data[low:end] + b']')
+
+    approaches = []
+    for row in rows:
+        time = datetime_to_minutes(cd_to_datetime(str(row[cd])))
+        if time > minutes or (time == minutes and str(row[des]) not in loaded):
+            approaches.append(CloseApproach(des=str(row[des]), minutes=time,
+                                            dist_min=float(row[dist_min]),
+                                            v_rel=float(row[v_rel]), compact=compact))
+    return approaches
+
+
+def _last_row_end(data, start):
+    """Return the offset just past the last row of the "data" array at start.
+
+    The array's closing bracket is the last one directly preceded by another
+    (the end of its last row), found by searching back from the end of the
+    file. If the array is empty, start is returned.
+    """
+    close = data.rfind(b']', start)
+    while close != -1:
+        before = close - 1
+        while before >= start and data[before] in b' \t\n\r':
+            before -= 1
+        if before >= start and data[before] == ord(']'):
+            return before + 1
+        close = data.rfind(b']', start, close)
+    return start
+
+
+def _parse_cad_chunk(cad_json_path, start, stop, fields):
+    """Parse the rows between two byte offsets of a CAD file, in a worker.
+
+    :return: A tuple of designations, times (minutes since the epoch),
+        distances and velocities, in file order.
+    """
+    with open(cad_json_path, 'rb') as file:
+        file.seek(start)
+        rows = json.loads(b'[' + file.read(stop - start) + b']')
+
+    des, cd = fields.index('des'), fields.index('cd')
+    dist_min, v_rel = fields.index('dist_min'), fields.index('v_rel')
+    designations, shared = [], {}
+    minutes, distances, velocities = array.array('q'), array.array('d'), array.array('d')
+    for row in rows:
+        designation = str(row[des])
+        designations.append(shared.setdefault(designation, designation))
+        minutes.append(datetime_to_minutes(cd_to_datetime(str(row[cd]))))
+        distances.append(float(row[dist_min]))
+        velocities.append(float(row[v_rel]))
+    return designations, minutes, distances, velocities
+
+
+def _trailing_fields(cad_json_path, size=1 << 16):
+    """Return the "fields" header from the tail of a JSON file, or None."""
+    with open(cad_json_path, 'rb') as file:
+        file.seek(0, 2)
+        file.seek(max(0, file.tell() - size))
+        tail = file.read().decode('utf-8', errors='ignore')
+    start = tail.rfind('"fields"')
+    if start == -1:
+        return None
+    colon = tail.find(':', start)
+    try:
+        fields, _ = _DECODER.raw_decode(tail[colon + 1:].lstrip(_WHITESPACE))
+    except json.JSONDecodeError:
+        return None
+    return fields
+
+
+class _JSONStream:
+    """Decode consecutive JSON values from a file without reading all of it."""
+
+    def __init__(self, file):
+        """Create a new _JSONStream over an open text file."""
+        self.file = file
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        """Append the next chunk of the file to the buffer.
+
+        Returns False once the file is exhausted.
+        """
+        chunk = self.file.read(_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Skip whitespace and return the next character ('' at the end)."""
+        while True:
+            buf, pos = self.buf, self.pos
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        """Consume `char` as the next token, or raise JSONDecodeError."""
+        if self.peek() != char:
+            raise json.JSONDecodeError(f'Expecting {char!r}', self.buf, self.pos)
+        self.pos += 1
+
+    def value(self):
+        """Decode and return the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Most likely the value straddles the end of the buffer.
+                if not self._fill():
+                    raise
+                continue
+            # A bare number may have been cut short by the chunk boundary.
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
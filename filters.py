@@ -5,14 +5,38 @@ from itertools import islice
 import logging
 import sys
 
+from helpers import date_to_day
+
 
 class UnsupportedCriterionError(NotImplementedError):
     """A filter criterion is unsupported."""
 
 
+# The SQL comparison for each comparator that "AttributeFilter.where" supports.
+SQL_OPERATORS = {
+    operator.eq: '=',
+    operator.ge: '>=',
+    operator.gt: '>',
+    operator.le: '<=',
+    operator.lt: '<',
+}
+
+
 class AttributeFilter:
     """A general superclass for filters on comparable attributes."""
 
+    # Relative cost of evaluating this filter per approach, for ordering
+    # filters in `ApproachTable.plan`.
+    cost = 1
+
+    # Whether the attribute belongs to the approach's NEO, so the filter can
+    # be evaluated once per NEO with "neo_mask".
+    neo_level = False
+
+    # The column of the attribute in the tables of `sqlstore.py`, or None
+    # if it isn't stored there.
+    sql_column = None
+
     def __init__(self, op, value):
         """Construct a new "AttributeFilter".
 
@@ -42,6 +66,94 @@ class AttributeFilter:
         """
         raise UnsupportedCriterionError
 
+    @classmethod
+    def column(cls, table):
+        """Get the attribute of interest for every row of an ApproachTable.
+
+        :param table: A "columnar.ApproachTable" to evaluate.
+        :return: An array with one value per approach.
+
+        This is overridden in the subclasses, mirroring "get".
+        """
+        raise UnsupportedCriterionError
+
+    @property
+    def reference(self):
+        """Return the value to compare against the output of "column"."""
+        return self.value
+
+    @classmethod
+    def neo_column(cls, table):
+        """Get the attribute of interest for every NEO of an ApproachTable.
+
+        Overridden by the subclasses with "neo_level" set.
+        """
+        raise UnsupportedCriterionError
+
+    def bounds(self):
+        """Return the (low, high) range of "reference"-scale values that pass.
+
+        Either end is None if unbounded, and strict comparisons give the
+        bound itself, so the range may be slightly too wide. Returns None
+        if the comparator isn't one that describes a single range.
+        """
+        if self.op is operator.eq:
+            return self.reference, self.reference
+        if self.op in (operator.ge, operator.gt):
+            return self.reference, None
+        if self.op in (operator.le, operator.lt):
+            return None, self.reference
+        return None
+
+    @property
+    def bitmap_name(self):
+        """Return the name of the ApproachTable bitmap that is this filter's mask.
+
+        None if there is no such bitmap (the default).
+        """
+        return None
+
+    def where(self):
+        """Return an SQL condition equivalent to this filter.
+
+        :return: A tuple of the condition, with a "?" placeholder, and its
+            parameters, e.g. ('approaches.distance <= ?', (0.05,)).
+
+        Raises UnsupportedCriterionError if the attribute isn't stored in
+        SQL or the comparator has no SQL equivalent.
+        """
+        if self.sql_column is None or self.op not in SQL_OPERATORS:
+            raise UnsupportedCriterionError
+        return f'{self.sql_column} {SQL_OPERATORS[self.op]} ?', (self.reference,)
+
+    def mask(self, table):
+        """Return a boolean array marking the approaches that pass."""
+        return self.op(self.column(table), self.reference)
+
+    def neo_mask(self, table):
+        """Return a boolean array marking the NEOs whose approaches pass."""
+        return self.op(self.neo_column(table), self.reference)
+
+    @property
+    def key(self):
+        """Return a hashable identity: filter class, comparator and value.
+
+        Filters with equal keys pass exactly the same approaches. The
+        comparator is compared as an object, not by name, since every lambda
+        is named "<lambda>".
+        """
+        return (type(self), self.op, self.value)
+
+    def __eq__(self, other):
+        """Return whether another filter has the same key."""
+        if not isinstance(other, AttributeFilter):
+            return NotImplemented
+        return self.key == other.key
+
+    def __hash__(self):
+        """Return the hash of this filter's key."""
+        return hash(self.key)
+
     def __repr__(self):
         """Return code-like string representation."""
         return f'{self.__class__.__name__}' + \
@@ -52,6 +164,8 @@ class AttributeFilter:
 class DistanceFilter(AttributeFilter):
     """Class for filtering approaches by distance."""
 
+    sql_column = 'approaches.distance'
+
     def __init__(self, op, value):
         """Construct a new DistanceFilter.
 
@@ -65,6 +179,11 @@ class DistanceFilter(AttributeFilter):
         """Return distance from this approach."""
         return approach.distance
 
+    @classmethod
+    def column(cls, table):
+        """Return distance of every approach in the table."""
+        return table.distance
+
     @classmethod
     def validateDist(cls, val):
         """Convert to float and check validity of distance to be tested."""
@@ -78,6 +197,10 @@ class DistanceFilter(AttributeFilter):
 class DateFilter(AttributeFilter):
     """Class for filtering approaches by date."""
 
+    # Times are divided into days first.
+    cost = 2
+    sql_column = 'approaches.day'
+
     def __init__(self, op, value):
         """Construct a new DateFilter.
 
@@ -91,10 +214,41 @@ class DateFilter(AttributeFilter):
         """Return date of this approach."""
         return approach.time.date()
 
+    @classmethod
+    def column(cls, table):
+        """Return day number of every approach in the table."""
+        return table.day
+
+    @property
+    def reference(self):
+        """Return the date to compare against as a day number."""
+        return date_to_day(self.value)
+
+    def day_bounds(self):
+        """Return the inclusive (first, last) day numbers that pass.
+
+        Either end is None if unbounded. Returns None if the comparator
+        isn't one that describes a single range of days.
+        """
+        day = self.reference
+        if self.op is operator.eq:
+            return day, day
+        if self.op is operator.ge:
+            return day, None
+        if self.op is operator.gt:
+            return day + 1, None
+        if self.op is operator.le:
+            return None, day
+        if self.op is operator.lt:
+            return None, day - 1
+        return None
+
 
 class VelocityFilter(AttributeFilter):
     """Class for filtering approaches by velocity."""
 
+    sql_column = 'approaches.velocity'
+
     def __init__(self, op, value):
         """Construct a new VelocityFilter.
 
@@ -108,10 +262,20 @@ class VelocityFilter(AttributeFilter):
         """Return velocity at this approach."""
         return approach.velocity
 
+    @classmethod
+    def column(cls, table):
+        """Return velocity of every approach in the table."""
+        return table.velocity
+
 
 class DiameterFilter(AttributeFilter):
     """Class for filtering approaches by diameter."""
 
+    # Diameters are looked up through each approach's NEO.
+    cost = 3
+    neo_level = True
+    sql_column = 'neos.diameter'
+
     def __init__(self, op, value):
         """Construct a new DiameterFilter.
 
@@ -125,10 +289,25 @@ class DiameterFilter(AttributeFilter):
         """Return diameter of neo associated with this approach."""
         return approach.neo.diameter
 
+    @classmethod
+    def column(cls, table):
+        """Return diameter of neo associated with every approach."""
+        return table.diameter
+
+    @classmethod
+    def neo_column(cls, table):
+        """Return diameter of every neo in the table."""
+        return table.neo_diameter
+
 
 class HazardFilter(AttributeFilter):
     """Class for filtering approaches by hazard status."""
 
+    # Hazard flags are looked up through each approach's NEO.
+    cost = 3
+    neo_level = True
+    sql_column = 'neos.hazardous'
+
     def __init__(self, op, value):
         """Construct a new HazardFilter.
 
@@ -144,6 +323,23 @@ class HazardFilter(AttributeFilter):
         """Return hazardous status of neo associated with this approach."""
         return approach.neo.hazardous
 
+    @classmethod
+    def column(cls, table):
+        """Return hazardous status of neo associated with every approach."""
+        return table.hazardous
+
+    @classmethod
+    def neo_column(cls, table):
+        """Return hazardous status of every neo in the table."""
+        return table.neo_hazardous
+
+    @property
+    def bitmap_name(self):
+        """Return the name of the hazard bitmap that is this filter's mask."""
+        if self.op is operator.eq:
+            return 'hazardous' if self.value else 'not_hazardous'
+        return None
+
 
 def create_filters(
         date=None, start_date=None, end_date=None,
@@ -194,6 +390,20 @@ def create_filters(
     return filters
 
 
+def filters_key(filters):
+    """Return a canonical, hashable identity for a collection of filters.
+
+    The key ignores the order of the filters and any repeats, neither of
+    which changes what passes them all. Returns None if some filter has no
+    key (e.g. a plain function), or one that can't be hashed (e.g. because
+    its value is a list).
+    """
+    try:
+        return frozenset(filter.key for filter in filters)
+    except (AttributeError, TypeError):
+        return None
+
+
 def limit(iterator, n=None):
     """Produce a limited stream of values from an iterator.
 
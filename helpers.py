@@ -9,11 +9,25 @@ The `datetime_to_str` function converts a Python `datetime` into a string.
 Although `datetime`s already have human-readable string representations, those
 representations display seconds, but NASA's data (and our datetimes!) don't
 provide that level of resolution, so the output format also will not.
+
+The `datetime_to_minutes`, `minutes_to_datetime` and `date_to_day` functions
+convert to and from whole minutes (or days) since the Unix epoch, which is how
+the columnar and snapshot storage keep approach times.
 """
 import datetime
+import functools
+
+
+EPOCH = datetime.datetime(1970, 1, 1)
+MINUTES_PER_DAY = 24 * 60
+
+_ONE_MINUTE = datetime.timedelta(minutes=1)
 
+_MONTHS = {'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+           'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12}
 
-def cd_to_datetime(calendar_date):
+
+def cd_to_datetime(calendar_date, cache=True):
     """Convert a NASA-formatted calendar date/time description into a datetime.
 
     NASA's format, at least in the `cd` field of close approach data, uses the
@@ -23,12 +37,43 @@ def cd_to_datetime(calendar_date):
 
     This will become the Python object `datetime.datetime(2020, 12, 31, 12, 0)`.
 
+    Strings in exactly that layout are sliced apart directly; anything else -
+    including malformed input - is handed to `strptime`, so results and errors
+    are the same as `strptime`'s.
+
     :param calendar_date: A calendar date in YYYY-bb-DD hh:mm format.
+    :param cache: Whether to look the date part up in an LRU cache, which
+        helps because consecutive approaches often share a date.
     :return: A naive `datetime` corresponding to the given calendar date and time.
     """
+    if type(calendar_date) is str and len(calendar_date) == 17 and \
+            calendar_date.isascii() and calendar_date[11] == ' ' and \
+            calendar_date[14] == ':':
+        if cache:
+            ymd = _cached_parse_cd_date(calendar_date[:11])
+        else:
+            ymd = _parse_cd_date(calendar_date[:11])
+        hour, minute = calendar_date[12:14], calendar_date[15:]
+        if ymd is not None and hour.isdigit() and minute.isdigit():
+            try:
+                return datetime.datetime(*ymd, int(hour), int(minute))
+            except ValueError:
+                pass  # e.g. 24:00 or Feb 30, for strptime to reject
     return datetime.datetime.strptime(calendar_date, "%Y-%b-%d %H:%M")
 
 
+def _parse_cd_date(date):
+    """Return (year, month, day) of a YYYY-bb-DD string, or None if malformed."""
+    year, month, day = date[:4], _MONTHS.get(date[5:8]), date[9:]
+    if date[4] != '-' or date[8] != '-' or month is None or \
+            not year.isdigit() or not day.isdigit():
+        return None
+    return int(year), month, int(day)
+
+
+_cached_parse_cd_date = functools.lru_cache(maxsize=1024)(_parse_cd_date)
+
+
 def datetime_to_str(dt):
     """Convert a naive Python datetime into a human-readable string.
 
@@ -41,4 +86,23 @@ def datetime_to_str(dt):
     :param dt: A naive Python datetime.
     :return: That datetime, as a human-readable string without seconds.
     """
+    # isoformat is several times faster than strftime, but pads years
+    # before 1000 to four digits where strftime doesn't.
+    if dt.year >= 1000:
+        return dt.isoformat(' ', 'minutes')
     return datetime.datetime.strftime(dt, "%Y-%m-%d %H:%M")
+
+
+def datetime_to_minutes(dt):
+    """Return a naive datetime as whole minutes since the Unix epoch."""
+    return (dt - EPOCH) // _ONE_MINUTE
+
+
+def minutes_to_datetime(minutes):
+    """Return whole minutes since the Unix epoch as a naive datetime."""
+    return EPOCH + datetime.timedelta(minutes=int(minutes))
+
+
+def date_to_day(date):
+    """Return a date as whole days since the Unix epoch."""
+    return (date - EPOCH.date()).days
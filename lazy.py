@@ -0,0 +1,202 @@
+"""Lazily-created NEOs and close approaches for NearEarthObjects.
+
+A database loaded from a snapshot (see `snapshot.py`) starts out as nothing but
+columns of strings and numbers. The sequences in this module create each
+`NearEarthObject` and `CloseApproach` from those columns the first time it is
+accessed, and cache it, so every access returns the same linked object.
+
+This module doesn't import NumPy: any indexable columns will do, such as
+memoryviews over memory-mapped files. That keeps `inspect` on a snapshot quick.
+"""
+
+import collections.abc
+
+from helpers import minutes_to_datetime
+from models import NearEarthObject, CloseApproach
+
+
+class ApproachColumns:
+    """Indexable per-approach columns, in approach order.
+
+    time: minutes since the Unix epoch
+    distance: minimum approach distance in au
+    velocity: relative velocity in km/s
+    neo_index: position of the approach's NEO
+    neo_order: approach positions grouped by NEO (time order within a NEO)
+    neo_offsets: where each NEO's group starts in neo_order (one extra at the end)
+    """
+
+    def __init__(self, time, distance, velocity, neo_index,
+                 neo_order, neo_offsets):
+        """Create a new ApproachColumns."""
+        self.time = time
+        self.distance = distance
+        self.velocity = velocity
+        self.neo_index = neo_index
+        self.neo_order = neo_order
+        self.neo_offsets = neo_offsets
+
+    def __len__(self):
+        """Return the number of approaches."""
+        return len(self.time)
+
+
+class LazyNEOs(collections.abc.Sequence):
+    """A read-only sequence of NearEarthObjects created on first access.
+
+    The approaches attribute must be set to the LazyApproaches of the same
+    database before any NEO is accessed.
+    """
+
+    def __init__(self, designation, name, full_name, diameter, hazardous, extra=None):
+        """Create a new LazyNEOs from parallel lists.
+
+        Arguments:
+        designation, name, full_name: lists of str ('' for no name)
+        diameter: list of float, None if unknown
+        hazardous: list of bool
+        extra: list of dict of extra columns, or None (as NearEarthObject.extra);
+            None for no extra columns at all
+        """
+        self.designation = designation
+        self.name = name
+        self.full_name = full_name
+        self.diameter = diameter
+        self.hazardous = hazardous
+        self.extra = extra
+        self.approaches = None
+        self._cache = [None] * len(designation)
+
+    def __len__(self):
+        """Return the number of NEOs."""
+        return len(self._cache)
+
+    def __getitem__(self, index):
+        """Return the NearEarthObject at index (or a list, for a slice)."""
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        neo = self._cache[index]
+        if neo is None:
+            neo = self._cache[index] = self._make(index)
+        return neo
+
+    def __iter__(self):
+        """Iterate over every NEO, creating them as needed."""
+        for position in range(len(self)):
+            yield self[position]
+
+    def _make(self, position):
+        """Create the NearEarthObject at position."""
+        diameter = self.diameter[position]
+        neo = NearEarthObject(pdes=self.designation[position],
+                              name=self.name[position],
+                              full_name=self.full_name[position],
+                              diameter='' if diameter is None else repr(diameter),
+                              pha='Y' if self.hazardous[position] else 'N',
+                              extra=self.extra[position] if self.extra else None)
+        neo.approaches = NEOApproaches(self.approaches, position)
+        return neo
+
+
+class LazyApproaches(collections.abc.Sequence):
+    """A read-only sequence of CloseApproaches created on first access."""
+
+    def __init__(self, columns, neos):
+        """Create a new LazyApproaches.
+
+        Arguments:
+        columns: An ApproachColumns.
+        neos: The NEOs (e.g. a LazyNEOs) that columns.neo_index refers to.
+        """
+        self.columns = columns
+        self.neos = neos
+        self._cache = [None] * len(columns)
+
+    def __len__(self):
+        """Return the number of approaches."""
+        return len(self._cache)
+
+    def __getitem__(self, index):
+        """Return the CloseApproach at index (or a list, for a slice)."""
+        if isinstance(index, slice):
+            return [self[row] for row in range(*index.indices(len(self)))]
+        approach = self._cache[index]
+        if approach is None:
+            approach = self._cache[index] = self._make(index)
+        return approach
+
+    def __iter__(self):
+        """Iterate over every approach, creating them as needed."""
+        for row in range(len(self)):
+            yield self[row]
+
+    def _make(self, row):
+        """Create the CloseApproach for one row of the columns."""
+        columns = self.columns
+        neo = self.neos[columns.neo_index[row]]
+        approach = CloseApproach(des=neo.designation,
+                                 time=minutes_to_datetime(columns.time[row]),
+                                 dist_min=columns.distance[row],
+                                 v_rel=columns.velocity[row])
+        approach.neo = neo
+        return approach
+
+    def rows_of(self, position):
+        """Return the rows of the NEO at position, in approach order."""
+        offsets = self.columns.neo_offsets
+        return self.columns.neo_order[offsets[position]:offsets[position + 1]]
+
+
+class NEOApproaches(collections.abc.Sequence):
+    """The approaches of one NEO, as a view onto a LazyApproaches."""
+
+    def __init__(self, approaches, position):
+        """Create a new NEOApproaches for the NEO at position."""
+        self._approaches = approaches
+        self._position = position
+
+    def __len__(self):
+        """Return the number of approaches of this NEO."""
+        return len(self._approaches.rows_of(self._position))
+
+    def __getitem__(self, index):
+        """Return the CloseApproach at index (or a list, for a slice)."""
+        rows = self._approaches.rows_of(self._position)
+        if isinstance(index, slice):
+            return [self._approaches[row] for row in rows[index]]
+        return self._approaches[rows[index]]
+
+    def __iter__(self):
+        """Iterate over this NEO's approaches."""
+        for row in self._approaches.rows_of(self._position):
+            yield self._approaches[row]
+
+    def __repr__(self):
+        """Return code-like string representation."""
+        return f'NEOApproaches({self[:]!r})'
+
+
+class NEOIndex(collections.abc.Mapping):
+    """A mapping of keys (e.g. names) to NEOs, by position in a sequence."""
+
+    def __init__(self, positions, neos):
+        """Create a new NEOIndex.
+
+        Arguments:
+        positions: A dict of key to position in neos.
+        neos: A sequence of NEOs, such as a LazyNEOs.
+        """
+        self._positions = positions
+        self._neos = neos
+
+    def __getitem__(self, key):
+        """Return the NEO for key, or raise KeyError."""
+        return self._neos[self._positions[key]]
+
+    def __iter__(self):
+        """Iterate over the keys."""
+        return iter(self._positions)
+
+    def __len__(self):
+        """Return the number of keys."""
+        return len(self._positions)
@@ -5,7 +5,7 @@ See `README.md` for a detailed discussion of this project.
 
 This script can be invoked from the command line::
 
-    $ python3 main.py {inspect,query,interactive} [args]
+    $ python3 main.py {inspect,query,stats,histogram,interactive,serve} [args]
 
 The `inspect` subcommand looks up an NEO by name or by primary designation, and
 optionally lists all of that NEO's known close approaches:
@@ -23,18 +23,72 @@ The `query` subcommand searches for close approaches that match given criteria:
     $ python3 main.py query --start-date 2000-01-01 --max-diameter 0.1 --not-hazardous
     $ python3 main.py query --hazardous --max-distance 0.05 --min-velocity 30
 
+Matches come back in the order of the close approach data unless `--sort-by`
+orders them by distance, velocity, diameter or date (`--desc` for largest first):
+
+    $ python3 main.py query --start-date 2030-01-01 --end-date 2030-12-31 --sort-by distance --limit 20
+    $ python3 main.py query --hazardous --sort-by velocity --desc --limit 50
+
 The set of results can be limited in size and/or saved to an output file in CSV
 or JSON format:
 
     $ python3 main.py query --limit 5 --outfile results.csv
     $ python3 main.py query --limit 15 --outfile results.json
 
+A `.ndjson` or `.jsonl` output file gets newline-delimited JSON, one close
+approach per line:
+
+    $ python3 main.py query --start-date 2020-01-01 --outfile results.ndjson
+
+The `stats` subcommand takes the same filters as `query`, and prints the number
+of matches and the least, mean and greatest distance and velocity, optionally
+for each year, month or NEO apart:
+
+    $ python3 main.py stats --hazardous
+    $ python3 main.py stats --start-date 2020-01-01 --max-distance 0.05 --group-by month
+
+The `histogram` subcommand takes the same filters, and writes CSV counts of the
+matches per day, week, month or year, or in bins of distance or velocity:
+
+    $ python3 main.py histogram --hazardous --bins year
+    $ python3 main.py histogram --start-date 2020-01-01 --end-date 2020-12-31 --bins week
+    $ python3 main.py histogram --field velocity --bins 20 --outfile velocities.csv
+
 The `interactive` subcommand loads the NEO database and spawns an interactive
 command shell that can repeatedly execute `inspect` and `query` commands without
-having to wait to reload the database each time. However, it doesn't hot-reload.
+having to wait to reload the database each time. When the data files change, it
+reloads them in the background (unless given `--no-reload`), answering from the
+old database until the new one is ready.
+
+The `serve` subcommand loads the NEO database once and answers `inspect` and
+`query` requests over a local HTTP JSON API (see `server.py`), reloading the
+data files in the background when they change (see `reloader.py`):
+
+    $ python3 main.py serve --port 8000
+    $ curl 'http://127.0.0.1:8000/query?date=2020-01-01&limit=5'
+    $ curl 'http://127.0.0.1:8000/stats'
+
+With `--asyncio`, it instead serves from an asyncio event loop, and streams
+`query` results as chunked newline-delimited JSON (see `aioserver.py`):
+
+    $ python3 main.py serve --asyncio --port 8000
+    $ curl 'http://127.0.0.1:8000/query?limit=0' > approaches.ndjson
 
 If needed, the script can load data from data files other than the default with
 `--neofile` or `--cadfile`.
+
+After the data files are first parsed, a binary snapshot of the database is saved
+(by default to `data/.snapshot`) and later invocations load from it for as long
+as the data files are unchanged. Use `--no-snapshot` to always parse the files.
+When the files do need parsing, `--workers N` spreads the work over N processes:
+
+    $ python3 main.py --workers 4 --no-snapshot query --limit 5
+
+With `--sqlite FILE`, the data files are instead stored in a SQLite database
+file (see `sqlstore.py`), which answers queries without holding every close
+approach in memory, and can be shared between processes:
+
+    $ python3 main.py --sqlite data/neo.sqlite query --hazardous --max-distance 0.05
 """
 import argparse
 import cmd
@@ -45,9 +99,12 @@ import sys
 import time
 
 from extract import load_neos, load_approaches
-from database import NEODatabase
+from database import AGGREGATE_GROUPS, HISTOGRAM_FIELDS, NEODatabase, SORT_KEYS, TIME_BINS
 from filters import create_filters, limit
-from write import write_to_csv, write_to_json
+import cache
+import reloader
+import snapshot
+from write import write_histogram, write_to_csv, write_to_json, write_to_ndjson
 
 
 # Paths to the root of the project and the `data` subfolder.
@@ -73,42 +130,30 @@ def date_fromisoformat(date_string):
         raise argparse.ArgumentTypeError(f"'{date_string}' is not a valid date. Use YYYY-MM-DD.")
 
 
-def make_parser():
-    """Create an ArgumentParser for this script.
+def positive_int(number_string):
+    """Return an integer of at least 1 parsed from a string.
 
-    :return: A tuple of the top-level, inspect, and query parsers.
+    :param number_string: A whole number, e.g. '4'.
+    :return: The number, as an `int`.
     """
-    parser = argparse.ArgumentParser(
-        description="Explore past and future close approaches of near-Earth objects."
-    )
+    message = f"'{number_string}' is not a whole number of at least 1."
+    try:
+        number = int(number_string)
+    except ValueError:
+        raise argparse.ArgumentTypeError(message)
+    if number < 1:
+        raise argparse.ArgumentTypeError(message)
+    return number
 
-    # Add arguments for custom data files.
-    parser.add_argument('--neofile', default=(DATA_ROOT / 'neos.csv'),
-                        type=pathlib.Path,
-                        help="Path to CSV file of near-Earth objects.")
-    parser.add_argument('--cadfile', default=(DATA_ROOT / 'cad.json'),
-                        type=pathlib.Path,
-                        help="Path to JSON file of close approach data.")
-    subparsers = parser.add_subparsers(dest='cmd')
 
-    # Add the `inspect` subcommand parser.
-    inspect = subparsers.add_parser('inspect',
-                                    description="Inspect an NEO by primary designation or by name.")
-    inspect.add_argument('-v', '--verbose', action='store_true',
-                         help="Additionally, print all known close approaches of this NEO.")
-    inspect_id = inspect.add_mutually_exclusive_group(required=True)
-    inspect_id.add_argument('-p', '--pdes',
-                            help="The primary designation of the NEO to inspect (e.g. '433').")
-    inspect_id.add_argument('-n', '--name',
-                            help="The IAU name of the NEO to inspect (e.g. 'Halley').")
+def add_filter_arguments(parser):
+    """Add the options of `create_filters` to a subcommand's parser.
 
-    # Add the `query` subcommand parser.
-    query = subparsers.add_parser('query',
-                                  description="Query for close approaches that "
-                                              "match a collection of filters.")
-    filters = query.add_argument_group('Filters',
-                                       description="Filter close approaches by their attributes "
-                                                   "or the attributes of their NEOs.")
+    :param parser: The subparser of `query` or `stats`.
+    """
+    filters = parser.add_argument_group('Filters',
+                                        description="Filter close approaches by their attributes "
+                                                    "or the attributes of their NEOs.")
     filters.add_argument('-d', '--date', type=date_fromisoformat,
                          help="Only return close approaches on the given date, "
                               "in YYYY-MM-DD format (e.g. 2020-12-31).")
@@ -144,21 +189,165 @@ def make_parser():
     filters.add_argument('--not-hazardous', dest='hazardous', default=None, action='store_false',
                          help="If specified, only return close approaches of NEOs that "
                               "are not potentially hazardous.")
+
+
+def make_parser():
+    """Create an ArgumentParser for this script.
+
+    :return: A tuple of the top-level, inspect, and query parsers.
+    """
+    parser = argparse.ArgumentParser(
+        description="Explore past and future close approaches of near-Earth objects."
+    )
+
+    # Add arguments for custom data files.
+    parser.add_argument('--neofile', default=(DATA_ROOT / 'neos.csv'),
+                        type=pathlib.Path,
+                        help="Path to CSV file of near-Earth objects.")
+    parser.add_argument('--cadfile', default=(DATA_ROOT / 'cad.json'),
+                        type=pathlib.Path,
+                        help="Path to JSON file of close approach data.")
+    parser.add_argument('--snapshot-dir', default=(DATA_ROOT / '.snapshot'),
+                        type=pathlib.Path,
+                        help="Directory in which to cache the parsed database.")
+    parser.add_argument('--no-snapshot', action='store_true',
+                        help="Always parse the data files, and don't save a snapshot.")
+    parser.add_argument('--sqlite', type=pathlib.Path,
+                        help="Store the data files in this SQLite database file, and "
+                             "query it rather than holding them in memory.")
+    parser.add_argument('--workers', default=1, type=positive_int,
+                        help="Number of processes with which to parse the data files.")
+    subparsers = parser.add_subparsers(dest='cmd')
+
+    # Add the `inspect` subcommand parser.
+    inspect = subparsers.add_parser('inspect',
+                                    description="Inspect an NEO by primary designation or by name.")
+    inspect.add_argument('-v', '--verbose', action='store_true',
+                         help="Additionally, print all known close approaches of this NEO.")
+    inspect_id = inspect.add_mutually_exclusive_group(required=True)
+    inspect_id.add_argument('-p', '--pdes',
+                            help="The primary designation of the NEO to inspect (e.g. '433').")
+    inspect_id.add_argument('-n', '--name',
+                            help="The IAU name of the NEO to inspect (e.g. 'Halley').")
+
+    # Add the `query` subcommand parser.
+    query = subparsers.add_parser('query',
+                                  description="Query for close approaches that "
+                                              "match a collection of filters.")
+    add_filter_arguments(query)
     query.add_argument('-l', '--limit', type=int,
                        help="The maximum number of matches to return. "
                             "Defaults to 10 if no --outfile is given.")
+    query.add_argument('--sort-by', choices=tuple(SORT_KEYS),
+                       help="Return the matches in order of this attribute, rather than "
+                            "in the order of the close approach data.")
+    query.add_argument('--desc', dest='descending', action='store_true',
+                       help="With --sort-by, return the largest values first.")
     query.add_argument('-o', '--outfile', type=pathlib.Path,
                        help="File in which to save structured results. "
                             "If omitted, results are printed to standard output.")
 
+    # Add the `stats` subcommand parser.
+    stats_parser = subparsers.add_parser('stats',
+                                         description="Summarize the distances and velocities "
+                                                     "of close approaches that match a "
+                                                     "collection of filters.")
+    add_filter_arguments(stats_parser)
+    stats_parser.add_argument('-g', '--group-by', choices=AGGREGATE_GROUPS,
+                              help="Summarize the matches of each year, month or NEO "
+                                   "(by primary designation) apart.")
+
+    # Add the `histogram` subcommand parser.
+    histogram_parser = subparsers.add_parser('histogram',
+                                             description="Count the close approaches that "
+                                                         "match a collection of filters, in "
+                                                         "bins of time, distance or velocity.")
+    add_filter_arguments(histogram_parser)
+    histogram_parser.add_argument('-f', '--field', choices=HISTOGRAM_FIELDS, default='time',
+                                  help="The attribute to bin. Defaults to time.")
+    histogram_parser.add_argument('-b', '--bins',
+                                  help=f"For time, one of {', '.join(TIME_BINS)} (the default "
+                                       "is year). For distance and velocity, the number of "
+                                       "equal-width bins (the default is 10).")
+    histogram_parser.add_argument('-o', '--outfile', type=pathlib.Path,
+                                  help="CSV file in which to save the histogram. "
+                                       "If omitted, it's printed to standard output.")
+
     repl = subparsers.add_parser('interactive',
                                  description="Start an interactive command session "
                                              "to repeatedly run `interact` and `query` commands.")
     repl.add_argument('-a', '--aggressive', action='store_true',
                       help="If specified, kill the session whenever a project file is modified.")
+    repl.add_argument('--no-reload', action='store_true',
+                      help="Don't reload the data files when they change.")
+
+    # Add the `serve` subcommand parser.
+    serve = subparsers.add_parser('serve',
+                                  description="Serve `inspect` and `query` over a local "
+                                              "HTTP JSON API.")
+    serve.add_argument('--host', default='127.0.0.1',
+                       help="The address on which to listen. Defaults to localhost.")
+    serve.add_argument('--port', type=int, default=8000,
+                       help="The port on which to listen. Defaults to 8000.")
+    serve.add_argument('-v', '--verbose', action='store_true',
+                       help="Log each request to standard error.")
+    serve.add_argument('--cache-entries', type=int, default=cache.DEFAULT_MAX_ENTRIES,
+                       help="The number of query results to cache (0 for none). "
+                            "Defaults to %(default)s.")
+    serve.add_argument('--asyncio', action='store_true',
+                       help="Serve from an asyncio event loop, streaming `query` "
+                            "results as chunked NDJSON.")
+    serve.add_argument('--chunk-rows', type=int,
+                       help="With --asyncio, the number of approaches sent before "
+                            "serving other requests. Defaults to "
+                            "aioserver.DEFAULT_CHUNK_ROWS.")
+    serve.add_argument('--reload-interval', type=float, default=reloader.DEFAULT_INTERVAL,
+                       help="Seconds between checks for changed data files, which are "
+                            "reloaded in the background (0 never to check). "
+                            "Defaults to %(default)s.")
     return parser, inspect, query
 
 
+def load_database(args):
+    """Create the `NEODatabase`, from a snapshot of the data files when possible.
+
+    If no valid snapshot exists, the data files are parsed and a new snapshot
+    is saved for next time (unless `--no-snapshot` was given). With `--sqlite`,
+    the data files are instead stored in that SQLite database file, unless it
+    already holds them, and the database is a `sqlstore.SQLiteDatabase` over it.
+
+    :param args: All arguments from the command line, as parsed by the top-level parser.
+    :return: A `NEODatabase` of the NEOs and close approaches in the data files.
+    """
+    sources = (args.neofile, args.cadfile)
+    if args.sqlite:
+        # Imported only here, so that other runs don't load sqlite3.
+        import sqlstore
+        database = sqlstore.load(args.sqlite, sources)
+        if database is None:
+            sqlstore.ingest(args.sqlite, args.neofile, args.cadfile)
+            database = sqlstore.load(args.sqlite, sources)
+        return database
+    if not args.no_snapshot:
+        database = snapshot.load(args.snapshot_dir, sources)
+        if database is not None:
+            return database
+
+    # Extract data from the data files into structured Python objects.
+    if args.workers > 1:
+        from extract import load_parallel
+        database = NEODatabase(*load_parallel(args.neofile, args.cadfile, args.workers))
+    else:
+        database = NEODatabase(load_neos(args.neofile),
+                               load_approaches(args.cadfile, stream=True))
+    if not args.no_snapshot:
+        try:
+            snapshot.save(database, args.snapshot_dir, sources)
+        except OSError as err:
+            print(f"Unable to save a snapshot: {err}", file=sys.stderr)
+    return database
+
+
 def inspect(database, pdes=None, name=None, verbose=False):
     """Perform the `inspect` subcommand.
 
@@ -195,6 +384,17 @@ def inspect(database, pdes=None, name=None, verbose=False):
     return neo
 
 
+def filters_from_args(args):
+    """Return the filters described by the options of `add_filter_arguments`."""
+    return create_filters(
+        date=args.date, start_date=args.start_date, end_date=args.end_date,
+        distance_min=args.distance_min, distance_max=args.distance_max,
+        velocity_min=args.velocity_min, velocity_max=args.velocity_max,
+        diameter_min=args.diameter_min, diameter_max=args.diameter_max,
+        hazardous=args.hazardous
+    )
+
+
 def query(database, args):
     """Perform the `query` subcommand.
 
@@ -203,22 +403,22 @@ def query(database, args):
 
     If an output file wasn't given, print these results to stdout, limiting to
     10 entries if no limit was specified. If an output file was given, use the
-    file's extension to infer whether the file should hold CSV or JSON data, and
-    then write the results to the output file in that format.
+    file's extension to infer whether the file should hold CSV, JSON or
+    newline-delimited JSON data, and then write the results to the output file
+    in that format.
 
     :param database: The `NEODatabase` containing data on NEOs and their close approaches.
     :param args: All arguments from the command line, as parsed by the top-level parser.
     """
     # Construct a collection of filters from arguments supplied at the command line.
-    filters = create_filters(
-        date=args.date, start_date=args.start_date, end_date=args.end_date,
-        distance_min=args.distance_min, distance_max=args.distance_max,
-        velocity_min=args.velocity_min, velocity_max=args.velocity_max,
-        diameter_min=args.diameter_min, diameter_max=args.diameter_max,
-        hazardous=args.hazardous
-    )
+    filters = filters_from_args(args)
     # Query the database with the collection of filters.
-    results = database.query(filters)
+    if args.sort_by:
+        # Only as many matches as will be shown are sorted.
+        count = args.limit or (None if args.outfile else 10)
+        results = database.top(filters, args.sort_by, count, args.descending)
+    else:
+        results = database.query(filters)
 
     if not args.outfile:
         # Write the results to stdout, limiting to 10 entries if not specified.
@@ -230,8 +430,65 @@ def query(database, args):
             write_to_csv(limit(results, args.limit or 0), args.outfile)
         elif args.outfile.suffix == '.json':
             write_to_json(limit(results, args.limit or 0), args.outfile)
+        elif args.outfile.suffix in ('.ndjson', '.jsonl'):
+            write_to_ndjson(limit(results, args.limit or 0), args.outfile)
         else:
-            print("Please use an output file that ends with `.csv` or `.json`.", file=sys.stderr)
+            print("Please use an output file that ends with `.csv`, `.json`, "
+                  "`.ndjson` or `.jsonl`.", file=sys.stderr)
+
+
+def stats(database, args):
+    """Perform the `stats` subcommand.
+
+    Summarize the close approaches that match the filters given at the command
+    line with the database's `aggregate` method, and print one line per group:
+    the number of matches and the least, mean and greatest distance (in au) and
+    velocity (in km/s).
+
+    :param database: The `NEODatabase` containing data on NEOs and their close approaches.
+    :param args: All arguments from the command line, as parsed by the top-level parser.
+    """
+    groups = database.aggregate(filters_from_args(args), group_by=args.group_by)
+    print(f"{'group':<16} {'count':>8} {'min au':>9} {'mean au':>9} {'max au':>9} "
+          f"{'min km/s':>9} {'mean km/s':>9} {'max km/s':>9}")
+    for group in groups:
+        label = 'all' if group['group'] is None else group['group']
+        print(f"{label:<16} {group['count']:>8} "
+              f"{group['distance_min']:>9.4f} {group['distance_mean']:>9.4f} "
+              f"{group['distance_max']:>9.4f} {group['velocity_min']:>9.2f} "
+              f"{group['velocity_mean']:>9.2f} {group['velocity_max']:>9.2f}")
+
+
+def histogram(database, args):
+    """Perform the `histogram` subcommand.
+
+    Count the close approaches that match the filters given at the command line
+    with the database's `histogram` method, and write the bins as CSV (start,
+    end and count) to the output file if one was given, or else to stdout.
+
+    :param database: The `NEODatabase` containing data on NEOs and their close approaches.
+    :param args: All arguments from the command line, as parsed by the top-level parser.
+    """
+    bins = args.bins
+    if bins is not None and args.field != 'time':
+        try:
+            bins = int(bins)
+        except ValueError:
+            bins = 0
+        if bins < 1:
+            print(f"--bins must be a positive number of bins for {args.field}.", file=sys.stderr)
+            return
+    try:
+        bins = database.histogram(filters_from_args(args), args.field, bins)
+    except ValueError as err:
+        print(err, file=sys.stderr)
+        return
+
+    if not args.outfile:
+        write_histogram(bins, sys.stdout)
+        return
+    with open(args.outfile, 'w', newline='') as outfile:
+        write_histogram(bins, outfile)
 
 
 class NEOShell(cmd.Cmd):
@@ -250,7 +507,8 @@ class NEOShell(cmd.Cmd):
              "Type `help` or `?` to list commands and `exit` to exit.\n")
     prompt = '(neo) '
 
-    def __init__(self, database, inspect_parser, query_parser, aggressive=False, **kwargs):
+    def __init__(self, database, inspect_parser, query_parser, aggressive=False,
+                 reloader=None, **kwargs):
         """Create a new `NEOShell`.
 
         Creating this object doesn't start the session - for that, use `.cmdloop()`.
@@ -259,6 +517,8 @@ class NEOShell(cmd.Cmd):
         :param inspect_parser: The subparser for the `inspect` subcommand.
         :param query_parser: The subparser for the `query` subcommand.
         :param aggressive: Whether to kill the session whenever a project file is changed.
+        :param reloader: A `reloader.Reloader` of the database, to reload it
+            from changed data files between commands.
         :param kwargs: A dictionary of excess keyword arguments passed to the superclass.
         """
         super().__init__(**kwargs)
@@ -266,6 +526,7 @@ class NEOShell(cmd.Cmd):
         self.inspect = inspect_parser
         self.query = query_parser
         self.aggressive = aggressive
+        self.reloader = reloader
 
     @classmethod
     def parse_arg_with(cls, arg, parser):
@@ -361,7 +622,19 @@ class NEOShell(cmd.Cmd):
     do_quit = do_EOF
 
     def precmd(self, line):
-        """Watch for changes to the files in this project."""
+        """Watch for changes to the files in this project and to the data files.
+
+        Changed data files are reloaded in the background. Until the new
+        database is ready, commands are answered from the old one; it's
+        swapped in before the next command after that.
+        """
+        if self.reloader is not None:
+            if self.reloader.database is not self.db:
+                self.db = self.reloader.database
+                print("Reloaded the changed data files.", file=sys.stderr)
+            if self.reloader.check():
+                print("The data files have changed; reloading them in the background.",
+                      file=sys.stderr)
         changed = [f for f in PROJECT_ROOT.glob('*.py') if f.stat().st_mtime > _START]
         if changed:
             print("The following file(s) have been modified since this interactive session began: "
@@ -381,16 +654,43 @@ def main():
     parser, inspect_parser, query_parser = make_parser()
     args = parser.parse_args()
 
-    # Extract data from the data files into structured Python objects.
-    database = NEODatabase(load_neos(args.neofile), load_approaches(args.cadfile))
+    def load():
+        database = load_database(args)
+        if args.cmd == 'serve':
+            database.cache = cache.QueryCache(max_entries=args.cache_entries)
+        return database
+
+    database = load()
+    watcher = None
+    if ((args.cmd == 'interactive' and not args.no_reload) or
+            (args.cmd == 'serve' and args.reload_interval > 0)):
+        watcher = reloader.Reloader(database, load, (args.neofile, args.cadfile))
+    if args.cmd == 'serve' and watcher is not None:
+        watcher.watch(args.reload_interval)
 
     # Run the chosen subcommand.
     if args.cmd == 'inspect':
         inspect(database, pdes=args.pdes, name=args.name, verbose=args.verbose)
     elif args.cmd == 'query':
         query(database, args)
+    elif args.cmd == 'stats':
+        stats(database, args)
+    elif args.cmd == 'histogram':
+        histogram(database, args)
     elif args.cmd == 'interactive':
-        NEOShell(database, inspect_parser, query_parser, aggressive=args.aggressive).cmdloop()
+        NEOShell(database, inspect_parser, query_parser, aggressive=args.aggressive,
+                 reloader=watcher).cmdloop()
+    elif args.cmd == 'serve' and args.asyncio:
+        # Imported only here, so that other subcommands don't load asyncio.
+        import aioserver
+        chunk_rows = aioserver.DEFAULT_CHUNK_ROWS if args.chunk_rows is None else args.chunk_rows
+        aioserver.serve(database, host=args.host, port=args.port,
+                        chunk_rows=chunk_rows, verbose=args.verbose, reloader=watcher)
+    elif args.cmd == 'serve':
+        # Imported only here, so that other subcommands don't load http.server.
+        import server
+        server.serve(database, host=args.host, port=args.port, verbose=args.verbose,
+                     reloader=watcher)
 
 
 if __name__ == '__main__':
@@ -2,14 +2,18 @@
 
 import cmath
 import math
-from numpy import NAN
 
-from helpers import cd_to_datetime, datetime_to_str
+from helpers import (cd_to_datetime, datetime_to_str, datetime_to_minutes,
+                     minutes_to_datetime)
 
 
 class NearEarthObject:
     """Represents one NEO from the input file."""
 
+    # No per-instance __dict__: there are tens of thousands of these.
+    __slots__ = ('designation', 'full_name', 'name', 'diameter', 'hazardous',
+                 'approaches', 'extra')
+
     def __init__(self, **info):
         """Create a new NearEarthObject.
 
@@ -21,6 +25,8 @@ class NearEarthObject:
 
         optional
         diameter (float)
+        extra (dict) additional CSV columns by name, e.g. {'moid': 0.05};
+            None (the default) if no extra columns were loaded
         """
         self.designation = info['pdes'].strip()
         self.full_name = info['full_name'].strip()
@@ -37,6 +43,8 @@ class NearEarthObject:
         else:
             self.hazardous = False
 
+        self.extra = info.get('extra') or None
+
         # Create an empty initial collection of linked approaches.
         self.approaches = []
 
@@ -45,6 +53,16 @@ class NearEarthObject:
         """Return a representation of the full name of this NEO."""
         return f'{self.full_name}'
 
+    @property
+    def jsonMaker(self):
+        """Return a dict of this NEO as it appears in JSON export."""
+        return {
+                'designation': self.designation,
+                'name': self.name or '',
+                'diameter_km': 0.0 if math.isnan(self.diameter) else self.diameter,
+                'potentially_hazardous': self.hazardous
+        }
+
     def __str__(self):
         """Return a human-readable string representation."""
         if self.hazardous:
@@ -74,6 +92,12 @@ class NearEarthObject:
 class CloseApproach:
     """A close approach to Earth by an NEO."""
 
+    # No per-instance __dict__: there are hundreds of thousands of these.
+    # The time is kept in _time as a datetime or, in compact mode, in
+    # _minutes as whole minutes since the Unix epoch.
+    __slots__ = ('_time', '_minutes', 'distance', 'velocity', 'neo',
+                 '_designation')
+
     def __init__(self, **info):
         """Create a new CloseApproach object.
 
@@ -82,8 +106,24 @@ class CloseApproach:
         cd (str) date and time
         dist_min (float) min distance in AU
         v_rel (float) km/s velocity rel to approach body
+
+        Optional parameters
+        time (datetime) already-parsed date and time, used instead of cd
+        minutes (int) the time in minutes since the Unix epoch, used instead of cd
+        compact (bool) store the time as an integer, not a datetime
         """
-        self.time = cd_to_datetime(info['cd'])
+        if 'minutes' in info:
+            self._time, self._minutes = None, info['minutes']
+            if not info.get('compact'):
+                self.time = minutes_to_datetime(info['minutes'])
+        else:
+            if 'time' in info:
+                self.time = info['time']
+            else:
+                self.time = cd_to_datetime(info['cd'])
+            if info.get('compact'):
+                self._minutes = datetime_to_minutes(self._time)
+                self._time = None
         self.distance = float(info['dist_min'])
         self.velocity = float(info['v_rel'])
 
@@ -93,6 +133,29 @@ class CloseApproach:
         # This is used until neo can be populated with an object ref
         self._designation = info['des'].strip()
 
+    @property
+    def time(self):
+        """Return the date and time of this approach as a naive datetime.
+
+        In compact mode the datetime is recreated on every access.
+        """
+        if self._time is None:
+            return minutes_to_datetime(self._minutes)
+        return self._time
+
+    @time.setter
+    def time(self, value):
+        """Set the date and time of this approach (leaving compact mode)."""
+        self._time = value
+        self._minutes = None
+
+    @property
+    def minutes(self):
+        """Return the time of this approach in minutes since the Unix epoch."""
+        if self._minutes is None:
+            return datetime_to_minutes(self._time)
+        return self._minutes
+
     def __str__(self):
         """Return human readable string representation."""
         # the wording is different if diameter is undefined.
@@ -169,10 +232,5 @@ class CloseApproach:
                 'datetime_utc': self.time.strftime("%Y-%m-%d %H:%M"),
                 'distance_au': self.distance,
                 'velocity_km_s': self.velocity,
-                'neo': {
-                    'designation': self.neo.designation,
-                    'name': self.exportJsonName,
-                    'diameter_km': self.exportJsonDiam,
-                    'potentially_hazardous': self.neo.hazardous
-                }
+                'neo': self.neo.jsonMaker
         }
@@ -0,0 +1,131 @@
+"""Reload a NEODatabase in the background when its data files change.
+
+A long-running session (the interactive shell, or either server) keeps
+answering from the `NEODatabase` it has while a `Reloader` builds a new one
+from changed data files in a background thread. Once the new database (and
+its query table) is ready it replaces the old one in a single assignment, so
+every query runs entirely against one database or the other, and queries
+already under way finish against the old one.
+
+A data file is considered changed when its size or modification time is. A
+change is only acted on once the files have stopped changing for a moment,
+so that a file still being copied into place isn't loaded half-written. If
+loading fails, the old database is kept until the files change again.
+"""
+
+import os
+import sys
+import threading
+import time
+
+
+# Seconds that changed data files must stay unchanged before they're loaded.
+DEFAULT_SETTLE = 1.0
+
+# Seconds between checks for changed data files, when watching.
+DEFAULT_INTERVAL = 2.0
+
+
+def signature(paths):
+    """Return the (size, modification time) of each file, None if missing."""
+    stats = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stats.append(None)
+            continue
+        stats.append((stat.st_size, stat.st_mtime_ns))
+    return tuple(stats)
+
+
+class Reloader:
+    """The current NEODatabase of some data files, reloaded when they change.
+
+    `database` is always a complete database, safe to query from any thread.
+    """
+
+    def __init__(self, database, load, sources, settle=DEFAULT_SETTLE):
+        """Create a new Reloader, starting from an already loaded database.
+
+        :param database: The `NEODatabase` loaded from the sources as they are now.
+        :param load: A function of no arguments that loads a new `NEODatabase`.
+        :param sources: The paths of the data files that load reads.
+        :param settle: Seconds that changed files must be left alone before loading.
+        """
+        self.database = database
+        self.load = load
+        self.sources = sources
+        self.settle = settle
+        self.generation = 0  # the number of reloads that have been swapped in
+        self.error = None  # the exception of the last failed reload, if any
+        self._signature = signature(sources)
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+
+    def subscribe(self, callback):
+        """Call callback(database) with each newly swapped-in database."""
+        self._callbacks.append(callback)
+
+    @property
+    def reloading(self):
+        """Return whether a reload is under way."""
+        thread = self._thread
+        return thread is not None and thread.is_alive()
+
+    def check(self):
+        """Start reloading in the background if the data files have changed.
+
+        :return: Whether a reload was started.
+        """
+        with self._lock:
+            if self.reloading or signature(self.sources) == self._signature:
+                return False
+            self._thread = threading.Thread(target=self._reload, name='neo-reload',
+                                            daemon=True)
+            self._thread.start()
+            return True
+
+    def wait(self, timeout=None):
+        """Wait for any reload under way to finish."""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def watch(self, interval=DEFAULT_INTERVAL):
+        """Check for changed data files every interval seconds, from a daemon thread."""
+        def loop():
+            while not self._stop.wait(interval):
+                self.check()
+
+        threading.Thread(target=loop, name='neo-watch', daemon=True).start()
+
+    def stop(self):
+        """Stop watching for changes (a reload under way still finishes)."""
+        self._stop.set()
+
+    def _reload(self):
+        """Load the changed data files once they settle, then swap them in."""
+        current = signature(self.sources)
+        while True:
+            time.sleep(self.settle)
+            settled, current = current, signature(self.sources)
+            if settled == current:
+                break
+        try:
+            database = self.load()
+            # Build the query table now, not in the first query after the swap.
+            database.prebuild()
+        except Exception as err:
+            print(f"Unable to reload the data files: {err}", file=sys.stderr)
+            self.error = err
+            self._signature = current
+            return
+        self.database = database
+        self.error = None
+        self._signature = current
+        self.generation += 1
+        for callback in self._callbacks:
+            callback(database)
@@ -0,0 +1,226 @@
+"""A local HTTP/JSON API over a NEODatabase for NearEarthObjects.
+
+`python3 main.py serve --port 8000` loads the database once and answers
+requests until interrupted:
+
+    GET /inspect?pdes=433
+    GET /inspect?name=Halley&verbose=true
+    GET /query?start_date=2020-01-01&end_date=2020-01-31&distance_max=0.025&limit=5
+    GET /stats
+
+`/query` takes the keyword arguments of `filters.create_filters` (dates as
+YYYY-MM-DD, `hazardous` as true/false) plus `limit`, which defaults to 10 as on
+the command line; `limit=0` returns every match. Results are the elements that
+`write_to_json` writes. `/stats` reports the hits and misses of the database's
+query cache (see `cache.py`). Errors come back as `{"error": message}` with status 400
+or 404.
+
+Each request is handled on its own thread (`ThreadingHTTPServer`), and
+connections are kept alive between requests.
+"""
+
+import datetime
+import http.server
+import json
+import sys
+import urllib.parse
+
+from filters import create_filters, limit
+
+
+def _parse_bool(text):
+    """Parse true/false (or 1/0, yes/no) into a bool."""
+    value = text.strip().lower()
+    if value in ('true', '1', 'yes'):
+        return True
+    if value in ('false', '0', 'no'):
+        return False
+    raise ValueError(f"'{text}' is not true or false")
+
+
+# Parsers of the /query parameters, named as the create_filters arguments.
+QUERY_PARAMETERS = {
+    'date': datetime.date.fromisoformat,
+    'start_date': datetime.date.fromisoformat,
+    'end_date': datetime.date.fromisoformat,
+    'distance_min': float,
+    'distance_max': float,
+    'velocity_min': float,
+    'velocity_max': float,
+    'diameter_min': float,
+    'diameter_max': float,
+    'hazardous': _parse_bool,
+}
+
+# The number of matches returned when no limit is given.
+DEFAULT_LIMIT = 10
+
+
+class RequestError(ValueError):
+    """A request can't be answered; carries the HTTP status to send."""
+
+    def __init__(self, message, status=400):
+        """Create a new RequestError with a message and an HTTP status."""
+        super().__init__(message)
+        self.status = status
+
+
+def parse_query(params):
+    """Turn /query parameters into filters and a limit.
+
+    :param params: A dict of parameter name to string value.
+    :return: A tuple of a collection of filters and the maximum number of
+        results (0 for no limit).
+    :raises RequestError: If a parameter is unknown or malformed.
+    """
+    criteria = {}
+    for name, text in params.items():
+        if name == 'limit':
+            continue
+        if name not in QUERY_PARAMETERS:
+            raise RequestError(f"Unknown query parameter '{name}'.")
+        try:
+            criteria[name] = QUERY_PARAMETERS[name](text)
+        except ValueError as err:
+            raise RequestError(f"Bad value for '{name}': {err}") from None
+    try:
+        count = int(params.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise RequestError(f"Bad value for 'limit': '{params['limit']}'") from None
+    if count < 0:
+        raise RequestError("'limit' can't be negative.")
+    return create_filters(**criteria), count
+
+
+def query_results(database, params):
+    """Yield the JSON-able elements answering a /query request."""
+    filters, count = parse_query(params)
+    for approach in limit(database.query(filters), count):
+        yield approach.jsonMaker
+
+
+def inspect_result(database, params):
+    """Return the JSON-able answer to an /inspect request.
+
+    :raises RequestError: If the parameters are wrong or there's no such NEO.
+    """
+    unknown = set(params) - {'pdes', 'name', 'verbose'}
+    if unknown:
+        raise RequestError(f"Unknown inspect parameter '{unknown.pop()}'.")
+    try:
+        verbose = _parse_bool(params.get('verbose', 'false'))
+    except ValueError as err:
+        raise RequestError(f"Bad value for 'verbose': {err}") from None
+    if params.get('pdes'):
+        neo = database.get_neo_by_designation(params['pdes'])
+    elif params.get('name'):
+        neo = database.get_neo_by_name(params['name'])
+    else:
+        raise RequestError("Give a 'pdes' or a 'name' to inspect.")
+    if not neo:
+        raise RequestError("No matching NEOs exist in the database.", status=404)
+
+    result = dict(neo.jsonMaker, full_name=neo.full_name)
+    if verbose:
+        result['approaches'] = [approach.jsonMaker for approach in neo.approaches]
+    return result
+
+
+def stats_result(database, params):
+    """Return the JSON-able answer to a /stats request.
+
+    :raises RequestError: If any parameter is given.
+    """
+    if params:
+        raise RequestError("/stats takes no parameters.")
+    return {'cache': database.cache.stats()}
+
+
+def split_path(target):
+    """Split a request target into its path and a dict of its parameters.
+
+    :raises RequestError: If a parameter is given more than once.
+    """
+    url = urllib.parse.urlsplit(target)
+    params = {}
+    for name, value in urllib.parse.parse_qsl(url.query, keep_blank_values=True):
+        if name in params:
+            raise RequestError(f"Parameter '{name}' is given more than once.")
+        params[name] = value
+    return url.path, params
+
+
+class NEORequestHandler(http.server.BaseHTTPRequestHandler):
+    """Answer GET /inspect, /query and /stats from the server's database."""
+
+    protocol_version = 'HTTP/1.1'
+
+    # The headers and the body are sent separately; with Nagle's algorithm
+    # the body waits on the client's delayed ACK, about 40 ms per request.
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        """Route a GET request and send the JSON response."""
+        database = self.server.database
+        try:
+            path, params = split_path(self.path)
+            if path == '/inspect':
+                body = inspect_result(database, params)
+            elif path == '/query':
+                body = {'results': list(query_results(database, params))}
+            elif path == '/stats':
+                body = stats_result(database, params)
+            else:
+                raise RequestError(f"No such endpoint '{path}'.", status=404)
+            status = 200
+        except RequestError as err:
+            body, status = {'error': str(err)}, err.status
+
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        """Log a request to stderr, if the server is verbose."""
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class NEOServer(http.server.ThreadingHTTPServer):
+    """A threaded HTTP server that answers requests from a NEODatabase."""
+
+    daemon_threads = True
+
+    def __init__(self, address, database, verbose=False):
+        """Create a new NEOServer listening on address, a (host, port) tuple."""
+        super().__init__(address, NEORequestHandler)
+        self.database = database
+        self.verbose = verbose
+
+
+def serve(database, host='127.0.0.1', port=8000, verbose=False, reloader=None):
+    """Answer requests on host:port until interrupted.
+
+    :param database: The `NEODatabase` to answer from.
+    :param host: The address to listen on.
+    :param port: The port to listen on (0 for any free port).
+    :param verbose: Whether to log each request to stderr.
+    :param reloader: A `reloader.Reloader` of the database, whose reloaded
+        databases are answered from once they're swapped in.
+    """
+    # Build the query table before any request, rather than in several
+    # request threads at once.
+    database.prebuild()
+    with NEOServer((host, port), database, verbose) as server:
+        if reloader is not None:
+            reloader.subscribe(lambda database: setattr(server, 'database', database))
+            server.database = reloader.database
+        host, port = server.server_address[:2]
+        print(f"Serving on http://{host}:{port}/ (Ctrl-C to stop)", file=sys.stderr)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
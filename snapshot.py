@@ -0,0 +1,164 @@
+"""Binary snapshot cache of a parsed NEODatabase for NearEarthObjects.
+
+Parsing `neos.csv` and `cad.json` takes seconds. A snapshot stores the parsed
+result as a directory of raw, memory-mappable columns (native-endian int64 or
+float64, one file per column) plus a JSON string table of the NEOs:
+
+    manifest.json       format version, byte order, and the source files
+    neos.json           NEO designations, names, full names, diameters, hazard
+                        flags and extra columns, in designation order, and the
+                        name index
+    <column>.bin        time, distance, velocity, neo_index, neo_order, neo_offsets
+
+Loading maps the columns without parsing or copying them, and NEOs and close
+approaches are only created when accessed (see `lazy.py`), so a lookup such as
+`inspect` doesn't pay for the whole dataset. Processes that load the same
+snapshot share its columns through the OS page cache, rather than each holding
+its own copy of every close approach.
+
+A snapshot is only used while its source files are unchanged. They're compared
+by size, modification time and a hash of their first and last blocks, which is
+much cheaper than hashing the whole file on every start.
+"""
+
+import hashlib
+import json
+import math
+import mmap
+import os
+import pathlib
+import sys
+
+from database import NEODatabase
+from lazy import ApproachColumns, LazyNEOs, LazyApproaches
+
+
+FORMAT_VERSION = 2
+
+# Column name and memoryview format code.
+COLUMNS = (('time', 'q'), ('distance', 'd'), ('velocity', 'd'), ('neo_index', 'q'),
+           ('neo_order', 'q'), ('neo_offsets', 'q'))
+
+# Bytes hashed from each end of a source file.
+_SAMPLE_SIZE = 1 << 16
+
+
+def source_key(*paths):
+    """Return a JSON-able fingerprint of the given source files."""
+    key = []
+    for path in paths:
+        path = pathlib.Path(path).resolve()
+        stat = path.stat()
+        digest = hashlib.sha1()
+        with open(path, 'rb') as file:
+            digest.update(file.read(_SAMPLE_SIZE))
+            file.seek(max(0, stat.st_size - _SAMPLE_SIZE))
+            digest.update(file.read(_SAMPLE_SIZE))
+        key.append({'path': str(path), 'size': stat.st_size,
+                    'mtime_ns': stat.st_mtime_ns, 'sha1': digest.hexdigest()})
+    return key
+
+
+def save(database, directory, sources):
+    """Write a snapshot of a NEODatabase.
+
+    :param database: The NEODatabase to save.
+    :param directory: A path to the snapshot directory (created if needed).
+    :param sources: The paths of the data files the database was loaded from.
+    """
+    import numpy as np
+
+    directory = pathlib.Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest = directory / 'manifest.json'
+
+    # Invalidate any previous snapshot before overwriting its pieces.
+    if manifest.exists():
+        manifest.unlink()
+
+    table = database.table
+    neos = database._neos
+    order, offsets = table.neo_groups
+    columns = {
+        'time': table.time.astype(np.int64),
+        'distance': table.distance.astype(np.float64),
+        'velocity': table.velocity.astype(np.float64),
+        'neo_index': table.neo_index.astype(np.int64),
+        'neo_order': order.astype(np.int64),
+        'neo_offsets': offsets.astype(np.int64),
+    }
+    for name, _ in COLUMNS:
+        # Written aside and renamed into place: a database loaded from the
+        # previous snapshot may still be mapping the old file.
+        temporary = directory / f'{name}.bin.tmp'
+        columns[name].tofile(temporary)
+        os.replace(temporary, directory / f'{name}.bin')
+
+    positions = {id(neo): position for position, neo in enumerate(neos)}
+    strings = {
+        'designation': [neo.designation for neo in neos],
+        'name': [neo.name or '' for neo in neos],
+        'full_name': [neo.full_name for neo in neos],
+        'diameter': [None if math.isnan(neo.diameter) else neo.diameter for neo in neos],
+        'hazardous': [neo.hazardous for neo in neos],
+        'extra': [neo.extra for neo in neos],
+        'named': {name: positions[id(neo)]
+                  for name, neo in database._neos_named.items()},
+    }
+    # Also written aside: a reader past the manifest check must not see it
+    # truncated or half-written.
+    temporary = directory / 'neos.json.tmp'
+    with open(temporary, 'w') as file:
+        json.dump(strings, file)
+    os.replace(temporary, directory / 'neos.json')
+
+    # The manifest goes last, so a partial snapshot is never considered valid.
+    temporary = directory / 'manifest.json.tmp'
+    with open(temporary, 'w') as file:
+        json.dump({'version': FORMAT_VERSION, 'byteorder': sys.byteorder,
+                   'sources': source_key(*sources)}, file)
+    os.replace(temporary, manifest)
+
+
+def load(directory, sources=None):
+    """Load a NEODatabase from a snapshot, if it is valid for the sources.
+
+    Worker processes handed a snapshot that is known to be current (say,
+    by the process that saved it) can leave out sources: they then need
+    neither the data files nor the time to fingerprint them, and the
+    columns they map share the same pages of the OS page cache.
+
+    :param directory: A path to the snapshot directory.
+    :param sources: The paths of the data files the snapshot must match, or
+        None to use the snapshot whatever the data files now hold.
+    :return: A NEODatabase, or None if there is no valid snapshot.
+    """
+    directory = pathlib.Path(directory)
+    try:
+        with open(directory / 'manifest.json') as file:
+            manifest = json.load(file)
+        if manifest.get('version') != FORMAT_VERSION or \
+                manifest.get('byteorder') != sys.byteorder or \
+                (sources is not None and manifest.get('sources') != source_key(*sources)):
+            return None
+
+        columns = {name: _map(directory / f'{name}.bin', code)
+                   for name, code in COLUMNS}
+        with open(directory / 'neos.json') as file:
+            strings = json.load(file)
+    except (OSError, ValueError):
+        return None
+
+    neos = LazyNEOs(strings['designation'], strings['name'], strings['full_name'],
+                    strings['diameter'], strings['hazardous'], strings['extra'])
+    approaches = LazyApproaches(ApproachColumns(**columns), neos)
+    neos.approaches = approaches
+    return NEODatabase.from_lazy(neos, approaches, strings['named'])
+
+
+def _map(path, code):
+    """Memory-map a column file as a read-only memoryview of format code."""
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return memoryview(b'').cast(code)
+        return memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)).cast(code)
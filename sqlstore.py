@@ -0,0 +1,566 @@
+"""SQLite storage of a NEODatabase for NearEarthObjects.
+
+`ingest` parses `neos.csv` and `cad.json` into a SQLite database file, streaming
+the close approaches into it rather than holding them all in memory:
+
+    neos            position (in designation order), designation, name, full
+                    name, diameter (NULL if unknown) and hazard flag of each NEO
+    names           each NEO name and the position of the NEO it names
+    approaches      row (in file order), NEO position, time (minutes since the
+                    Unix epoch), day, distance and velocity of each approach
+    meta            format version and the source files
+
+The designations, names and diameters of the NEOs are indexed, as are the
+NEO, day, distance and velocity of the approaches.
+
+`load` opens such a file as a `SQLiteDatabase`: a `NEODatabase` that answers
+queries by translating the filters of `filters.create_filters` into an SQL
+WHERE clause (see `AttributeFilter.where`), and creates only the NEOs and close
+approaches it returns. The file is opened read-only, so any number of processes
+can share it.
+
+Like a snapshot (see `snapshot.py`), the file is only used while its source
+files are unchanged.
+"""
+
+import collections
+import collections.abc
+import itertools
+import json
+import math
+import os
+import pathlib
+import sqlite3
+import sys
+import threading
+import weakref
+
+from cache import QueryCache
+from database import NEODatabase
+from extract import load_neos, iter_approaches
+from filters import UnsupportedCriterionError
+from helpers import MINUTES_PER_DAY, minutes_to_datetime
+from lazy import NEOApproaches
+from models import NearEarthObject, CloseApproach
+from snapshot import source_key
+
+
+FORMAT_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE neos (
+    position INTEGER PRIMARY KEY,
+    designation TEXT NOT NULL UNIQUE,
+    name TEXT,
+    full_name TEXT NOT NULL,
+    diameter REAL,
+    hazardous INTEGER NOT NULL
+);
+CREATE TABLE names (name TEXT PRIMARY KEY, neo INTEGER NOT NULL);
+CREATE TABLE approaches (
+    row INTEGER PRIMARY KEY,
+    neo INTEGER NOT NULL,
+    time INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    distance REAL NOT NULL,
+    velocity REAL NOT NULL
+);
+"""
+
+# Created once the approaches are in, which is quicker than updating them
+# with every insert. ANALYZE gives the query planner the statistics to choose
+# between them, e.g. to find small NEOs by diameter before their approaches.
+_INDEXES = """
+CREATE INDEX neos_diameter ON neos (diameter);
+CREATE INDEX approaches_neo ON approaches (neo, row);
+CREATE INDEX approaches_day ON approaches (day);
+CREATE INDEX approaches_distance ON approaches (distance);
+CREATE INDEX approaches_velocity ON approaches (velocity);
+ANALYZE;
+"""
+
+# Rows fetched at a time while a query's results are iterated over.
+_FETCH_ROWS = 1000
+
+# NEOs kept by SQLNEOs after they were last created, whether in use or not.
+_RECENT_NEOS = 1 << 15
+
+_APPROACH_COLUMNS = ('approaches.row, approaches.neo, approaches.time, '
+                     'approaches.distance, approaches.velocity')
+
+# The column to sort by for each of database.SORT_KEYS.
+_SORT_COLUMNS = {
+    'distance': 'approaches.distance',
+    'velocity': 'approaches.velocity',
+    'diameter': 'neos.diameter',
+    'date': 'approaches.time',
+}
+
+
+def ingest(path, neo_csv_path, cad_json_path):
+    """Write a SQLite database of the NEOs and close approaches in the data files.
+
+    The file is written aside and renamed into place, so a database that
+    has the previous file open keeps reading it undisturbed.
+
+    :param path: A path to the SQLite database file (replaced if it exists).
+    :param neo_csv_path: A path to a CSV file of near-Earth objects.
+    :param cad_json_path: A path to a JSON file of close approaches.
+    """
+    path = pathlib.Path(path)
+    temporary = path.with_name(path.name + '.tmp')
+    if temporary.exists():
+        temporary.unlink()
+
+    loaded = load_neos(neo_csv_path)
+    neos = sorted(loaded, key=lambda neo: neo.designation)
+    positions = {neo.designation: position for position, neo in enumerate(neos)}
+    # As the NEODatabase constructor: a later NEO of the same name wins.
+    named = {neo.name: positions[neo.designation] for neo in loaded
+             if neo.name is not None and neo.name != ''}
+
+    connection = sqlite3.connect(temporary)
+    try:
+        # The file isn't in use until renamed into place, so needs no journal.
+        connection.execute('PRAGMA journal_mode = OFF')
+        connection.execute('PRAGMA synchronous = OFF')
+        connection.executescript(_SCHEMA)
+        unmatched = []
+        with connection:
+            connection.executemany(
+                'INSERT INTO neos VALUES (?, ?, ?, ?, ?, ?)',
+                ((position, neo.designation, neo.name, neo.full_name,
+                  None if math.isnan(neo.diameter) else neo.diameter, neo.hazardous)
+                 for position, neo in enumerate(neos)))
+            connection.executemany('INSERT INTO names VALUES (?, ?)', named.items())
+            connection.executemany(
+                'INSERT INTO approaches VALUES (?, ?, ?, ?, ?, ?)',
+                _approach_rows(iter_approaches(cad_json_path, compact=True),
+                               positions, unmatched))
+            connection.executemany('INSERT INTO meta VALUES (?, ?)', (
+                ('version', str(FORMAT_VERSION)),
+                ('sources', json.dumps(source_key(neo_csv_path, cad_json_path)))))
+        connection.executescript(_INDEXES)
+    finally:
+        connection.close()
+    os.replace(temporary, path)
+
+    if unmatched:
+        unknown = sorted(set(unmatched))
+        print(f'Warning: {len(unmatched)} close approaches '
+              f'reference {len(unknown)} unknown NEO designations '
+              f'(e.g. {", ".join(unknown[:3])}) and were left out.',
+              file=sys.stderr)
+
+
+def _approach_rows(approaches, positions, unmatched):
+    """Yield a row of the approaches table for each approach of a known NEO.
+
+    The designations of the other approaches are appended to unmatched.
+    """
+    row = 0
+    for approach in approaches:
+        position = positions.get(approach._designation)
+        if position is None:
+            unmatched.append(approach._designation)
+            continue
+        minutes = approach.minutes
+        yield (row, position, minutes, minutes // MINUTES_PER_DAY,
+               approach.distance, approach.velocity)
+        row += 1
+
+
+def load(path, sources, cache=None):
+    """Open a SQLite database file, if it is valid for the sources.
+
+    :param path: A path to a file written by `ingest`.
+    :param sources: The paths of the data files it must have been written from.
+    :param cache: A cache.QueryCache, as for the NEODatabase constructor.
+    :return: A SQLiteDatabase, or None if there is no valid file.
+    """
+    path = pathlib.Path(path)
+    if not path.exists():
+        return None
+    try:
+        database = SQLiteDatabase(path, cache)
+        meta = dict(database.connection.fetchall('SELECT key, value FROM meta'))
+    except sqlite3.Error:
+        return None
+    if meta.get('version') != str(FORMAT_VERSION) or \
+            json.loads(meta.get('sources', 'null')) != source_key(*sources):
+        database.close()
+        return None
+    return database
+
+
+class SQLiteDatabase(NEODatabase):
+    """A NEODatabase whose NEOs and close approaches are kept in SQLite.
+
+    Queries, `top`, and lookups by designation or name, are answered by
+    SQLite. `aggregate` and `histogram` read every approach into a columnar
+    table in memory, as the in-memory database does, the first time one is
+    used. Nothing can be added to the database; ingest the data files again.
+    """
+
+    def __init__(self, path, cache=None):
+        """Open a SQLite database file written by `ingest`, read-only.
+
+        Arguments:
+        path: A path to the SQLite database file
+        cache: A cache.QueryCache, as for the NEODatabase constructor
+        """
+        self.connection = SharedConnection(path)
+        neos = SQLNEOs(self.connection)
+        approaches = SQLApproaches(self.connection, neos)
+        neos.approaches = approaches
+        self._neos = neos
+        self._approaches = approaches
+        self._table = None
+        self.cache = QueryCache() if cache is None else cache
+        self._neos_by_designation = SQLIndex(self.connection, 'neos', 'designation',
+                                             'position', neos)
+        self._neos_named = SQLIndex(self.connection, 'names', 'name', 'neo', neos)
+        self.neo_designations = [designation for designation, in self.connection.fetchall(
+            'SELECT designation FROM neos ORDER BY position')]
+        self._approach_des_dict = None
+        self.unmatched_approaches = []
+
+    def close(self):
+        """Close the database file."""
+        self.connection.close()
+
+    @property
+    def table(self):
+        """Return the ApproachTable of this database, reading it if needed.
+
+        The table holds every approach in memory, so a file larger than
+        memory can't be summarized with `aggregate` or `histogram`.
+        """
+        if self._table is None:
+            import numpy as np
+            from columnar import ApproachTable
+
+            columns = self.connection.fetchall(
+                'SELECT time, distance, velocity, neo FROM approaches ORDER BY row')
+            time, distance, velocity, neo_index = zip(*columns) if columns else ((),) * 4
+            diameter, hazardous = zip(*self.connection.fetchall(
+                'SELECT diameter, hazardous FROM neos ORDER BY position')) \
+                if len(self._neos) else ((), ())
+            self._table = ApproachTable(
+                time=np.array(time, np.int64),
+                distance=np.array(distance, np.float64),
+                velocity=np.array(velocity, np.float64),
+                neo_index=np.array(neo_index, np.int64),
+                neo_diameter=np.array([math.nan if value is None else value
+                                       for value in diameter], np.float64),
+                neo_hazardous=np.array(hazardous, np.bool_),
+            )
+        return self._table
+
+    def prebuild(self):
+        """Build nothing: queries don't need the columnar table.
+
+        It holds every approach in memory, so it's only read from SQLite
+        for `top`, `aggregate` and `histogram`.
+        """
+
+    def query(self, filters=()):
+        """Create a close approach iterator with filtered results.
+
+        Keyword argument (optional):
+        filters: a collection of filter objects from filters.py
+
+        yields close approaches passing any filters, in the original
+        approach order, as NEODatabase.query does.
+
+        Filters that support it are translated into an SQL WHERE clause, so
+        that SQLite picks the index to search by, and only the approaches
+        that pass all of them are created. Any other filters are tested
+        against those approaches one at a time.
+        """
+        conditions, parameters, join, others = self._where(filters)
+        approaches = self._approaches.select(conditions, parameters, join)
+        if others:
+            approaches = self._scan(others, approaches)
+        yield from approaches
+
+    def top(self, filters=(), sort_by='distance', count=None, descending=False):
+        """Create a close approach iterator over sorted, filtered results.
+
+        As NEODatabase.top, but SQLite sorts the approaches that pass the
+        filters of its WHERE clause, and returns only the first count, so
+        the columnar table isn't read. Any other filters are tested against
+        the sorted approaches one at a time, until count have passed.
+        """
+        if sort_by not in _SORT_COLUMNS:
+            raise ValueError(f'Cannot sort close approaches by {sort_by!r}.')
+        conditions, parameters, join, others = self._where(filters)
+        column = _SORT_COLUMNS[sort_by]
+        order = f'{column} DESC' if descending else column
+        if sort_by == 'diameter':
+            # Unknown diameters are NULL, and come last, as NaNs do in memory.
+            order, join = f'{column} IS NULL, {order}', True
+        approaches = self._approaches.select(conditions, parameters, join, order,
+                                             None if others else count)
+        if others:
+            approaches = self._scan(others, approaches)
+        yield from itertools.islice(approaches, count)
+
+    @staticmethod
+    def _where(filters):
+        """Split filters into SQL conditions and those that can't be translated.
+
+        :return: A tuple (conditions, parameters, join, others) of the SQL
+            conditions, the values of their placeholders, whether any is on
+            the neos table, and the remaining filters.
+        """
+        conditions, parameters, others = [], [], []
+        join = False
+        for filter in filters:
+            try:
+                condition, values = filter.where()
+            except (AttributeError, UnsupportedCriterionError):
+                others.append(filter)
+                continue
+            conditions.append(condition)
+            parameters.extend(values)
+            join = join or filter.neo_level
+        return conditions, parameters, join, others
+
+    def add_neos(self, neos):
+        """Refuse to add NEOs: the database is read-only.
+
+        Raises TypeError; ingest the data files again instead.
+        """
+        raise TypeError('A SQLiteDatabase is read-only; ingest the data files again instead.')
+
+    def add_approaches(self, approaches):
+        """Refuse to add close approaches: the database is read-only.
+
+        Raises TypeError; ingest the data files again instead.
+        """
+        raise TypeError('A SQLiteDatabase is read-only; ingest the data files again instead.')
+
+
+class SharedConnection:
+    """A read-only connection to a SQLite database file, for use from any thread.
+
+    The servers query from many threads at once. Sharing one sqlite3
+    connection between them is only safe if the SQLite library was built
+    in its serialized threading mode, so each use of the connection here
+    holds a lock instead. Iterating over results fetches a batch of rows
+    at a time under the lock, and never holds it while the caller works.
+    """
+
+    def __init__(self, path):
+        """Open a SQLite database file, read-only."""
+        self._connection = sqlite3.connect(
+            f'{pathlib.Path(path).resolve().as_uri()}?mode=ro', uri=True,
+            check_same_thread=False)
+        self._lock = threading.Lock()
+
+    def fetchone(self, sql, parameters=()):
+        """Return the first row of results of a statement, or None."""
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchone()
+
+    def fetchall(self, sql, parameters=()):
+        """Return a list of every row of results of a statement."""
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def iterate(self, sql, parameters=()):
+        """Yield each row of results of a statement."""
+        with self._lock:
+            cursor = self._connection.execute(sql, parameters)
+        while True:
+            with self._lock:
+                rows = cursor.fetchmany(_FETCH_ROWS)
+            if not rows:
+                return
+            yield from rows
+
+    def close(self):
+        """Close the connection."""
+        with self._lock:
+            self._connection.close()
+
+
+class _NearEarthObject(NearEarthObject):
+    """A NearEarthObject that can be weakly referenced, for SQLNEOs."""
+
+    # The in-memory models leave this slot out, to save memory.
+    __slots__ = ('__weakref__',)
+
+
+class _CloseApproach(CloseApproach):
+    """A CloseApproach that can be weakly referenced, for SQLApproaches."""
+
+    __slots__ = ('__weakref__',)
+
+
+class SQLNEOs(collections.abc.Sequence):
+    """A read-only sequence of NearEarthObjects created from SQL on first access.
+
+    The approaches attribute must be set to the SQLApproaches of the same
+    database before any NEO is accessed. A NEO is the same object each time
+    for as long as anything refers to it, and is then let go, so a scan of
+    the whole file doesn't leave it all in memory. The last _RECENT_NEOS
+    created are kept regardless, as the approaches of a scan come back to
+    the same NEOs again and again.
+    """
+
+    def __init__(self, connection):
+        """Create a new SQLNEOs over the neos table of a SharedConnection."""
+        self.connection = connection
+        self.approaches = None
+        self._count, = connection.fetchone('SELECT count(*) FROM neos')
+        self._cache = weakref.WeakValueDictionary()
+        self._recent = collections.deque(maxlen=_RECENT_NEOS)
+
+    def __len__(self):
+        """Return the number of NEOs."""
+        return self._count
+
+    def __getitem__(self, index):
+        """Return the NearEarthObject at index (or a list, for a slice)."""
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        position = range(len(self))[index]
+        neo = self._cache.get(position)
+        if neo is None:
+            neo = self._cache[position] = self._make(position)
+            self._recent.append(neo)
+        return neo
+
+    def __iter__(self):
+        """Iterate over every NEO, creating them as needed."""
+        for position in range(len(self)):
+            yield self[position]
+
+    def _make(self, position):
+        """Create the NearEarthObject at position."""
+        designation, name, full_name, diameter, hazardous = self.connection.fetchone(
+            'SELECT designation, name, full_name, diameter, hazardous FROM neos '
+            'WHERE position = ?', (position,))
+        neo = _NearEarthObject(pdes=designation, name=name or '', full_name=full_name,
+                               diameter='' if diameter is None else repr(diameter),
+                               pha='Y' if hazardous else 'N')
+        neo.approaches = NEOApproaches(self.approaches, position)
+        return neo
+
+
+class SQLApproaches(collections.abc.Sequence):
+    """A read-only sequence of CloseApproaches created from SQL on first access.
+
+    As for SQLNEOs, an approach is only kept while something refers to it.
+    """
+
+    def __init__(self, connection, neos):
+        """Create a new SQLApproaches.
+
+        Arguments:
+        connection: A SharedConnection to a file written by `ingest`.
+        neos: The SQLNEOs of the same connection.
+        """
+        self.connection = connection
+        self.neos = neos
+        self._count, = connection.fetchone('SELECT count(*) FROM approaches')
+        self._cache = weakref.WeakValueDictionary()
+
+    def __len__(self):
+        """Return the number of approaches."""
+        return self._count
+
+    def __getitem__(self, index):
+        """Return the CloseApproach at index (or a list, for a slice)."""
+        if isinstance(index, slice):
+            return [self[row] for row in range(*index.indices(len(self)))]
+        row = range(len(self))[index]
+        approach = self._cache.get(row)
+        if approach is None:
+            approach = self._get(self.connection.fetchone(
+                f'SELECT {_APPROACH_COLUMNS} FROM approaches WHERE row = ?', (row,)))
+        return approach
+
+    def __iter__(self):
+        """Iterate over every approach, creating them as needed."""
+        return self.select()
+
+    def select(self, conditions=(), parameters=(), join=False, order=None, limit=None):
+        """Yield the approaches that meet every SQL condition, in row order.
+
+        Arguments:
+        conditions: SQL conditions on the approaches and neos tables
+        parameters: the values of their placeholders, in order
+        join: whether any condition (or the order) is on the neos table
+        order: SQL terms to sort by before the row, e.g. 'approaches.distance'
+        limit: the number of approaches to yield; None for all of them
+        """
+        sql = f'SELECT {_APPROACH_COLUMNS} FROM approaches'
+        if join:
+            sql += ' JOIN neos ON neos.position = approaches.neo'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += f' ORDER BY {order}, approaches.row' if order else ' ORDER BY approaches.row'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            parameters = (*parameters, limit)
+        for values in self.connection.iterate(sql, parameters):
+            yield self._get(values)
+
+    def _get(self, values):
+        """Return the CloseApproach of a row of approach columns."""
+        row, position, minutes, distance, velocity = values
+        approach = self._cache.get(row)
+        if approach is None:
+            neo = self.neos[position]
+            approach = _CloseApproach(des=neo.designation, time=minutes_to_datetime(minutes),
+                                      dist_min=distance, v_rel=velocity)
+            approach.neo = neo
+            self._cache[row] = approach
+        return approach
+
+    def rows_of(self, position):
+        """Return the rows of the NEO at position, in approach order."""
+        return [row for row, in self.connection.fetchall(
+            'SELECT row FROM approaches WHERE neo = ? ORDER BY row', (position,))]
+
+
+class SQLIndex(collections.abc.Mapping):
+    """A mapping of keys (e.g. names) to NEOs, looked up in an indexed SQL column."""
+
+    def __init__(self, connection, table, key, position, neos):
+        """Create a new SQLIndex.
+
+        Arguments:
+        connection: A SharedConnection to a file written by `ingest`.
+        table: The table to look keys up in.
+        key: The column of keys, which must be unique.
+        position: The column of the NEO's position in neos.
+        neos: A sequence of NEOs, such as a SQLNEOs.
+        """
+        self._connection = connection
+        self._table = table
+        self._key = key
+        self._position = position
+        self._neos = neos
+
+    def __getitem__(self, key):
+        """Return the NEO for key, or raise KeyError."""
+        found = self._connection.fetchone(
+            f'SELECT {self._position} FROM {self._table} WHERE {self._key} = ?', (key,))
+        if found is None:
+            raise KeyError(key)
+        return self._neos[found[0]]
+
+    def __iter__(self):
+        """Iterate over the keys."""
+        for key, in self._connection.iterate(f'SELECT {self._key} FROM {self._table}'):
+            yield key
+
+    def __len__(self):
+        """Return the number of keys."""
+        count, = self._connection.fetchone(f'SELECT count(*) FROM {self._table}')
+        return count
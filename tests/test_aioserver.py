@@ -0,0 +1,147 @@
+"""Check that the asyncio server streams `query` results and answers `inspect`.
+
+A server is started on a free localhost port, on an event loop in its own
+thread, for the duration of these tests.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_aioserver
+"""
+import asyncio
+import datetime
+import http.client
+import json
+import pathlib
+import tempfile
+import threading
+import unittest
+
+from aioserver import start_server
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+from reloader import Reloader
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+class TestAsyncServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+        cls.loop = asyncio.new_event_loop()
+        cls.thread = threading.Thread(target=cls.loop.run_forever, daemon=True)
+        cls.thread.start()
+        # A small chunk size, so that responses take several chunks.
+        cls.server = asyncio.run_coroutine_threadsafe(
+            start_server(cls.db, port=0, chunk_rows=7), cls.loop).result()
+        cls.port = cls.server.sockets[0].getsockname()[1]
+
+    @classmethod
+    def tearDownClass(cls):
+        async def close():
+            cls.server.close()
+            await cls.server.wait_closed()
+        asyncio.run_coroutine_threadsafe(close(), cls.loop).result()
+        cls.loop.call_soon_threadsafe(cls.loop.stop)
+        cls.thread.join()
+        cls.loop.close()
+
+    def setUp(self):
+        self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=10)
+
+    def tearDown(self):
+        self.connection.close()
+
+    def get(self, target):
+        """Return the response to a GET request, and its body."""
+        self.connection.request('GET', target)
+        response = self.connection.getresponse()
+        return response, response.read().decode()
+
+    def test_query_streams_ndjson(self):
+        response, body = self.get('/query?start_date=2020-01-01&end_date=2020-01-31'
+                                  '&distance_max=0.1&hazardous=false&limit=0')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader('Transfer-Encoding'), 'chunked')
+        self.assertEqual(response.getheader('Content-Type'), 'application/x-ndjson')
+
+        filters = create_filters(start_date=datetime.date(2020, 1, 1),
+                                 end_date=datetime.date(2020, 1, 31),
+                                 distance_max=0.1, hazardous=False)
+        expected = [approach.jsonMaker for approach in self.db.query(filters)]
+        self.assertGreater(len(expected), 7)
+        self.assertTrue(body.endswith('\n'))
+        self.assertEqual([json.loads(line) for line in body.splitlines()], expected)
+
+    def test_query_default_limit(self):
+        response, body = self.get('/query')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(len(body.splitlines()), 10)
+
+    def test_query_no_matches(self):
+        response, body = self.get('/query?date=1900-01-01')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, '')
+
+    def test_requests_share_a_connection(self):
+        for target in ('/query?limit=20', '/inspect?pdes=2101', '/query?limit=3'):
+            with self.subTest(target=target):
+                response, _ = self.get(target)
+                self.assertEqual(response.status, 200)
+
+    def test_inspect(self):
+        response, body = self.get('/inspect?pdes=2101')
+        self.assertEqual(response.status, 200)
+        self.assertEqual(json.loads(body)['name'], 'Adonis')
+
+    def test_bad_requests(self):
+        for target in ('/query?date=2020-13-01', '/query?limit=-1', '/inspect'):
+            with self.subTest(target=target):
+                response, body = self.get(target)
+                self.assertEqual(response.status, 400)
+                self.assertIn('error', json.loads(body))
+
+    def test_unknown_endpoint(self):
+        response, _ = self.get('/nothing')
+        self.assertEqual(response.status, 404)
+
+    def test_only_get(self):
+        self.connection.request('POST', '/query')
+        response = self.connection.getresponse()
+        response.read()
+        self.assertEqual(response.status, 405)
+
+
+class TestReloadingServer(unittest.TestCase):
+    def test_answers_from_the_reloaded_database(self):
+        neos, approaches = load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE)
+        with tempfile.NamedTemporaryFile('w') as source:
+            reloader = Reloader(NEODatabase(neos, approaches),
+                                lambda: NEODatabase(neos, approaches[:20]),
+                                (source.name,), settle=0)
+
+            async def count():
+                server = await start_server(reloader.database, port=0, reloader=reloader)
+                port = server.sockets[0].getsockname()[1]
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                writer.write(b'GET /query?limit=0 HTTP/1.1\r\nConnection: close\r\n\r\n')
+                response = await reader.read()
+                writer.close()
+                server.close()
+                await server.wait_closed()
+                return response.count(b'"datetime_utc"')
+
+            self.assertEqual(asyncio.run(count()), len(approaches))
+            source.write('changed')
+            source.flush()
+            self.assertTrue(reloader.check())
+            reloader.wait()
+            self.assertEqual(asyncio.run(count()), 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+"""Check the query result cache and the filter identities it is keyed on.
+
+Cached queries must produce exactly the same approaches as uncached ones, for
+any ordering of the same filters.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_cache
+"""
+import datetime
+import operator
+import pathlib
+import unittest
+
+import numpy as np
+
+from cache import QueryCache
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import (create_filters, filters_key, AttributeFilter, DistanceFilter,
+                     HazardFilter, VelocityFilter)
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+class NameFilter(AttributeFilter):
+    """Filter approaches by their NEO's name, e.g. against a list of names."""
+
+    @classmethod
+    def get(cls, approach):
+        return approach.neo.name
+
+
+def is_in(value, values):
+    return value in values
+
+
+class TestFiltersKey(unittest.TestCase):
+    def test_equal_filters_are_equal_and_hash_alike(self):
+        self.assertEqual(DistanceFilter(operator.le, 0.05), DistanceFilter(operator.le, 0.05))
+        self.assertEqual(hash(DistanceFilter(operator.le, 0.05)),
+                         hash(DistanceFilter(operator.le, 0.05)))
+
+    def test_class_comparator_and_value_all_count(self):
+        self.assertNotEqual(DistanceFilter(operator.le, 0.05), DistanceFilter(operator.ge, 0.05))
+        self.assertNotEqual(DistanceFilter(operator.le, 0.05), DistanceFilter(operator.le, 0.5))
+        self.assertNotEqual(DistanceFilter(operator.le, 30), VelocityFilter(operator.le, 30))
+
+    def test_key_ignores_order_and_repeats(self):
+        filters = create_filters(hazardous=True, distance_max=0.05, velocity_min=30)
+        self.assertEqual(filters_key(filters), filters_key(filters[::-1]))
+        self.assertEqual(filters_key(filters), filters_key(filters + filters[:1]))
+        self.assertNotEqual(filters_key(filters), filters_key(filters[1:]))
+
+    def test_no_key_for_plain_callables(self):
+        self.assertIsNone(filters_key([HazardFilter(operator.eq, True), lambda approach: True]))
+
+    def test_no_key_for_unhashable_values(self):
+        self.assertIsNone(filters_key([NameFilter(is_in, ['Toro', 'Adonis'])]))
+
+
+class TestQueryCache(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = QueryCache(max_entries=2)
+        cache.put('a', np.arange(3))
+        cache.put('b', np.arange(3))
+        self.assertIsNotNone(cache.get('a'))
+        cache.put('c', np.arange(3))
+        self.assertIsNone(cache.get('b'))
+        self.assertIsNotNone(cache.get('a'))
+        self.assertIsNotNone(cache.get('c'))
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_byte_bound(self):
+        cache = QueryCache(max_bytes=10 * 8)
+        cache.put('a', np.arange(6, dtype=np.int64))
+        cache.put('b', np.arange(4, dtype=np.int64))
+        self.assertEqual(len(cache), 2)
+        cache.put('c', np.arange(1, dtype=np.int64))
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get('a'))
+        cache.put('d', np.arange(11, dtype=np.int64))
+        self.assertIsNone(cache.get('d'))
+        self.assertLessEqual(cache.nbytes, cache.max_bytes)
+
+    def test_cached_rows_are_read_only(self):
+        cache = QueryCache()
+        cache.put('a', np.arange(3))
+        with self.assertRaises(ValueError):
+            cache.get('a')[0] = 1
+
+    def test_zero_entries_disables(self):
+        cache = QueryCache(max_entries=0)
+        cache.put('a', np.arange(3))
+        self.assertIsNone(cache.get('a'))
+
+
+class TestCachedQuery(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+
+    def setUp(self):
+        self.db = NEODatabase(self.neos, self.approaches)
+
+    def test_reordered_filters_hit_the_cache(self):
+        filters = create_filters(start_date=datetime.date(2020, 3, 1), distance_max=0.1,
+                                 hazardous=False)
+        first = list(self.db.query(filters))
+        second = list(self.db.query(filters[::-1]))
+        self.assertEqual(first, second)
+        self.assertEqual(first, list(self.db._scan(filters)))
+        self.assertEqual((self.db.cache.hits, self.db.cache.misses), (1, 1))
+
+    def test_different_filters_miss(self):
+        list(self.db.query(create_filters(distance_max=0.1)))
+        list(self.db.query(create_filters(distance_max=0.2)))
+        self.assertEqual((self.db.cache.hits, self.db.cache.misses), (0, 2))
+
+    def test_different_lambda_comparators_miss(self):
+        faster = [VelocityFilter(lambda x, y: x > y, 10)]
+        slower = [VelocityFilter(lambda x, y: x < y, 10)]
+        self.assertNotEqual(faster[0], slower[0])
+        self.assertEqual(list(self.db.query(faster)), list(self.db._scan(faster)))
+        self.assertEqual(list(self.db.query(slower)), list(self.db._scan(slower)))
+        self.assertEqual((self.db.cache.hits, self.db.cache.misses), (0, 2))
+
+    def test_plain_callables_are_not_cached(self):
+        filters = [DistanceFilter(operator.le, 0.1), lambda approach: approach.velocity > 20]
+        first = list(self.db.query(filters))
+        second = list(self.db.query(filters[::-1]))
+        self.assertEqual(first, second)
+        self.assertEqual(first, list(self.db._scan(filters)))
+        # Only the distance filter's rows are cached.
+        self.assertEqual((self.db.cache.hits, self.db.cache.misses), (1, 1))
+        self.assertEqual(len(self.db.cache), 1)
+
+    def test_unhashable_values_are_not_cached(self):
+        filters = [NameFilter(is_in, ['Toro', 'Adonis']), DistanceFilter(operator.le, 0.5)]
+        received = list(self.db.query(filters))
+        self.assertTrue(received)
+        self.assertEqual(received, list(self.db._scan(filters)))
+        self.assertEqual(len(self.db.cache), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
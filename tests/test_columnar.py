@@ -0,0 +1,355 @@
+"""Check the columnar approach table and the vectorized `NEODatabase.query`.
+
+Vectorized queries must produce exactly the same approaches, in exactly the same
+order, as testing each approach against each filter in turn.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_columnar
+"""
+import datetime
+import math
+import operator
+import pathlib
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import columnar
+from columnar import ApproachTable, GridIndex
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters, AttributeFilter, DistanceFilter, HazardFilter, VelocityFilter
+from helpers import date_to_day, datetime_to_minutes, minutes_to_datetime
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+class TestConversions(unittest.TestCase):
+    def test_minutes_round_trip(self):
+        for dt in (datetime.datetime(1900, 1, 1, 0, 11), datetime.datetime(2020, 12, 31, 12, 0),
+                   datetime.datetime(2199, 6, 1, 23, 59)):
+            self.assertEqual(minutes_to_datetime(datetime_to_minutes(dt)), dt)
+
+    def test_day_matches_minutes_before_epoch(self):
+        dt = datetime.datetime(1969, 7, 29, 23, 59)
+        self.assertEqual(datetime_to_minutes(dt) // 1440, date_to_day(dt.date()))
+
+
+class TestApproachTable(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(cls.neos, cls.approaches)
+        cls.table = cls.db.table
+
+    def test_table_has_one_row_per_approach(self):
+        self.assertEqual(len(self.table), len(self.approaches))
+
+    def test_table_rows_match_approaches(self):
+        for row, approach in enumerate(self.approaches):
+            self.assertEqual(minutes_to_datetime(self.table.time[row]), approach.time)
+            self.assertEqual(self.table.distance[row], approach.distance)
+            self.assertEqual(self.table.velocity[row], approach.velocity)
+            self.assertEqual(self.table.hazardous[row], approach.neo.hazardous)
+            diameter = self.table.diameter[row]
+            if math.isnan(approach.neo.diameter):
+                self.assertTrue(math.isnan(diameter))
+            else:
+                self.assertEqual(diameter, approach.neo.diameter)
+
+
+class TestVectorizedQuery(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(cls.neos, cls.approaches)
+
+    def assertMatchesScan(self, filters):
+        self.assertEqual(list(self.db.query(filters)), list(self.db._scan(filters)))
+
+    def test_query_matches_scan_in_order(self):
+        criteria = (
+            {},
+            {'date': datetime.date(2020, 3, 2)},
+            {'start_date': datetime.date(2020, 3, 1), 'end_date': datetime.date(2020, 3, 31)},
+            {'distance_min': 0.2, 'velocity_max': 10},
+            {'diameter_min': 0.5, 'hazardous': True},
+            {'diameter_max': 0.1, 'hazardous': False},
+            {'start_date': datetime.date(2020, 6, 1), 'distance_max': 0.05, 'velocity_min': 30},
+            {'start_date': datetime.date(2020, 10, 1), 'end_date': datetime.date(2020, 4, 1)},
+            {'start_date': datetime.date(2020, 2, 1), 'date': datetime.date(2020, 3, 2),
+             'end_date': datetime.date(2020, 4, 1)},
+            {'start_date': datetime.date(2021, 1, 1)},
+        )
+        for kwargs in criteria:
+            with self.subTest(**kwargs):
+                self.assertMatchesScan(create_filters(**kwargs))
+
+    def test_date_queries_on_unsorted_approaches(self):
+        neos = load_neos(TEST_NEO_FILE)
+        approaches = load_approaches(TEST_CAD_FILE)
+        approaches = approaches[1::2] + approaches[::-2]
+        db = NEODatabase(neos, approaches)
+        self.assertIsNotNone(db.table.time_order)
+
+        criteria = (
+            {'date': datetime.date(2020, 3, 2)},
+            {'start_date': datetime.date(2020, 3, 1), 'end_date': datetime.date(2020, 3, 31)},
+            {'start_date': datetime.date(2020, 10, 1), 'end_date': datetime.date(2020, 4, 1)},
+            {'end_date': datetime.date(2020, 6, 30), 'hazardous': True},
+        )
+        for kwargs in criteria:
+            with self.subTest(**kwargs):
+                filters = create_filters(**kwargs)
+                self.assertEqual(list(db.query(filters)), list(db._scan(filters)))
+
+    def test_query_falls_back_for_plain_callables(self):
+        filters = [DistanceFilter(operator.le, 0.1), lambda approach: approach.velocity > 20]
+        expected = [approach for approach in self.approaches
+                    if approach.distance <= 0.1 and approach.velocity > 20]
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(list(self.db.query(filters)), expected)
+
+
+class TestPlan(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(cls.neos, cls.approaches)
+        cls.table = cls.db.table
+
+    def test_selectivity_estimates_the_passing_fraction(self):
+        for filter in create_filters(distance_max=0.1, velocity_min=20, diameter_min=0.5,
+                                     hazardous=True):
+            with self.subTest(filter=filter):
+                actual = sum(map(filter, self.approaches)) / len(self.approaches)
+                self.assertAlmostEqual(self.table.selectivity(filter), actual, delta=0.05)
+
+    def test_plan_puts_most_selective_first(self):
+        loose, tight = VelocityFilter(operator.ge, 1), DistanceFilter(operator.le, 0.01)
+        self.assertEqual(self.table.plan([loose, tight]), [tight, loose])
+
+    def test_plan_puts_plain_callables_last(self):
+        hazardous = HazardFilter(operator.eq, True)
+        plain = lambda approach: True  # noqa: E731
+        self.assertEqual(self.table.plan([plain, hazardous]), [hazardous, plain])
+
+    def test_plan_puts_filters_without_a_column_last(self):
+        class NameFilter(AttributeFilter):
+            @classmethod
+            def get(cls, approach):
+                return approach.neo.name
+
+        named = NameFilter(operator.ne, None)
+        hazardous = HazardFilter(operator.eq, True)
+        self.assertEqual(self.table.plan([named, hazardous]), [hazardous, named])
+        self.assertEqual(list(self.db.query([named, hazardous])),
+                         list(self.db._scan([named, hazardous])))
+
+    def test_planned_queries_match_scan(self):
+        criteria = (
+            {'distance_min': 0.05, 'distance_max': 0.5, 'velocity_min': 5, 'velocity_max': 25,
+             'diameter_min': 0.5, 'diameter_max': 1.5, 'hazardous': True},
+            {'start_date': datetime.date(2020, 3, 1), 'distance_max': 0.01, 'velocity_max': 50},
+            {'velocity_min': 1, 'hazardous': False},
+        )
+        for kwargs in criteria:
+            with self.subTest(**kwargs):
+                filters = create_filters(**kwargs)
+                self.assertEqual(list(self.db.query(filters)), list(self.db._scan(filters)))
+
+
+class TestNEOLevelFilters(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(cls.neos, cls.approaches)
+        cls.table = cls.db.table
+
+    def test_neo_rows_are_the_neos_approaches_in_order(self):
+        positions = {id(approach): row for row, approach in enumerate(self.db._approaches)}
+        picked = [3, 0, 17, 250]
+        expected = sorted(positions[id(approach)] for index in picked
+                          for approach in self.db._neos[index].approaches)
+        self.assertEqual(self.table.neo_rows(np.array(picked)).tolist(), expected)
+        self.assertEqual(len(self.table.neo_rows(np.array([], np.int64))), 0)
+
+    def test_neo_level_queries_match_scan(self):
+        criteria = (
+            {'diameter_min': 1, 'hazardous': True},
+            {'diameter_min': 1, 'hazardous': True, 'start_date': datetime.date(2020, 3, 1),
+             'end_date': datetime.date(2020, 6, 30)},
+            {'diameter_min': 0.5, 'date': datetime.date(2020, 3, 2)},
+            {'diameter_max': 0.05, 'distance_max': 0.2, 'velocity_min': 10},
+            {'hazardous': False},
+            {'diameter_min': 1000},
+        )
+        for kwargs in criteria:
+            with self.subTest(**kwargs):
+                filters = create_filters(**kwargs)
+                self.assertEqual(list(self.db.query(filters)), list(self.db._scan(filters)))
+
+    def test_neo_level_queries_on_unsorted_approaches(self):
+        approaches = load_approaches(TEST_CAD_FILE)
+        db = NEODatabase(load_neos(TEST_NEO_FILE), approaches[1::2] + approaches[::-2])
+        for kwargs in ({'diameter_min': 1, 'hazardous': True},
+                       {'hazardous': True, 'end_date': datetime.date(2020, 6, 30)}):
+            with self.subTest(**kwargs):
+                filters = create_filters(**kwargs)
+                self.assertEqual(list(db.query(filters)), list(db._scan(filters)))
+
+    def test_plain_callables_with_neo_level_filters(self):
+        filters = [HazardFilter(operator.eq, True), lambda approach: approach.velocity > 20]
+        expected = [approach for approach in self.approaches
+                    if approach.neo.hazardous and approach.velocity > 20]
+        self.assertGreater(len(expected), 0)
+        self.assertEqual(list(self.db.query(filters)), expected)
+
+
+class TestBitmaps(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(cls.neos, cls.approaches)
+        cls.table = cls.db.table
+
+    def test_bitmaps_match_approaches(self):
+        approaches = self.db._approaches
+        self.assertEqual(self.table.hazardous.tolist(),
+                         [approach.neo.hazardous for approach in approaches])
+        self.assertEqual(self.table.not_hazardous.tolist(),
+                         [not approach.neo.hazardous for approach in approaches])
+        self.assertEqual(self.table.diameter_known.tolist(),
+                         [not math.isnan(approach.neo.diameter) for approach in approaches])
+        self.assertEqual(self.table.bitmap_rows('hazardous').tolist(),
+                         [row for row, approach in enumerate(approaches)
+                          if approach.neo.hazardous])
+
+    def test_bitmaps_are_read_only(self):
+        with self.assertRaises(ValueError):
+            self.table.hazardous[0] = True
+        with self.assertRaises(ValueError):
+            self.table.bitmap_rows('diameter_known')[0] = 0
+
+    def test_slices_share_bitmaps(self):
+        self.table.bitmap_rows('hazardous')
+        part = self.table.take(slice(100, 900))
+        self.assertEqual(part.hazardous.tolist(), self.table.hazardous[100:900].tolist())
+        self.assertEqual(part.bitmap_rows('hazardous').tolist(),
+                         np.flatnonzero(self.table.hazardous[100:900]).tolist())
+
+    def test_bitmap_queries_match_scan(self):
+        criteria = (
+            {'hazardous': True},
+            {'hazardous': False},
+            {'hazardous': True, 'distance_max': 0.1},
+            {'hazardous': False, 'start_date': datetime.date(2020, 3, 1),
+             'end_date': datetime.date(2020, 4, 30)},
+            {'hazardous': True, 'diameter_min': 0.5},
+            {'diameter_min': 0.1, 'velocity_min': 10},
+        )
+        for kwargs in criteria:
+            with self.subTest(**kwargs):
+                filters = create_filters(**kwargs)
+                self.assertEqual(list(self.db.query(filters)), list(self.db._scan(filters)))
+        # Also where diameter filters are evaluated for every approach.
+        with mock.patch.object(columnar, 'NEO_ROWS_BELOW', np.inf):
+            filters = create_filters(diameter_min=0.1, velocity_min=10)
+            self.assertEqual(list(self.db.query(filters)), list(self.db._scan(filters)))
+
+
+class TestHistogram(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        db = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+        cls.table = db.table
+        # The same approaches, out of time order.
+        cls.shuffled = cls.table.take(np.random.default_rng(0).permutation(len(cls.table)))
+
+    def test_time_bins_agree_in_and_out_of_time_order(self):
+        self.assertIsNone(self.table.time_order)
+        self.assertIsNotNone(self.shuffled.time_order)
+        for bins in ('day', 'week', 'month', 'year'):
+            with self.subTest(bins=bins):
+                edges, counts = self.table.histogram('time', bins)
+                shuffled_edges, shuffled_counts = self.shuffled.histogram('time', bins)
+                self.assertEqual(edges.tolist(), shuffled_edges.tolist())
+                self.assertEqual(counts.tolist(), shuffled_counts.tolist())
+                self.assertEqual(counts.sum(), len(self.table))
+                self.assertGreater(counts[0], 0)
+                self.assertGreater(counts[-1], 0)
+
+    def test_before_the_epoch(self):
+        minutes = np.array([datetime_to_minutes(datetime.datetime(*moment)) for moment in (
+            (1969, 12, 31, 23, 59), (1969, 12, 29), (1970, 1, 1), (1969, 1, 1))])
+        table = ApproachTable(minutes, np.zeros(4), np.zeros(4), np.zeros(4, dtype=np.int64),
+                              np.zeros(1), np.zeros(1, dtype=bool))
+        edges, counts = table.histogram('time', 'week')
+        self.assertEqual(edges[[0, -1]].tolist(), [datetime.date(1968, 12, 30),
+                                                   datetime.date(1970, 1, 5)])
+        self.assertEqual(counts[-1], 3)
+        edges, counts = table.histogram('time', 'year')
+        self.assertEqual(edges.tolist(), [datetime.date(1969, 1, 1), datetime.date(1970, 1, 1),
+                                          datetime.date(1971, 1, 1)])
+        self.assertEqual(counts.tolist(), [3, 1])
+
+
+class TestGridIndex(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(cls.neos, cls.approaches)
+        cls.table = cls.db.table
+
+    def test_every_approach_is_in_one_cell(self):
+        grid = GridIndex.build(self.table, cells=8)
+        everything = grid.cells({})
+        self.assertEqual(grid.count(everything), len(self.table))
+        self.assertEqual(grid.rows(everything).tolist(), list(range(len(self.table))))
+
+    def test_cells_cover_the_ranges(self):
+        grid = GridIndex.build(self.table, cells=8)
+        ranges = {'distance': (0.05, 0.2), 'velocity': (None, 12.5)}
+        rows = grid.rows(grid.cells(ranges))
+        inside = np.flatnonzero((self.table.distance >= 0.05) & (self.table.distance <= 0.2)
+                                & (self.table.velocity <= 12.5))
+        self.assertTrue(set(inside.tolist()) <= set(rows.tolist()))
+        self.assertLess(len(rows), len(self.table))
+
+    def test_empty_range_has_no_cells(self):
+        grid = GridIndex.build(self.table, cells=8)
+        self.assertEqual(grid.count(grid.cells({'distance': (0.3, 0.1)})), 0)
+
+    def test_queries_through_the_grid_match_scan(self):
+        criteria = (
+            {'distance_max': 0.1, 'velocity_min': 20},
+            {'distance_min': 0.1, 'distance_max': 0.2},
+            {'start_date': datetime.date(2020, 3, 1), 'end_date': datetime.date(2020, 3, 31),
+             'velocity_max': 10},
+            {'date': datetime.date(2020, 3, 2), 'distance_min': 0.1, 'hazardous': False},
+            {'distance_min': 0.3, 'distance_max': 0.1, 'velocity_min': 5},
+            {'diameter_min': 1, 'velocity_min': 10, 'distance_max': 0.4},
+        )
+        # Always take the grid, however many approaches its cells hold.
+        with mock.patch.object(columnar, 'GRID_BELOW', 0):
+            for kwargs in criteria:
+                with self.subTest(**kwargs):
+                    filters = create_filters(**kwargs)
+                    self.assertEqual(self.table.match(filters).tolist(),
+                                     [row for row, approach in enumerate(self.db._approaches)
+                                      if all(filter(approach) for filter in filters)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,13 +10,22 @@ To run these tests from the project root, run:
 
 These tests should pass when Task 2 is complete.
 """
+import contextlib
+import datetime
+import io
 import pathlib
 import math
+import shutil
+import tempfile
 import unittest
 
+import numpy as np
 
-from extract import load_neos, load_approaches
+from extract import load_neos, load_approaches, load_approaches_after
 from database import NEODatabase
+from filters import create_filters
+from models import CloseApproach
+import snapshot
 
 
 # Paths to the test data files.
@@ -115,5 +124,138 @@ class TestDatabase(unittest.TestCase):
         self.assertIsNone(nonexistent)
 
 
+class TestUnmatchedApproaches(unittest.TestCase):
+    def test_unknown_designations_are_reported_not_linked(self):
+        neos = load_neos(TEST_NEO_FILE)
+        approaches = load_approaches(TEST_CAD_FILE)
+        stray = CloseApproach(des='not-real-designation', cd='2020-Jan-01 00:00',
+                              dist_min=0.1, v_rel=10.0)
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            db = NEODatabase(neos, approaches + [stray])
+
+        self.assertEqual(db.unmatched_approaches, [stray])
+        self.assertIn('not-real-designation', stderr.getvalue())
+        self.assertIsNone(stray.neo)
+        for neo in neos:
+            self.assertNotIn(stray, neo.approaches)
+        self.assertNotIn(stray, list(db.query()))
+        self.assertNotIn(stray, list(db.query(create_filters(distance_min=0.05))))
+
+
+def summarize(approaches):
+    return [(approach.neo.designation, approach.minutes, approach.distance, approach.velocity)
+            for approach in approaches]
+
+
+class TestAddToDatabase(unittest.TestCase):
+    QUERIES = (
+        {},
+        {'start_date': datetime.date(2020, 11, 1)},
+        {'distance_max': 0.05, 'velocity_min': 10},
+        {'hazardous': True},
+        {'diameter_min': 0.5},
+    )
+
+    @classmethod
+    def setUpClass(cls):
+        cls.full = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+
+    def setUp(self):
+        self.neos = load_neos(TEST_NEO_FILE)
+        self.approaches = load_approaches(TEST_CAD_FILE)
+        # Approaches come in time order; the last 300 are the new ones.
+        self.old, self.new = self.approaches[:-300], self.approaches[-300:]
+
+    def assertMatchesFull(self, db):
+        for criteria in self.QUERIES:
+            filters = create_filters(**criteria)
+            self.assertEqual(summarize(db.query(filters)), summarize(self.full.query(filters)),
+                             msg=criteria)
+        self.assertEqual(db.neo_designations, self.full.neo_designations)
+        np.testing.assert_array_equal(db.table.neo_diameter, self.full.table.neo_diameter)
+        np.testing.assert_array_equal(db.table.neo_hazardous, self.full.table.neo_hazardous)
+        for designation in ('2020 BS', '471926', '2101'):
+            self.assertEqual(summarize(db.get_neo_by_designation(designation).approaches),
+                             summarize(self.full.get_neo_by_designation(designation).approaches))
+
+    def test_add_approaches(self):
+        db = NEODatabase(self.neos, self.old)
+        # Build every index that's kept up to date, and cache a result.
+        db.table.neo_groups
+        list(db.query(create_filters(hazardous=True)))
+        self.assertEqual(db.add_approaches(self.new), 300)
+        self.assertEqual(len(db.cache), 0)
+        self.assertIsNone(db.table.time_order)
+        order, offsets = db.table.neo_groups
+        for neo in (0, 17, len(db.neo_designations) - 1):
+            rows = order[offsets[neo]:offsets[neo + 1]]
+            self.assertEqual(rows.tolist(), sorted(rows.tolist()))
+            self.assertTrue((db.table.neo_index[rows] == neo).all())
+        self.assertMatchesFull(db)
+        self.assertEqual(len(self.old), len(self.approaches) - 300)
+
+    def test_add_approaches_before_the_table_is_built(self):
+        db = NEODatabase(self.neos, self.old)
+        db.add_approaches(self.new)
+        self.assertMatchesFull(db)
+
+    def test_add_neos_then_their_approaches(self):
+        # Leave out some NEOs, and any approaches of theirs.
+        missing = {neo.designation for neo in self.neos[::7]}
+        neos = [neo for neo in self.neos if neo.designation not in missing]
+        old = [approach for approach in self.old if approach._designation not in missing]
+        db = NEODatabase(neos, old)
+        db.table.neo_groups
+
+        self.assertEqual(db.add_neos(self.neos), len(missing))
+        self.assertEqual(db.add_neos(self.neos[:10]), 0)
+        np.testing.assert_array_equal(db.table.neo_diameter, self.full.table.neo_diameter)
+        self.assertEqual(db.add_approaches(
+            [approach for approach in self.old if approach._designation in missing]),
+            len(self.old) - len(old))
+        self.assertEqual(db.get_neo_by_name('Jormungandr'),
+                         db.get_neo_by_designation('471926'))
+        # Now in a different order from the full database until the rest arrive.
+        db.add_approaches(self.new)
+        self.assertEqual(sorted(summarize(db.query())), sorted(summarize(self.full.query())))
+        for criteria in self.QUERIES[1:]:
+            filters = create_filters(**criteria)
+            self.assertEqual(sorted(summarize(db.query(filters))),
+                             sorted(summarize(self.full.query(filters))), msg=criteria)
+
+    def test_unknown_neos_are_set_aside(self):
+        db = NEODatabase(self.neos, self.old)
+        stray = CloseApproach(des='not-real-designation', cd='2021-Jan-01 00:00',
+                              dist_min=0.1, v_rel=10.0)
+        with contextlib.redirect_stderr(io.StringIO()) as stderr:
+            self.assertEqual(db.add_approaches([stray] + self.new), 300)
+        self.assertEqual(db.unmatched_approaches, [stray])
+        self.assertIn('not-real-designation', stderr.getvalue())
+        self.assertMatchesFull(db)
+
+    def test_catch_up_with_a_newer_file(self):
+        # The 81st and 82nd approaches share a minute; only the first is loaded.
+        db = NEODatabase(self.neos, self.approaches[:81])
+        minutes, loaded = db.latest()
+        self.assertEqual(minutes, self.approaches[80].minutes)
+        self.assertEqual(loaded, {self.approaches[80]._designation})
+        db.add_approaches(load_approaches_after(TEST_CAD_FILE, minutes, loaded))
+        self.assertMatchesFull(db)
+
+    def test_latest_of_an_empty_database(self):
+        self.assertEqual(NEODatabase(self.neos, []).latest(), (None, set()))
+
+    def test_add_to_a_snapshot(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        sources = (TEST_NEO_FILE, TEST_CAD_FILE)
+        snapshot.save(NEODatabase(self.neos, self.old), tmpdir, sources)
+        db = snapshot.load(tmpdir, sources)
+        db.table
+        self.assertEqual(db.add_approaches(self.new), 300)
+        self.assertMatchesFull(db)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -11,12 +11,17 @@ To run these tests from the project root, run:
 These tests should pass when Task 2 is complete.
 """
 import collections.abc
+import csv
 import datetime
+import json
 import pathlib
 import math
+import tempfile
+import types
 import unittest
 
-from extract import load_neos, load_approaches
+from extract import (load_neos, load_approaches, load_approaches_after, iter_approaches,
+                     load_parallel, CAD_FIELDS)
 from models import NearEarthObject, CloseApproach
 
 
@@ -78,6 +83,61 @@ class TestLoadNEOs(unittest.TestCase):
         self.assertEqual(neo.hazardous, True)
 
 
+class TestLoadNEOColumns(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(TEST_NEO_FILE, newline='') as f:
+            cls.rows = list(csv.reader(f))
+        cls.neos = load_neos(TEST_NEO_FILE)
+
+    @staticmethod
+    def summarize(neos):
+        return [(neo.designation, neo.name, neo.full_name, repr(neo.diameter),
+                 neo.hazardous, neo.extra) for neo in neos]
+
+    def load_rows(self, rows, quoting=csv.QUOTE_MINIMAL, **kwargs):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='') as f:
+            csv.writer(f, lineterminator='\n', quoting=quoting).writerows(rows)
+            f.flush()
+            return load_neos(f.name, **kwargs)
+
+    def test_load_neos_is_robust_to_column_order(self):
+        order = list(reversed(range(len(self.rows[0]))))
+        reordered = [[row[i] for i in order] for row in self.rows]
+        self.assertEqual(self.summarize(self.load_rows(reordered)),
+                         self.summarize(self.neos))
+
+    def test_load_neos_keeps_extra_columns(self):
+        neos = load_neos(TEST_NEO_FILE, extra_columns=('moid', 'a', 'e', 'i', 'H', 'class'))
+        self.assertIsNone(self.neos[0].extra)
+        by_designation = {neo.designation: neo for neo in neos}
+        self.assertEqual(by_designation['1685'].extra,
+                         {'moid': 0.0506645, 'a': 1.367586471676899, 'e': 0.4358371101234201,
+                          'i': 9.383132281270342, 'H': 14.3, 'class': 'APO'})
+
+    def test_load_neos_empty_extra_value_is_none(self):
+        # DT is the last column, so this also reads up to the end of each line.
+        neos = load_neos(TEST_NEO_FILE, extra_columns=('G', 'DT'))
+        self.assertEqual(neos[0].extra, {'G': None, 'DT': None})
+
+    def test_load_neos_all_fields_quoted(self):
+        neos = self.load_rows(self.rows, quoting=csv.QUOTE_ALL)
+        self.assertEqual(self.summarize(neos), self.summarize(self.neos))
+
+    def test_load_neos_quoted_fields(self):
+        rows = [row[:] for row in self.rows[:3]]
+        full_name = rows[0].index('full_name')
+        rows[1][full_name] = 'Toro, "the bull"'
+        rows[2][full_name] = 'Two\nLines'
+        neos = self.load_rows(rows, extra_columns=('DT',))
+        self.assertEqual([neo.full_name for neo in neos], ['Toro, "the bull"', 'Two\nLines'])
+        self.assertEqual([neo.designation for neo in neos], [self.rows[1][3], self.rows[2][3]])
+
+    def test_load_neos_missing_column(self):
+        with self.assertRaises(ValueError):
+            load_neos(TEST_NEO_FILE, extra_columns=('no_such_column',))
+
+
 class TestLoadApproaches(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -112,11 +172,150 @@ class TestLoadApproaches(unittest.TestCase):
         self.assertIsNotNone(approach)
         self.assertIsInstance(approach.distance, float)
 
+    def test_approach_has_no_instance_dict(self):
+        approach = self.get_first_approach_or_none()
+        self.assertIsNotNone(approach)
+        self.assertFalse(hasattr(approach, '__dict__'))
+
     def test_approach_velocity_is_float(self):
         approach = self.get_first_approach_or_none()
         self.assertIsNotNone(approach)
         self.assertIsInstance(approach.velocity, float)
 
 
+class TestIterApproaches(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+
+    @staticmethod
+    def summarize(approaches):
+        return [(approach._designation, approach.time, approach.distance, approach.velocity)
+                for approach in approaches]
+
+    def test_iter_approaches_is_a_generator(self):
+        self.assertIsInstance(iter_approaches(TEST_CAD_FILE), types.GeneratorType)
+
+    def test_iter_approaches_matches_load_approaches(self):
+        # The test file lists "fields" after "data".
+        streamed = iter_approaches(TEST_CAD_FILE)
+        self.assertEqual(self.summarize(streamed), self.summarize(self.approaches))
+
+    def test_iter_approaches_uses_leading_fields_header(self):
+        with open(TEST_CAD_FILE) as f:
+            document = json.load(f)
+        # Reorder the columns, and put the header first as NASA does.
+        order = [3, 0, 7, 5]
+        reordered = {
+            'fields': [document['fields'][i] for i in order],
+            'data': [[row[i] for i in order] for row in document['data']],
+        }
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as f:
+            json.dump(reordered, f, indent='\t')
+            f.flush()
+            streamed = iter_approaches(f.name)
+            self.assertEqual(self.summarize(streamed), self.summarize(self.approaches))
+
+    def test_load_approaches_compact(self):
+        for stream in (False, True):
+            with self.subTest(stream=stream):
+                compact = load_approaches(TEST_CAD_FILE, stream=stream, compact=True)
+                self.assertEqual(self.summarize(compact), self.summarize(self.approaches))
+                self.assertIsInstance(compact[0].time, datetime.datetime)
+
+    def test_load_approaches_stream(self):
+        streamed = load_approaches(TEST_CAD_FILE, stream=True)
+        self.assertIsInstance(streamed, collections.abc.Collection)
+        self.assertEqual(self.summarize(streamed), self.summarize(self.approaches))
+
+
+class TestLoadParallel(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+
+    summarize = staticmethod(TestIterApproaches.summarize)
+
+    def test_load_parallel_matches_serial_loaders(self):
+        neos, approaches = load_parallel(TEST_NEO_FILE, TEST_CAD_FILE, workers=2)
+        self.assertEqual([neo.designation for neo in neos],
+                         [neo.designation for neo in self.neos])
+        self.assertEqual(self.summarize(approaches), self.summarize(self.approaches))
+
+    def test_load_parallel_compact(self):
+        _, approaches = load_parallel(TEST_NEO_FILE, TEST_CAD_FILE, workers=2, compact=True)
+        self.assertEqual(self.summarize(approaches), self.summarize(self.approaches))
+
+    def test_load_parallel_uses_leading_fields_header(self):
+        with open(TEST_CAD_FILE) as f:
+            document = json.load(f)
+        order = [3, 0, 7, 5]
+        reordered = {
+            'fields': [document['fields'][i] for i in order],
+            'data': [[row[i] for i in order] for row in document['data']],
+        }
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as f:
+            json.dump(reordered, f, indent='\t')
+            f.flush()
+            _, approaches = load_parallel(TEST_NEO_FILE, f.name, workers=2)
+        self.assertEqual(self.summarize(approaches), self.summarize(self.approaches))
+
+    def test_load_parallel_empty_data(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as f:
+            json.dump({'fields': list(CAD_FIELDS), 'data': []}, f)
+            f.flush()
+            _, approaches = load_parallel(TEST_NEO_FILE, f.name, workers=2)
+        self.assertEqual(approaches, [])
+
+
+class TestLoadApproachesAfter(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+
+    summarize = staticmethod(TestIterApproaches.summarize)
+
+    def test_only_approaches_from_then_on_are_loaded(self):
+        times = [approach.minutes for approach in self.approaches]
+        for cutoff in (times[0] - 1, times[0], times[1000], times[-2], times[-1]):
+            with self.subTest(cutoff=cutoff):
+                self.assertEqual(
+                    self.summarize(load_approaches_after(TEST_CAD_FILE, cutoff)),
+                    self.summarize(approach for approach in self.approaches
+                                   if approach.minutes >= cutoff))
+
+    def test_loaded_approaches_in_the_same_minute_are_skipped(self):
+        # The 81st and 82nd approaches share a minute.
+        first, second = self.approaches[80:82]
+        self.assertEqual(first.minutes, second.minutes)
+        self.assertEqual(
+            self.summarize(load_approaches_after(TEST_CAD_FILE, first.minutes,
+                                                 {first._designation})),
+            self.summarize(self.approaches[81:]))
+
+    def test_uses_leading_fields_header_and_spaced_rows(self):
+        with open(TEST_CAD_FILE) as f:
+            document = json.load(f)
+        order = [3, 0, 7, 5]
+        reordered = {
+            'fields': [document['fields'][i] for i in order],
+            'data': [[row[i] for i in order] for row in document['data']],
+        }
+        cutoff = self.approaches[3000].minutes
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as f:
+            json.dump(reordered, f, indent='\t')
+            f.flush()
+            self.assertEqual(self.summarize(load_approaches_after(f.name, cutoff)),
+                             self.summarize(approach for approach in self.approaches
+                                            if approach.minutes >= cutoff))
+
+    def test_empty_data(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as f:
+            json.dump({'fields': list(CAD_FIELDS), 'data': []}, f)
+            f.flush()
+            self.assertEqual(load_approaches_after(f.name, 0), [])
+
+
 if __name__ == '__main__':
     unittest.main()
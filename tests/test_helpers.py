@@ -0,0 +1,77 @@
+"""Check that `cd_to_datetime` behaves exactly like `datetime.strptime`.
+
+`cd_to_datetime` parses NASA's fixed-layout timestamps directly, and must return
+the same datetimes - and raise the same errors - as the `strptime` format it
+replaces.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_helpers
+"""
+import datetime
+import json
+import pathlib
+import unittest
+
+from helpers import cd_to_datetime, datetime_to_str
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+FORMAT = "%Y-%b-%d %H:%M"
+
+
+class TestCdToDatetime(unittest.TestCase):
+    def assertSameAsStrptime(self, calendar_date):
+        try:
+            expected = datetime.datetime.strptime(calendar_date, FORMAT)
+        except (TypeError, ValueError) as err:
+            with self.assertRaises(type(err)) as context:
+                cd_to_datetime(calendar_date)
+            self.assertEqual(str(context.exception), str(err))
+        else:
+            self.assertEqual(cd_to_datetime(calendar_date), expected)
+            self.assertEqual(cd_to_datetime(calendar_date, cache=False), expected)
+
+    def test_matches_strptime_on_test_data(self):
+        with open(TEST_CAD_FILE) as f:
+            rows = json.load(f)['data']
+        for row in rows:
+            expected = datetime.datetime.strptime(row[3], FORMAT)
+            self.assertEqual(cd_to_datetime(row[3]), expected)
+            self.assertEqual(cd_to_datetime(row[3], cache=False), expected)
+
+    def test_matches_strptime_on_edge_cases(self):
+        for calendar_date in ('1900-Jan-01 00:00', '2200-Dec-31 23:59', '2020-Feb-29 12:00',
+                              '0999-Jun-15 06:30', '2020-jan-01 00:00', '2020-JAN-01 00:00',
+                              '2020-Jan-1 00:00', '2020-Jan-01 0:00', '2020-Jan-01 00:5'):
+            with self.subTest(calendar_date=calendar_date):
+                self.assertSameAsStrptime(calendar_date)
+
+    def test_matches_strptime_on_malformed_input(self):
+        for calendar_date in ('2019-Feb-29 12:00', '2020-Jan-00 00:00', '2020-Jan-32 00:00',
+                              '2020-Jan-01 24:00', '2020-Jan-01 00:60', '0000-Jan-01 00:00',
+                              '2020-Foo-01 00:00', '2020-01-01 00:00', '2020/Jan/01 00:00',
+                              '2020-Jan-01T00:00', '+020-Jan-01 00:00', '2020-Jan-01 00:00 ',
+                              '٢٠٢٠-Jan-01 00:00', '', 'not a date'):
+            with self.subTest(calendar_date=calendar_date):
+                self.assertSameAsStrptime(calendar_date)
+
+    def test_matches_strptime_on_wrong_types(self):
+        for calendar_date in (None, 20200101, b'2020-Jan-01 00:00'):
+            with self.subTest(calendar_date=calendar_date):
+                self.assertSameAsStrptime(calendar_date)
+
+
+class TestDatetimeToStr(unittest.TestCase):
+    def test_matches_strftime(self):
+        for dt in (datetime.datetime(2020, 1, 1, 0, 54), datetime.datetime(1900, 12, 31, 23, 59, 59),
+                   datetime.datetime(2200, 6, 15, 6, 30, 0, 999999), datetime.datetime(999, 3, 4, 5, 6),
+                   datetime.datetime(1, 1, 1)):
+            with self.subTest(dt=dt):
+                self.assertEqual(datetime_to_str(dt), dt.strftime('%Y-%m-%d %H:%M'))
+
+
+if __name__ == '__main__':
+    unittest.main()
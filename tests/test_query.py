@@ -12,8 +12,11 @@ To run these tests from the project root, run::
 
 These tests should pass when Tasks 3a and 3b are complete.
 """
+import collections
 import datetime
+import math
 import pathlib
+import statistics
 import unittest
 
 from database import NEODatabase
@@ -529,5 +532,213 @@ class TestQuery(unittest.TestCase):
         self.assertEqual(expected, received, msg="Computed results do not match expected results.")
 
 
+class TestTop(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(cls.neos, cls.approaches)
+
+    def expected(self, approaches, key, count, descending=False):
+        """Sort approaches the slow way: stably, unknown values last."""
+        def rank(approach):
+            value = key(approach)
+            if math.isnan(value):
+                return True, 0.0
+            return False, -value if descending else value
+        return sorted(approaches, key=rank)[:count]
+
+    def test_closest_and_farthest(self):
+        distance = lambda approach: approach.distance
+        for descending in (False, True):
+            with self.subTest(descending=descending):
+                received = list(self.db.top(sort_by='distance', count=20, descending=descending))
+                self.assertEqual(received, self.expected(self.approaches, distance, 20, descending))
+
+    def test_fastest_hazardous(self):
+        filters = create_filters(hazardous=True)
+        matches = list(self.db.query(filters))
+        received = list(self.db.top(filters, 'velocity', 50, descending=True))
+        self.assertEqual(received, self.expected(matches, lambda approach: approach.velocity,
+                                                 50, descending=True))
+
+    def test_unknown_diameters_come_last(self):
+        filters = create_filters(start_date=datetime.date(2020, 3, 1),
+                                 end_date=datetime.date(2020, 3, 31))
+        matches = list(self.db.query(filters))
+        diameter = lambda approach: approach.neo.diameter
+        for descending in (False, True):
+            with self.subTest(descending=descending):
+                received = list(self.db.top(filters, 'diameter', descending=descending))
+                self.assertEqual(received, self.expected(matches, diameter, None, descending))
+                self.assertTrue(math.isnan(received[-1].neo.diameter))
+                # Cut off among the unknown diameters, too.
+                count = len(received) - 3
+                self.assertEqual(list(self.db.top(filters, 'diameter', count, descending)),
+                                 received[:count])
+
+    def test_ties_keep_approach_order(self):
+        # Many approaches fall on the same minute; latest first, ties in order.
+        received = list(self.db.top(sort_by='date', count=100, descending=True))
+        self.assertEqual(received, self.expected(self.approaches,
+                                                 lambda approach: approach.minutes,
+                                                 100, descending=True))
+
+    def test_plain_callables_use_a_heap(self):
+        filters = create_filters(distance_max=0.2) + [lambda approach: approach.velocity > 10]
+        matches = list(self.db.query(filters))
+        received = list(self.db.top(filters, 'distance', 10))
+        self.assertEqual(received, self.expected(matches, lambda approach: approach.distance, 10))
+
+    def test_plain_callables_match_the_columnar_path(self):
+        # Only 9 of these approaches' NEOs have a known diameter; the rest tie.
+        filters = create_filters(distance_max=0.05)
+        callables = filters + [lambda approach: True]
+        for descending in (False, True):
+            with self.subTest(descending=descending):
+                self.assertEqual(list(self.db.top(callables, 'diameter', 60, descending)),
+                                 list(self.db.top(filters, 'diameter', 60, descending)))
+
+    def test_unknown_sort_key(self):
+        with self.assertRaises(ValueError):
+            list(self.db.top(sort_by='name'))
+
+
+class TestAggregate(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(cls.neos, cls.approaches)
+
+    def expected(self, approaches, group):
+        """Summarize approaches the slow way, grouped by a function."""
+        groups = collections.defaultdict(list)
+        for approach in approaches:
+            groups[group(approach)].append(approach)
+        summaries = []
+        for key in sorted(groups):
+            distances = [approach.distance for approach in groups[key]]
+            velocities = [approach.velocity for approach in groups[key]]
+            summaries.append({
+                'group': key, 'count': len(groups[key]),
+                'distance_min': min(distances), 'distance_max': max(distances),
+                'distance_mean': statistics.mean(distances),
+                'velocity_min': min(velocities), 'velocity_max': max(velocities),
+                'velocity_mean': statistics.mean(velocities),
+            })
+        return summaries
+
+    def assertSummariesEqual(self, received, expected):
+        self.assertEqual([summary['group'] for summary in received],
+                         [summary['group'] for summary in expected])
+        for got, want in zip(received, expected):
+            self.assertEqual(got['count'], want['count'])
+            for name in want:
+                if name not in ('group', 'count'):
+                    self.assertAlmostEqual(got[name], want[name], msg=name)
+
+    def test_aggregate_all(self):
+        self.assertSummariesEqual(self.db.aggregate(),
+                                  self.expected(self.approaches, lambda approach: None))
+
+    def test_aggregate_by_group(self):
+        filters = create_filters(distance_max=0.1, hazardous=False)
+        matches = list(self.db.query(filters))
+        groups = {
+            'year': lambda approach: approach.time.year,
+            'month': lambda approach: approach.time.strftime('%Y-%m'),
+            'neo': lambda approach: approach.neo.designation,
+        }
+        for group_by, group in groups.items():
+            with self.subTest(group_by=group_by):
+                self.assertSummariesEqual(self.db.aggregate(filters, group_by),
+                                          self.expected(matches, group))
+
+    def test_aggregate_with_plain_callables(self):
+        filters = create_filters(velocity_min=10) + [lambda approach: approach.neo.name]
+        matches = list(self.db.query(filters))
+        self.assertGreater(len(matches), 0)
+        self.assertSummariesEqual(self.db.aggregate(filters, 'neo'),
+                                  self.expected(matches, lambda approach: approach.neo.designation))
+
+    def test_aggregate_nothing(self):
+        filters = create_filters(distance_min=10)
+        self.assertEqual(self.db.aggregate(filters, 'month'), [])
+        summary, = self.db.aggregate(filters)
+        self.assertEqual((summary['group'], summary['count']), (None, 0))
+        self.assertTrue(math.isnan(summary['distance_mean']))
+
+    def test_unknown_group(self):
+        with self.assertRaises(ValueError):
+            self.db.aggregate(group_by='day')
+
+
+class TestHistogram(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.neos = load_neos(TEST_NEO_FILE)
+        cls.approaches = load_approaches(TEST_CAD_FILE)
+        cls.db = NEODatabase(cls.neos, cls.approaches)
+
+    def assertTimeBins(self, histogram, matches, bin_start):
+        """Check a time histogram against counting the matches' bins directly."""
+        counts = collections.Counter(bin_start(approach.time.date()) for approach in matches)
+        self.assertEqual(histogram[0][0], min(counts))
+        self.assertEqual(histogram[-1][0], max(counts))
+        for (start, end, count), (next_start, _, _) in zip(histogram, histogram[1:]):
+            self.assertEqual(end, next_start)
+        self.assertEqual({start: count for start, _, count in histogram if count}, dict(counts))
+        self.assertEqual(sum(count for _, _, count in histogram), len(matches))
+
+    def test_time_bins(self):
+        filters = create_filters(distance_max=0.1, velocity_min=5)
+        matches = list(self.db.query(filters))
+        bin_starts = {
+            'day': lambda date: date,
+            'week': lambda date: date - datetime.timedelta(days=date.weekday()),
+            'month': lambda date: date.replace(day=1),
+            'year': lambda date: date.replace(month=1, day=1),
+        }
+        for bins, bin_start in bin_starts.items():
+            with self.subTest(bins=bins):
+                self.assertTimeBins(self.db.histogram(filters, 'time', bins), matches, bin_start)
+
+    def test_yearly_by_default(self):
+        (start, end, count), = self.db.histogram()
+        self.assertEqual((start, end, count),
+                         (datetime.date(2020, 1, 1), datetime.date(2021, 1, 1),
+                          len(self.approaches)))
+
+    def test_distance_and_velocity_bins(self):
+        filters = create_filters(hazardous=True) + [lambda approach: approach.neo.name]
+        matches = list(self.db.query(filters))
+        for field in ('distance', 'velocity'):
+            with self.subTest(field=field):
+                histogram = self.db.histogram(filters, field, 7)
+                self.assertEqual(len(histogram), 7)
+                values = [getattr(approach, field) for approach in matches]
+                self.assertEqual(histogram[0][0], min(values))
+                self.assertEqual(histogram[-1][1], max(values))
+                for index, (start, end, count) in enumerate(histogram):
+                    last = index == len(histogram) - 1
+                    self.assertEqual(count, sum(start <= value < end or (last and value == end)
+                                                for value in values))
+
+    def test_bin_edges(self):
+        histogram = self.db.histogram(field='distance', bins=[0, 0.05, 0.5])
+        self.assertEqual([(start, end) for start, end, _ in histogram], [(0, 0.05), (0.05, 0.5)])
+        self.assertEqual(sum(count for _, _, count in histogram), len(self.approaches))
+
+    def test_nothing_matches(self):
+        self.assertEqual(self.db.histogram(create_filters(distance_min=10), 'time', 'day'), [])
+
+    def test_unknown_field_or_bins(self):
+        with self.assertRaises(ValueError):
+            self.db.histogram(field='diameter')
+        with self.assertRaises(ValueError):
+            self.db.histogram(field='time', bins=12)
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,137 @@
+"""Check that changed data files are reloaded in the background and swapped in.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_reloader
+"""
+import contextlib
+import io
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+import unittest
+
+import main
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+from reloader import Reloader
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+class TestReloader(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = pathlib.Path(tempfile.mkdtemp())
+        self.neofile = self.tmpdir / TEST_NEO_FILE.name
+        self.cadfile = self.tmpdir / TEST_CAD_FILE.name
+        shutil.copy(TEST_NEO_FILE, self.neofile)
+        shutil.copy(TEST_CAD_FILE, self.cadfile)
+        self.loads = 0
+        self.reloader = Reloader(self.load(), self.load, (self.neofile, self.cadfile), settle=0)
+
+    def tearDown(self):
+        self.reloader.wait()
+        shutil.rmtree(self.tmpdir)
+
+    def load(self):
+        self.loads += 1
+        with contextlib.redirect_stdout(io.StringIO()):
+            return NEODatabase(load_neos(self.neofile), load_approaches(self.cadfile))
+
+    def keep_approaches(self, count):
+        """Rewrite the close approach file with only its first count approaches."""
+        with open(TEST_CAD_FILE) as file:
+            data = json.load(file)
+        data['data'] = data['data'][:count]
+        data['count'] = str(count)
+        with open(self.cadfile, 'w') as file:
+            json.dump(data, file)
+
+    def test_unchanged_files_are_not_reloaded(self):
+        self.assertFalse(self.reloader.check())
+        self.assertEqual(self.loads, 1)
+
+    def test_changed_files_are_swapped_in(self):
+        old = self.reloader.database
+        swapped = []
+        self.reloader.subscribe(swapped.append)
+        self.keep_approaches(100)
+        self.assertTrue(self.reloader.check())
+        self.reloader.wait()
+
+        new = self.reloader.database
+        self.assertIsNot(new, old)
+        self.assertEqual(swapped, [new])
+        self.assertEqual(self.reloader.generation, 1)
+        self.assertEqual(len(list(new.query())), 100)
+        self.assertEqual(len(list(old.query())), 4700)
+        # The new query table is ready before the swap.
+        self.assertIsNotNone(new._table)
+        self.assertFalse(self.reloader.check())
+
+    def test_queries_are_answered_during_a_reload(self):
+        loading, release = threading.Event(), threading.Event()
+        load = self.reloader.load
+
+        def slow_load():
+            loading.set()
+            release.wait()
+            return load()
+
+        self.reloader.load = slow_load
+        old = self.reloader.database
+        self.keep_approaches(100)
+        self.assertTrue(self.reloader.check())
+        loading.wait()
+        self.assertTrue(self.reloader.reloading)
+        # A second change while loading doesn't start a second reload.
+        self.assertFalse(self.reloader.check())
+        filters = create_filters(distance_max=0.1)
+        self.assertIs(self.reloader.database, old)
+        self.assertEqual(list(self.reloader.database.query(filters)), list(old.query(filters)))
+        release.set()
+        self.reloader.wait()
+        self.assertIsNot(self.reloader.database, old)
+
+    def test_failed_reload_keeps_the_old_database(self):
+        old = self.reloader.database
+        self.cadfile.write_text('{"data": [')
+        with contextlib.redirect_stderr(io.StringIO()) as stderr:
+            self.assertTrue(self.reloader.check())
+            self.reloader.wait()
+        self.assertIn('Unable to reload', stderr.getvalue())
+        self.assertIs(self.reloader.database, old)
+        self.assertIsNotNone(self.reloader.error)
+        # Not retried until the files change again.
+        self.assertFalse(self.reloader.check())
+        self.keep_approaches(10)
+        self.assertTrue(self.reloader.check())
+        self.reloader.wait()
+        self.assertIsNone(self.reloader.error)
+        self.assertEqual(len(list(self.reloader.database.query())), 10)
+
+    def test_shell_swaps_between_commands(self):
+        _, inspect_parser, query_parser = main.make_parser()
+        shell = main.NEOShell(self.reloader.database, inspect_parser, query_parser,
+                              reloader=self.reloader)
+        old = shell.db
+        self.keep_approaches(100)
+        with contextlib.redirect_stderr(io.StringIO()) as stderr:
+            shell.precmd('query')
+            self.reloader.wait()
+            self.assertIs(shell.db, old)
+            shell.precmd('query')
+        self.assertIs(shell.db, self.reloader.database)
+        self.assertIsNot(shell.db, old)
+        self.assertIn('Reloaded', stderr.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+"""Check that the HTTP server answers `inspect` and `query` like the database.
+
+A server is started on a free localhost port for the duration of these tests.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_server
+"""
+import datetime
+import json
+import pathlib
+import threading
+import unittest
+import urllib.error
+import urllib.request
+
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+from server import NEOServer
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+class TestServer(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+        cls.server = NEOServer(('127.0.0.1', 0), cls.db)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.url = 'http://127.0.0.1:{}'.format(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def get(self, target):
+        """Return the (status, decoded JSON body) of a GET request."""
+        try:
+            with urllib.request.urlopen(self.url + target) as response:
+                return response.status, json.load(response)
+        except urllib.error.HTTPError as err:
+            return err.code, json.load(err)
+
+    def test_inspect_by_designation(self):
+        status, body = self.get('/inspect?pdes=2101')
+        self.assertEqual(status, 200)
+        self.assertEqual(body, {'designation': '2101', 'name': 'Adonis', 'diameter_km': 0.6,
+                                'potentially_hazardous': True,
+                                'full_name': '2101 Adonis (1936 CA)'})
+
+    def test_inspect_by_name_verbose(self):
+        status, body = self.get('/inspect?name=Adonis&verbose=true')
+        self.assertEqual(status, 200)
+        neo = self.db.get_neo_by_name('Adonis')
+        self.assertEqual(body['approaches'], [approach.jsonMaker for approach in neo.approaches])
+
+    def test_inspect_missing_neo(self):
+        status, body = self.get('/inspect?pdes=not-real-designation')
+        self.assertEqual(status, 404)
+        self.assertIn('error', body)
+
+    def test_query_matches_database(self):
+        status, body = self.get('/query?start_date=2020-01-01&end_date=2020-01-31'
+                                '&distance_max=0.1&hazardous=false&limit=0')
+        self.assertEqual(status, 200)
+        filters = create_filters(start_date=datetime.date(2020, 1, 1),
+                                 end_date=datetime.date(2020, 1, 31),
+                                 distance_max=0.1, hazardous=False)
+        expected = [approach.jsonMaker for approach in self.db.query(filters)]
+        self.assertGreater(len(expected), 10)
+        self.assertEqual(body['results'], expected)
+
+    def test_query_default_limit(self):
+        status, body = self.get('/query')
+        self.assertEqual(status, 200)
+        self.assertEqual(len(body['results']), 10)
+
+    def test_bad_requests(self):
+        for target in ('/query?date=2020-13-01', '/query?velocity_min=fast',
+                       '/query?hazardous=maybe', '/query?limit=-1', '/query?colour=red',
+                       '/query?limit=1&limit=2', '/inspect', '/inspect?pdes=433&verbose=2'):
+            with self.subTest(target=target):
+                status, body = self.get(target)
+                self.assertEqual(status, 400)
+                self.assertIn('error', body)
+
+    def test_stats_counts_cache_hits(self):
+        _, before = self.get('/stats')
+        self.get('/query?distance_max=0.05&hazardous=true')
+        self.get('/query?hazardous=true&distance_max=0.05&limit=3')
+        _, after = self.get('/stats')
+        self.assertEqual(after['cache']['hits'], before['cache']['hits'] + 1)
+        self.assertEqual(after['cache']['misses'], before['cache']['misses'] + 1)
+
+    def test_unknown_endpoint(self):
+        status, _ = self.get('/nothing')
+        self.assertEqual(status, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+"""Check that a snapshot of an `NEODatabase` answers exactly like the original.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_snapshot
+"""
+import datetime
+import json
+import math
+import os
+import pathlib
+import shutil
+import tempfile
+import unittest
+
+import snapshot
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import create_filters
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+def summarize_neo(neo):
+    diameter = None if math.isnan(neo.diameter) else neo.diameter
+    return (neo.designation, neo.name, neo.full_name, diameter, neo.hazardous)
+
+
+def summarize_approach(approach):
+    return (approach.neo.designation, approach.time, approach.distance, approach.velocity)
+
+
+class TestSnapshot(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = pathlib.Path(tempfile.mkdtemp())
+        cls.sources = (TEST_NEO_FILE, TEST_CAD_FILE)
+        cls.db = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+        snapshot.save(cls.db, cls.tmpdir / 'snapshot', cls.sources)
+        cls.loaded = snapshot.load(cls.tmpdir / 'snapshot', cls.sources)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmpdir)
+
+    def test_snapshot_loads(self):
+        self.assertIsInstance(self.loaded, NEODatabase)
+
+    def test_get_neo_by_designation(self):
+        for designation in ('1865', '2101', '2020 BS', '2020 PY1'):
+            expected = self.db.get_neo_by_designation(designation)
+            received = self.loaded.get_neo_by_designation(designation)
+            self.assertEqual(summarize_neo(received), summarize_neo(expected))
+            self.assertEqual([summarize_approach(approach) for approach in received.approaches],
+                             [summarize_approach(approach) for approach in expected.approaches])
+        self.assertIsNone(self.loaded.get_neo_by_designation('not-real-designation'))
+
+    def test_get_neo_by_name(self):
+        for name in ('Lemmon', 'Jormungandr', 'Adonis'):
+            expected = self.db.get_neo_by_name(name)
+            received = self.loaded.get_neo_by_name(name)
+            self.assertEqual(summarize_neo(received), summarize_neo(expected))
+        self.assertIsNone(self.loaded.get_neo_by_name('not-real-name'))
+
+    def test_approaches_link_to_the_same_objects(self):
+        neo = self.loaded.get_neo_by_designation('2101')
+        for approach in neo.approaches:
+            self.assertIs(approach.neo, neo)
+            self.assertIn(approach, list(self.loaded.query(create_filters(
+                date=approach.time.date(), hazardous=True))))
+
+    def test_query_matches_original(self):
+        criteria = (
+            {},
+            {'start_date': datetime.date(2020, 3, 1), 'end_date': datetime.date(2020, 3, 31)},
+            {'distance_max': 0.05, 'velocity_min': 20, 'hazardous': True},
+            {'diameter_min': 0.5},
+        )
+        for kwargs in criteria:
+            with self.subTest(**kwargs):
+                filters = create_filters(**kwargs)
+                self.assertEqual([summarize_approach(a) for a in self.loaded.query(filters)],
+                                 [summarize_approach(a) for a in self.db.query(filters)])
+
+    def test_missing_snapshot_is_not_loaded(self):
+        self.assertIsNone(snapshot.load(self.tmpdir / 'nowhere', self.sources))
+
+    def test_changed_source_invalidates_snapshot(self):
+        copies = []
+        for source in self.sources:
+            copy = self.tmpdir / source.name
+            shutil.copy(source, copy)
+            copies.append(copy)
+        snapshot.save(self.db, self.tmpdir / 'changed', copies)
+        self.assertIsNotNone(snapshot.load(self.tmpdir / 'changed', copies))
+
+        stat = copies[1].stat()
+        os.utime(copies[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIsNone(snapshot.load(self.tmpdir / 'changed', copies))
+
+    def test_load_without_sources_skips_the_check(self):
+        copies = []
+        for source in self.sources:
+            copy = self.tmpdir / f'unchecked-{source.name}'
+            shutil.copy(source, copy)
+            copies.append(copy)
+        snapshot.save(self.db, self.tmpdir / 'unchecked', copies)
+        for copy in copies:
+            copy.unlink()
+        self.assertIsNone(snapshot.load(self.tmpdir / 'unchecked', copies))
+        loaded = snapshot.load(self.tmpdir / 'unchecked')
+        filters = create_filters(distance_max=0.1)
+        self.assertEqual([summarize_approach(approach) for approach in loaded.query(filters)],
+                         [summarize_approach(approach) for approach in self.db.query(filters)])
+
+    def test_table_columns_are_mapped_not_copied(self):
+        table = self.loaded.table
+        for column in (table.time, table.distance, table.velocity, table.neo_index):
+            self.assertFalse(column.flags.owndata)
+            self.assertFalse(column.flags.writeable)
+
+    def test_saving_over_a_loaded_snapshot_leaves_it_intact(self):
+        directory = self.tmpdir / 'resaved'
+        snapshot.save(self.db, directory, self.sources)
+        loaded = snapshot.load(directory, self.sources)
+        filters = create_filters(distance_max=0.1)
+        expected = [summarize_approach(approach) for approach in loaded.query(filters)]
+
+        # As when reloading changed data files: the new snapshot is smaller.
+        smaller = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE)[:100])
+        snapshot.save(smaller, directory, self.sources)
+        loaded.cache.clear()
+        self.assertEqual([summarize_approach(approach) for approach in loaded.query(filters)],
+                         expected)
+        self.assertEqual(len(snapshot.load(directory, self.sources).table), 100)
+
+    def test_saving_over_a_snapshot_being_read_leaves_its_neos_intact(self):
+        directory = self.tmpdir / 'reread'
+        snapshot.save(self.db, directory, self.sources)
+        with open(directory / 'neos.json') as file:
+            # As a reader past the manifest check, when the snapshot is saved again.
+            smaller = NEODatabase(load_neos(TEST_NEO_FILE)[:100], [])
+            snapshot.save(smaller, directory, self.sources)
+            self.assertEqual(len(json.load(file)['designation']), len(self.db._neos))
+        self.assertEqual(sorted(path.name for path in directory.iterdir()
+                                if path.suffix == '.tmp'), [])
+
+    def test_extra_columns_are_kept(self):
+        db = NEODatabase(load_neos(TEST_NEO_FILE, extra_columns=('moid', 'class')),
+                         load_approaches(TEST_CAD_FILE))
+        snapshot.save(db, self.tmpdir / 'extra', self.sources)
+        loaded = snapshot.load(self.tmpdir / 'extra', self.sources)
+        for designation in ('1685', '2020 BS'):
+            self.assertEqual(loaded.get_neo_by_designation(designation).extra,
+                             db.get_neo_by_designation(designation).extra)
+        self.assertIsNone(self.loaded.get_neo_by_designation('1685').extra)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,233 @@
+"""Check that a SQLite-backed `NEODatabase` answers exactly like the in-memory one.
+
+To run these tests from the project root, run:
+
+    $ python3 -m unittest --verbose tests.test_sqlstore
+"""
+import contextlib
+import datetime
+import gc
+import io
+import math
+import operator
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import sqlstore
+from database import NEODatabase
+from extract import load_neos, load_approaches
+from filters import (DateFilter, DistanceFilter, HazardFilter, UnsupportedCriterionError,
+                     create_filters)
+
+
+TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
+TEST_NEO_FILE = TESTS_ROOT / 'test-neos-2020.csv'
+TEST_CAD_FILE = TESTS_ROOT / 'test-cad-2020.json'
+
+
+def summarize_neo(neo):
+    diameter = None if math.isnan(neo.diameter) else neo.diameter
+    return (neo.designation, neo.name, neo.full_name, diameter, neo.hazardous)
+
+
+def summarize_approach(approach):
+    return (approach.neo.designation, approach.time, approach.distance, approach.velocity)
+
+
+def ingest(path, sources):
+    with contextlib.redirect_stdout(io.StringIO()):
+        sqlstore.ingest(path, *sources)
+
+
+class TestSQLiteDatabase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmpdir = pathlib.Path(tempfile.mkdtemp())
+        cls.sources = (TEST_NEO_FILE, TEST_CAD_FILE)
+        with contextlib.redirect_stdout(io.StringIO()):
+            cls.db = NEODatabase(load_neos(TEST_NEO_FILE), load_approaches(TEST_CAD_FILE))
+        ingest(cls.tmpdir / 'neo.sqlite', cls.sources)
+        cls.loaded = sqlstore.load(cls.tmpdir / 'neo.sqlite', cls.sources)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.loaded.close()
+        shutil.rmtree(cls.tmpdir)
+
+    def test_database_loads(self):
+        self.assertIsInstance(self.loaded, NEODatabase)
+        self.assertEqual(len(self.loaded._approaches), len(self.db._approaches))
+
+    def test_get_neo_by_designation(self):
+        for designation in ('1865', '2101', '2020 BS', '2020 PY1'):
+            expected = self.db.get_neo_by_designation(designation)
+            received = self.loaded.get_neo_by_designation(designation)
+            self.assertEqual(summarize_neo(received), summarize_neo(expected))
+            self.assertEqual([summarize_approach(approach) for approach in received.approaches],
+                             [summarize_approach(approach) for approach in expected.approaches])
+        self.assertIsNone(self.loaded.get_neo_by_designation('not-real-designation'))
+
+    def test_get_neo_by_name(self):
+        for name in ('Lemmon', 'Jormungandr', 'Adonis'):
+            expected = self.db.get_neo_by_name(name)
+            received = self.loaded.get_neo_by_name(name)
+            self.assertEqual(summarize_neo(received), summarize_neo(expected))
+            self.assertIs(received, self.loaded.get_neo_by_designation(received.designation))
+        self.assertIsNone(self.loaded.get_neo_by_name('not-real-name'))
+
+    def test_approaches_link_to_the_same_objects(self):
+        neo = self.loaded.get_neo_by_designation('2101')
+        for approach in neo.approaches:
+            self.assertIs(approach.neo, neo)
+            self.assertIn(approach, list(self.loaded.query(create_filters(
+                date=approach.time.date(), hazardous=True))))
+
+    def test_query_matches_original(self):
+        criteria = (
+            {},
+            {'date': datetime.date(2020, 3, 2)},
+            {'start_date': datetime.date(2020, 3, 1), 'end_date': datetime.date(2020, 3, 31)},
+            {'distance_max': 0.05, 'velocity_min': 20, 'hazardous': True},
+            {'distance_min': 0.3, 'velocity_max': 10},
+            {'diameter_min': 0.5},
+            {'diameter_max': 1, 'hazardous': False},
+        )
+        for kwargs in criteria:
+            with self.subTest(**kwargs):
+                filters = create_filters(**kwargs)
+                self.assertEqual([summarize_approach(a) for a in self.loaded.query(filters)],
+                                 [summarize_approach(a) for a in self.db.query(filters)])
+
+    def test_query_with_filters_that_cannot_be_pushed_down(self):
+        filters = [lambda approach: approach.neo.name is not None,
+                   DistanceFilter(operator.ne, 0.1),
+                   *create_filters(distance_max=0.2)]
+        self.assertEqual([summarize_approach(a) for a in self.loaded.query(filters)],
+                         [summarize_approach(a) for a in self.db.query(filters)])
+
+    def test_summaries_match_original(self):
+        filters = create_filters(hazardous=True)
+        self.assertEqual([summarize_approach(a) for a in self.loaded.top(filters, count=5)],
+                         [summarize_approach(a) for a in self.db.top(filters, count=5)])
+        self.assertEqual(self.loaded.aggregate(filters, 'neo'), self.db.aggregate(filters, 'neo'))
+        self.assertEqual(self.loaded.histogram(filters, 'velocity'),
+                         self.db.histogram(filters, 'velocity'))
+
+    def test_top_matches_original_without_reading_the_table(self):
+        path = self.tmpdir / 'top.sqlite'
+        ingest(path, self.sources)
+        loaded = sqlstore.load(path, self.sources)
+        self.addCleanup(loaded.close)
+        cases = (
+            ((), 'distance', 10, False),
+            (create_filters(hazardous=True), 'velocity', 5, True),
+            (create_filters(distance_max=0.05), 'diameter', 20, False),
+            (create_filters(distance_max=0.05), 'diameter', 20, True),
+            ([lambda approach: approach.velocity > 20], 'date', 7, True),
+            (create_filters(start_date=datetime.date(2020, 6, 1)), 'distance', None, False),
+        )
+        for filters, sort_by, count, descending in cases:
+            with self.subTest(sort_by=sort_by, count=count, descending=descending):
+                self.assertEqual(
+                    [summarize_approach(a) for a in loaded.top(filters, sort_by, count,
+                                                               descending)],
+                    [summarize_approach(a) for a in self.db.top(filters, sort_by, count,
+                                                                descending)])
+        self.assertIsNone(loaded._table)
+
+    def test_approaches_are_let_go_after_a_scan(self):
+        path = self.tmpdir / 'scanned.sqlite'
+        ingest(path, self.sources)
+        with mock.patch.object(sqlstore, '_RECENT_NEOS', 10):
+            loaded = sqlstore.load(path, self.sources)
+        self.addCleanup(loaded.close)
+        kept = loaded._approaches[0]
+        self.assertEqual(sum(1 for _ in loaded.query()), len(self.db._approaches))
+        gc.collect()
+        self.assertIs(loaded._approaches[0], kept)
+        self.assertEqual(len(loaded._approaches._cache), 1)
+        # The NEO of the kept approach, and the last few created.
+        self.assertLessEqual(len(loaded._neos._cache), 11)
+
+    def test_queries_from_many_threads(self):
+        filters = create_filters(distance_max=0.2)
+        expected = [summarize_approach(a) for a in self.db.query(filters)]
+        results = []
+
+        def run():
+            results.append([summarize_approach(a) for a in self.loaded.query(filters)])
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [expected] * 8)
+
+    def test_prebuild_reads_no_table(self):
+        path = self.tmpdir / 'prebuilt.sqlite'
+        ingest(path, self.sources)
+        loaded = sqlstore.load(path, self.sources)
+        loaded.prebuild()
+        list(loaded.query(create_filters(hazardous=True)))
+        self.assertIsNone(loaded._table)
+        loaded.close()
+
+    def test_database_is_read_only(self):
+        with self.assertRaisesRegex(TypeError, 'read-only'):
+            self.loaded.add_approaches(list(self.db.query())[:1])
+        with self.assertRaisesRegex(TypeError, 'read-only'):
+            self.loaded.add_neos(self.db._neos[:1])
+        self.assertEqual(len(self.loaded._approaches), len(self.db._approaches))
+
+    def test_missing_file_is_not_loaded(self):
+        self.assertIsNone(sqlstore.load(self.tmpdir / 'nowhere.sqlite', self.sources))
+
+    def test_changed_source_invalidates_file(self):
+        copies = []
+        for source in self.sources:
+            copy = self.tmpdir / source.name
+            shutil.copy(source, copy)
+            copies.append(copy)
+        ingest(self.tmpdir / 'changed.sqlite', copies)
+        loaded = sqlstore.load(self.tmpdir / 'changed.sqlite', copies)
+        self.assertIsNotNone(loaded)
+        loaded.close()
+
+        stat = copies[1].stat()
+        os.utime(copies[1], ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertIsNone(sqlstore.load(self.tmpdir / 'changed.sqlite', copies))
+
+    def test_ingesting_over_an_open_file_leaves_it_intact(self):
+        path = self.tmpdir / 'reingested.sqlite'
+        ingest(path, self.sources)
+        loaded = sqlstore.load(path, self.sources)
+        filters = create_filters(distance_max=0.1)
+        expected = [summarize_approach(approach) for approach in loaded.query(filters)]
+        ingest(path, self.sources)
+        self.assertEqual([summarize_approach(approach) for approach in loaded.query(filters)],
+                         expected)
+        loaded.close()
+
+
+class TestWhere(unittest.TestCase):
+    def test_filters_become_sql_conditions(self):
+        self.assertEqual(DistanceFilter(operator.le, 0.05).where(),
+                         ('approaches.distance <= ?', (0.05,)))
+        self.assertEqual(DateFilter(operator.eq, datetime.date(1970, 1, 2)).where(),
+                         ('approaches.day = ?', (1,)))
+        self.assertEqual(HazardFilter(operator.eq, True).where(),
+                         ('neos.hazardous = ?', (True,)))
+
+    def test_unsupported_comparator_raises(self):
+        with self.assertRaises(UnsupportedCriterionError):
+            DistanceFilter(operator.ne, 0.05).where()
+
+
+if __name__ == '__main__':
+    unittest.main()
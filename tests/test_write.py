@@ -21,13 +21,15 @@ import datetime
 import io
 import json
 import pathlib
+import tempfile
+import types
 import unittest
 import unittest.mock
 
 
 from extract import load_neos, load_approaches
 from database import NEODatabase
-from write import write_to_csv, write_to_json
+from write import write_histogram, write_to_csv, write_to_json, write_to_ndjson
 
 
 TESTS_ROOT = (pathlib.Path(__file__).parent).resolve()
@@ -226,5 +228,61 @@ class TestWriteToJSON(unittest.TestCase):
         self.assertIsInstance(approach['neo']['potentially_hazardous'], bool)
 
 
+class TestWriteStreams(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.results = build_results(5)
+
+    def write(self, writer, results):
+        with tempfile.TemporaryDirectory() as directory:
+            path = pathlib.Path(directory) / 'results'
+            with contextlib.redirect_stdout(io.StringIO()):
+                writer(iter(results), path)
+            return path.read_bytes().decode()
+
+    def test_json_matches_json_dump(self):
+        for count in (0, 1, 5):
+            with self.subTest(count=count):
+                results = self.results[:count]
+                expected = json.dumps([approach.jsonMaker for approach in results], indent=2)
+                self.assertEqual(self.write(write_to_json, results), expected)
+
+    def test_json_matches_json_dump_for_unusual_values(self):
+        elements = [{'nan': float('nan'), 'text': 'caf\u00e9 "\n"', 'none': None,
+                     'list': [1, {'nested': True}], 'empty': {}, 'keys': {1: 2.5}}]
+        results = [types.SimpleNamespace(jsonMaker=element) for element in elements]
+        self.assertEqual(self.write(write_to_json, results), json.dumps(elements, indent=2))
+
+    def test_csv_matches_csv_maker_rows(self):
+        results = build_results(None)
+        buf = io.StringIO(newline='')
+        writer = csv.writer(buf, dialect='myDialect')
+        writer.writerow(('datetime_utc', 'distance_au', 'velocity_km_s', 'designation',
+                         'name', 'diameter_km', 'potentially_hazardous'))
+        writer.writerows(approach.csvMaker for approach in results)
+        self.assertEqual(self.write(write_to_csv, results), buf.getvalue())
+
+    def test_ndjson_has_one_element_per_line(self):
+        lines = self.write(write_to_ndjson, self.results).splitlines()
+        self.assertEqual([json.loads(line) for line in lines],
+                         [approach.jsonMaker for approach in self.results])
+
+    def test_ndjson_empty(self):
+        self.assertEqual(self.write(write_to_ndjson, ()), '')
+
+
+class TestWriteHistogram(unittest.TestCase):
+    def test_histogram_csv(self):
+        histogram = [(datetime.date(2020, 1, 1), datetime.date(2020, 2, 1), 511),
+                     (datetime.date(2020, 2, 1), datetime.date(2020, 3, 1), 0)]
+        buffer = io.StringIO(newline='')
+        write_histogram(histogram, buffer)
+        self.assertEqual(list(csv.reader(io.StringIO(buffer.getvalue()))), [
+            ['start', 'end', 'count'],
+            ['2020-01-01', '2020-02-01', '511'],
+            ['2020-02-01', '2020-03-01', '0'],
+        ])
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,12 +1,47 @@
-"""Write a stream of close approaches to CSV or to JSON."""
+"""Write a stream of close approaches, or a histogram of them, to CSV or to JSON."""
 
 import csv
+import io
 import json
+import json.encoder
+import math
+
+from helpers import datetime_to_str
+
+
+# Rows per write, and the size of the output file's buffer, for write_to_csv.
+_BATCH_SIZE = 4096
+_BUFFER_SIZE = 1 << 20
+
+# The original escapechar='' meant "no escape character", which Python 3.11
+# no longer accepts; None says the same thing.
+csv.register_dialect('myDialect', delimiter=',',
+                     doublequote=0, escapechar=None,
+                     quotechar="'", quoting=csv.QUOTE_MINIMAL)
+
+
+# What json.dump(..., indent=2) would use, for values _indented_json doesn't handle.
+_JSON_ELEMENT = json.JSONEncoder(indent=2)
+
+# JSON text of scalars, by exact type, as json.dump writes them.
+_JSON_SCALARS = {
+    str: json.encoder.encode_basestring_ascii,
+    int: int.__repr__,
+    bool: lambda value: 'true' if value else 'false',
+    type(None): lambda value: 'null',
+    float: lambda value: float.__repr__(value) if math.isfinite(value)
+    else _JSON_ELEMENT.encode(value),
+}
 
 
 def write_to_csv(results, filename):
     """Write an iterable of CloseApproach objects to a CSV file.
 
+    Rows are formatted in batches and written with one call per batch. The
+    NEO columns of a row are formatted once per NEO, and the approach
+    columns (a timestamp and two floats, which never need quoting) are
+    joined on directly.
+
     :param results: An iterable of CloseApproach objects.
     :param filename: A Path-like object pointing to save location.
     """
@@ -15,23 +50,44 @@ def write_to_csv(results, filename):
         'designation', 'name', 'diameter_km', 'potentially_hazardous'
     )
 
-    csv.register_dialect('myDialect', delimiter=',',
-                         doublequote=0, escapechar='',
-                         quotechar="'", quoting=csv.QUOTE_MINIMAL)
-
     # the doublequote thing is annoying
 
-    with open(filename, mode='w', newline='') as csvfile:
+    with open(filename, mode='w', newline='', buffering=_BUFFER_SIZE) as csvfile:
         filewriter = csv.writer(csvfile, dialect="myDialect")
         filewriter.writerow(fieldnames)
+        terminator = filewriter.dialect.lineterminator
+
+        neo_fields = {}
+        batch = []
         for approach in results:
-            filewriter.writerow(approach.csvMaker)
+            neo = approach.neo
+            fields = neo_fields.get(neo)
+            if fields is None:
+                fields = neo_fields[neo] = _csv_neo_fields(approach) + terminator
+            batch.append(f'{datetime_to_str(approach.time)},{approach.distance!r},'
+                         f'{approach.velocity!r},{fields}')
+            if len(batch) == _BATCH_SIZE:
+                csvfile.write(''.join(batch))
+                batch.clear()
+        csvfile.write(''.join(batch))
         print(f"Export to {filename} complete.")
 
 
+def _csv_neo_fields(approach):
+    """Return the CSV text of the NEO columns of an approach's row."""
+    buffer = io.StringIO()
+    csv.writer(buffer, dialect="myDialect", lineterminator='').writerow(
+        approach.csvMaker[3:])
+    return buffer.getvalue()
+
+
 def write_to_json(results, filename):
     """Write an iterable of CloseApproach objects to a JSON file.
 
+    Each approach is written as soon as it is produced, so the results are
+    never all held in memory. The output is the same as `json.dump` of the
+    whole list with `indent=2`.
+
     :param results: An iterable of CloseApproach objects.
     :param filename: A Path-like object pointing to save location.
     """
@@ -40,11 +96,59 @@ def write_to_json(results, filename):
     #
     # A float for missing diameter (i.e. 0) is what passes the unit tests.
 
-    bigKahuna = []
-    for approach in results:
-        bigKahuna.append(approach.jsonMaker)
+    with open(filename, 'w') as outfile:
+        separator = '[\n  '
+        for approach in results:
+            outfile.write(separator + _indented_json(approach.jsonMaker, '  '))
+            separator = ',\n  '
+        outfile.write('[]' if separator.startswith('[') else '\n]')
+
+    print(f"Export to {filename} complete.")
 
+
+def _indented_json(value, indent):
+    """Return the JSON text of a value nested at `indent`, with an indent of 2.
+
+    This is the text json.dump(..., indent=2) writes for the value at that
+    depth. Dicts of scalars are assembled directly from the scalars' JSON,
+    which is about twice as fast as the pure-Python encoder json.dump has to
+    use for indented output; anything else is left to that encoder.
+    """
+    scalar = _JSON_SCALARS.get(type(value))
+    if scalar is not None:
+        return scalar(value)
+    if type(value) is dict and value and all(type(key) is str for key in value):
+        inner = indent + '  '
+        items = [inner + _JSON_SCALARS[str](key) + ': ' + _indented_json(item, inner)
+                 for key, item in value.items()]
+        return '{\n' + ',\n'.join(items) + '\n' + indent + '}'
+    return _JSON_ELEMENT.encode(value).replace('\n', '\n' + indent)
+
+
+def write_to_ndjson(results, filename):
+    """Write an iterable of CloseApproach objects as newline-delimited JSON.
+
+    Each line of the file is one approach, in the same form as an element of
+    `write_to_json`'s output.
+
+    :param results: An iterable of CloseApproach objects.
+    :param filename: A Path-like object pointing to save location.
+    """
     with open(filename, 'w') as outfile:
-        json.dump(bigKahuna, outfile, indent=2)
+        for approach in results:
+            outfile.write(json.dumps(approach.jsonMaker) + '\n')
 
     print(f"Export to {filename} complete.")
+
+
+def write_histogram(histogram, outfile):
+    """Write the bins of `NEODatabase.histogram` as CSV to an open text file.
+
+    Each row is a bin's start, end and count; dates are in YYYY-MM-DD format.
+
+    :param histogram: A list of (start, end, count) tuples.
+    :param outfile: A text file, opened with newline=''.
+    """
+    filewriter = csv.writer(outfile, dialect="myDialect")
+    filewriter.writerow(('start', 'end', 'count'))
+    filewriter.writerows(histogram)